@@ -4,17 +4,33 @@
 #  Developed by Dietmar Sach (dsach@mail.de) for the Institute of Sport Science of the University of Augsburg
 #  Based on a script made by Christian P. Janssen, c.janssen@ucl.ac.uk December 2009 - March 2010
 #############################
+import argparse
+import bisect
+import collections
 import csv
 import datetime
+import functools
+import glob
+import gzip
+import hashlib
 import inspect
+import json
 import math
 import os
+import queue
 import random
+import re
+import struct
+import subprocess
+import sys
+import threading
 import time
 import traceback
+import tracemalloc
 from enum import Enum
 from os import path
 from tkinter import *
+import numpy
 import pygame
 import scipy
 import scipy.special
@@ -32,6 +48,50 @@ class Vector2D:
         self.X = x
         self.Y = y
 
+    def set(self, x, y):
+        """Changes the values in place, so that no new object is created in the trial loops"""
+        self.X = x
+        self.Y = y
+
+
+class FsyncPolicy(Enum):
+    """
+    Used to represent when the output data file is forced to disk (fsync) by the background writer.
+    Do not modify anything here!
+    """
+    EveryNRows = 1  # after ExperimentSettings.OutputFsyncIntervalRows rows
+    EveryNMilliseconds = 2  # after ExperimentSettings.OutputFsyncIntervalMilliseconds
+    AtTrialEnd = 3  # only when a trialEnd row is written
+
+
+class OutputDataFormat(Enum):
+    """
+    Used to represent the format of the output data file with all rows. The file with the trialEnd rows is always a csv file.
+    Do not modify anything here!
+    """
+    Csv = 1  # text file with ";" separated columns
+    Binary = 2  # columnar binary file (see BinarySampleFile), can be converted to the csv format with --convert-binary
+    EventStream = 3  # text file with the changes of the rows only (see EventStreamFile), can be converted to the csv format with --convert-binary
+
+
+class RenderingMode(Enum):
+    """
+    Used to represent how the screen is updated during the trials.
+    Do not modify anything here!
+    """
+    FullFlip = 1  # the whole screen is updated with pygame.display.flip()
+    DirtyRectangles = 2  # only the changed areas (cursor, typing text, score boxes) are updated with pygame.display.update(rects)
+
+
+class DisturbanceModel(Enum):
+    """
+    Used to represent how the cursor disturbance of a trial is generated.
+    Do not modify anything here!
+    """
+    WhiteNoise = 1  # independent gaussian noise in each physics step
+    SumOfSines = 2  # sum of sines with the frequencies ExperimentSettings.SumOfSinesFrequencies and random phases
+    BandLimitedNoise = 3  # white noise without the frequencies above ExperimentSettings.BandLimitedNoiseCutoffFrequency
+
 
 class ExperimentSettings:
     """
@@ -67,6 +127,77 @@ class ExperimentSettings:
     # Practice trials settings
     CursorNoisePracticeTrials = CursorNoises["high"]
 
+    # The cursor dynamics are computed with a fixed rate, frames are drawn with the refresh rate of the monitor.
+    # The noise variance per second does not depend on these rates.
+    PhysicsRate = 200  # steps per second
+    DisplayRefreshRate = 60  # frames per second, should be set to the refresh rate of the monitor
+    # The joystick is sampled with this rate while the trial loop waits for the next frame, and each physics step uses the last
+    # sample before it. The samples are saved in the input file. With 0, the joystick is only read once per tick from the events.
+    JoystickSamplingRate = 0  # samples per second, e.g. 500
+
+    # Diagnostics of the timing, off by default because they write additional files and take time in the trial loop.
+    # Logs for each input of the trials when it happened, when it was handled and when the display update showing it was done,
+    # with percentiles per trial (see InputLatencyRecorder). The sync patch in the bottom left corner changes its color with
+    # each key press and joystick button, so a photodiode can measure the latency until the change is really visible.
+    InputLatencyLogging = False
+    LatencySyncPatch = False
+
+    # Records the timing of each frame of the trials (see FrameTimingRecorder), saved as .npy file next to the output data file.
+    # The frame time is the time from the deadline of a frame until its display update returned. Trials where this percentile of the
+    # frame times exceeds the budget, or with more dropped frames, are flagged in the trialEnd row (EventMessage2).
+    FrameTimingRecording = False
+    SaveFrameTimes = False
+    FrameTimeBudgetMilliseconds = 1000 / DisplayRefreshRate
+    FrameTimeBudgetPercentile = 95
+    MaxDroppedFramesPerTrial = 0
+
+    # The hot path profiling is switched on in the GUI and saved in guiconfig.dat (see HotPathProfiler). The profiled functions
+    # are only wrapped when it is switched on, otherwise they are called directly.
+    # Also measures the memory growth in the profiled functions with tracemalloc. This slows down every allocation of the program,
+    # the trial loop several times, so it distorts the timing of the session and should only be used to look for allocations.
+    ProfileAllocations = False
+    ProfilingOverheadLimit = 0.02  # share of the trial time, if the profiling takes longer the allocations are no longer traced
+
+    # The cursor noise and the typing task numbers of each trial are drawn from random streams seeded with this seed,
+    # the participant number, the condition and the trial number. The same seed and inputs reproduce a trial.
+    RandomSeed = 2019
+
+    # The disturbance of the cursor is generated for the whole trial at its start. All models have the same
+    # root mean square displacement within DisturbanceScalingInterval as the white noise with the StandardDeviationOfNoise.
+    DisturbanceModel = DisturbanceModel.WhiteNoise
+    DisturbanceScalingInterval = 1.0  # seconds
+    SumOfSinesFrequencies = [0.07, 0.13, 0.23, 0.37, 0.53, 0.79]  # Hz
+    BandLimitedNoiseCutoffFrequency = 2.0  # Hz
+    SaveDisturbances = False  # save the disturbance of each trial as .npy file next to the output data file
+
+    # Look up the circle of the cursor position per pixel of the tracking window instead of computing it (see CircleSet)
+    CircleZoneLookupTable = True
+
+    # Memory budget for rendered texts (typing task numbers, scores, instructions) which are kept to be blitted again
+    TextCacheMemoryBudget = 16 * 1024 * 1024  # bytes
+
+    # The messages and countdowns of the session are rendered before the session starts (see ScreenCache), the empty screens
+    # as full screens and the messages as their text areas. With a directory, they are also stored there and loaded from there
+    # in the next sessions.
+    ScreenCacheMemoryBudget = 48 * 1024 * 1024  # bytes, messages beyond the budget are drawn when they are shown
+    ScreenCacheDirectory = ""  # e.g. "screencache", empty to disable
+
+    # How the screen is updated during the trials. Both modes show the same content, DirtyRectangles only transfers the changed areas.
+    RenderingMode = RenderingMode.FullFlip
+
+    # Output data file: rows are written by a background thread. The file is forced to disk according to the policy,
+    # and always at the end of a trial. The file with the trialEnd rows is always forced to disk immediately.
+    # On a crash, the rows since the last fsync can be lost: with EveryNMilliseconds at most the interval, with AtTrialEnd
+    # the whole trial. Every fsync also ends a block of a compressed file, so shorter intervals compress less.
+    OutputFsyncPolicy = FsyncPolicy.EveryNMilliseconds
+    OutputFsyncIntervalRows = 50  # only used with FsyncPolicy.EveryNRows
+    OutputFsyncIntervalMilliseconds = 1000  # only used with FsyncPolicy.EveryNMilliseconds
+    OutputDataFormat = OutputDataFormat.Csv
+    BinaryOutputChunkRows = 1000  # rows per chunk of the binary output data file, chunks are also written when the file is forced to disk
+    # Compresses the csv or event stream output data file with gzip in blocks (see CompressedBlockFile), not used for the binary format
+    OutputDataCompression = False
+    OutputCompressionLevel = 6  # 1 (fastest) to 9 (smallest)
+
     # Debug mode will speed up the messages and the trials for debugging. Should be set to False for normal use.
     DebugMode = False
 
@@ -84,7 +215,737 @@ class Constants:
     TrackingWindowMiddleY = TopLeftCornerOfTrackingTaskWindow.Y + int(ExperimentSettings.TaskWindowSize.Y / 2.0)
     ScalingJoystickAxis = 5  # how many pixels the cursor moves when joystick is at full angle (value of 1 or -1).
     StepSizeOfTrackingScreenUpdate = 0.005  # how many seconds does it take for a screen update
+    NoiseReferenceInterval = 0.02  # StandardDeviationOfNoise and ScalingJoystickAxis are given per this interval of time
+    TrialTickInterval = 0.02  # the trial loops check input, update the cursor and write the data file once per tick
+    MaxKeyPressRate = 20  # key presses per second for which the sample buffers are preallocated
+    SleepSpinTime = 0.001  # the last part of a wait is spent polling the clock, as sleeping is not precise enough
+    LatencySyncPatchSize = 40  # pixels
     SettingsFilename = "guiconfig.dat"
+    WelcomeMessage = "Willkommen zum Experiment!\n\n\nWir beginnen mit den Übungsdurchläufen."
+    EndMessage = "Dies ist das Ende der Studie."
+
+
+class MonotonicClock:
+    """
+    Clock for all timing of the experiment. It is based on time.perf_counter_ns, so it always increases and is not affected
+    by adjustments of the system clock during a session.
+    """
+    def __init__(self):
+        self.OriginNs = time.perf_counter_ns()
+
+    def now(self):
+        """Returns the seconds since the clock was created"""
+        return (time.perf_counter_ns() - self.OriginNs) / 1e9
+
+    def sleep(self, seconds):
+        self.sleepUntil(self.now() + seconds)
+
+    def sleepUntil(self, deadline):
+        """Waits until the clock reaches the deadline (in seconds of this clock)"""
+        remaining = deadline - self.now()
+        if remaining > Constants.SleepSpinTime:
+            time.sleep(remaining - Constants.SleepSpinTime)
+        while self.now() < deadline:
+            pass
+
+    def waitForEvent(self, deadline):
+        """Waits for the next pygame event, but not beyond the deadline. Returns None if there was no event."""
+        remaining = deadline - self.now() - Constants.SleepSpinTime
+        if remaining <= 0:
+            self.sleepUntil(deadline)
+            return None
+        event = pygame.event.wait(max(int(remaining * 1000), 1))
+        return event if event.type != pygame.NOEVENT else None
+
+
+class TrialScheduler:
+    """
+    Paces a trial loop with ticks at absolute deadlines (start + n * tickInterval), so that the time needed for drawing and
+    writing does not add up. The trial ends when trialDuration has passed, no matter how long the ticks take.
+    """
+    def __init__(self, clock, tickInterval, trialDuration, startTime):
+        self.Clock = clock
+        self.TickInterval = tickInterval
+        self.StartTime = startTime
+        self.EndTime = startTime + trialDuration
+        self.TickNumber = 0  # number of the next tick
+        self.TickDeadline = startTime  # deadline of the current tick
+        self.TickLateness = None  # seconds the current tick started after its deadline
+        self.SkippedTicks = 0
+
+    def waitForNextTick(self):
+        """Waits for the deadline of the next tick. Returns False when the trial time is over."""
+        deadline = self.StartTime + self.TickNumber * self.TickInterval
+        if deadline >= self.EndTime:
+            self.Clock.sleepUntil(self.EndTime)
+            return False
+        self.Clock.sleepUntil(deadline)
+        now = self.Clock.now()
+        if now >= self.EndTime:
+            return False
+        # If a tick took longer than the tick interval, the missed deadlines are skipped instead of being caught up
+        missedTicks = int((now - deadline) / self.TickInterval)
+        if missedTicks > 0:
+            self.SkippedTicks += missedTicks
+            self.TickNumber += missedTicks
+            deadline = self.StartTime + self.TickNumber * self.TickInterval
+        self.TickDeadline = deadline
+        self.TickLateness = now - deadline
+        self.TickNumber += 1
+        if RuntimeVariables.FrameTimingRecorder:
+            RuntimeVariables.FrameTimingRecorder.wokeUp(deadline, now)
+        return True
+
+    def sleepUntilTickOffset(self, offset):
+        """Waits until offset seconds after the deadline of the current tick, but not beyond the end of the trial"""
+        self.Clock.sleepUntil(min(self.TickDeadline + offset, self.EndTime))
+
+
+class TrialRandomStreams:
+    """
+    Independent random streams of a trial, one for the cursor noise and one for each kind of typing task numbers.
+    They are derived from a trial seed, which is written to the output data file.
+    """
+    def __init__(self, baseSeed, participantNumber, condition, blockNumber, trialNumber):
+        self.TrialSeed = self.getTrialSeed(baseSeed, participantNumber, condition, blockNumber, trialNumber)
+        self.Noise = self.createStream("noise")
+        self.SingleTypingTaskNumbers = self.createStream("singleTypingTaskNumbers")
+        self.DualTypingTaskNumbers = self.createStream("dualTypingTaskNumbers")
+
+    @staticmethod
+    def getTrialSeed(baseSeed, participantNumber, condition, blockNumber, trialNumber):
+        seedText = f"{baseSeed};{participantNumber};{condition};{blockNumber};{trialNumber}"
+        return int.from_bytes(hashlib.sha256(seedText.encode()).digest()[:4], "big")
+
+    def createStream(self, name):
+        return random.Random(f"{self.TrialSeed};{name}")
+
+
+def createTrialRandomStreams():
+    """
+    Creates the random streams for the current trial from the key of RuntimeVariables.CurrentTrialSpec.
+    If the trial was prepared by a TrialWarmUp, its streams are taken over.
+    """
+    warmUp = getTrialWarmUp()
+    if warmUp:
+        RuntimeVariables.RandomStreams = warmUp.RandomStreams
+    else:
+        RuntimeVariables.RandomStreams = TrialRandomStreams(*RuntimeVariables.CurrentTrialSpec.RandomStreamsKey)
+
+
+class ParallelDualTaskScoreEngine:
+    """
+    Calculates the scores of parallel dual tasks. The tracking score is cumulated once per tick of the trial loop, after the cursor
+    moved, so it does not depend on how often the scores are read. The typing score is read from the current counters.
+    Call reset() at the start of each trial and advance() once per tick, before the row of the tick is written.
+    """
+    def __init__(self):
+        self.TickNumber = 0
+        self.CumulatedTrackingScore = 0
+
+    def reset(self):
+        self.TickNumber = 0
+        self.CumulatedTrackingScore = 0
+
+    def advance(self):
+        """Adds the tracking score of this tick to the cumulated tracking score"""
+        trackingScore = calculateRmse()
+        if trackingScore > 0:  # avoid division by zero!
+            trackingScore = 1.0 / trackingScore  # Invert RMSE as a higher score should be better.
+        # For live feedback, the tracking score must increase over time. To be compareable, it should be calculated the same way for non-live feedback.
+        self.CumulatedTrackingScore += trackingScore
+        self.TickNumber += 1
+
+    @property
+    def Scores(self):
+        """The typing score, the cumulated tracking score and the combined score"""
+        typingScore = int(RuntimeVariables.CorrectlyTypedDigitsVisit)  # One Visit equals one Trial in parallel dual tasks, cut all decimal places
+        combinedScore = int((typingScore + self.CumulatedTrackingScore) / 2.0)  # cut all decimal places
+        return typingScore, int(self.CumulatedTrackingScore), combinedScore
+
+
+class TrackingStatisticsAccumulator:
+    """
+    Collects the tracking statistics of a trial sample by sample, so that they can be read in constant time.
+    Call reset() at the start of each trial.
+    """
+    def __init__(self, middleX, middleY):
+        self.MiddleX = middleX
+        self.MiddleY = middleY
+        self.reset()
+
+    def reset(self):
+        self.NumberOfSamples = 0
+        self.SumOfSquaredDistances = 0
+        self.SumOfDistances = 0
+        self.LengthOfPath = 0
+        self.MinDistance = None
+        self.MaxDistance = None
+
+    def addSample(self, x, y, previousX, previousY):
+        """Adds the cursor position (x, y). The previous position is used for the length of the path tracked."""
+        distance = math.sqrt((self.MiddleX - x) ** 2 + (self.MiddleY - y) ** 2)
+        self.NumberOfSamples += 1
+        self.SumOfSquaredDistances += distance * distance
+        self.SumOfDistances += distance
+        self.LengthOfPath += math.sqrt((previousX - x) ** 2 + (previousY - y) ** 2)
+        if self.MinDistance is None or distance < self.MinDistance:
+            self.MinDistance = distance
+        if self.MaxDistance is None or distance > self.MaxDistance:
+            self.MaxDistance = distance
+        return distance
+
+    def getRmse(self):
+        """Returns the root mean square error of the distances to the middle, or 0 if there are no samples"""
+        if self.NumberOfSamples == 0:
+            return 0
+        return math.sqrt(self.SumOfSquaredDistances / float(self.NumberOfSamples))
+
+    def getMeanDistance(self):
+        if self.NumberOfSamples == 0:
+            return 0
+        return self.SumOfDistances / float(self.NumberOfSamples)
+
+
+class TrialSampleBuffers:
+    """
+    Collects the samples of a trial (one per tick with the cursor: time, cursor position, distance to the middle and joystick axis)
+    and the times of the key presses in preallocated arrays, which are reused for all trials.
+    Call reset() at the start of each trial. The get...() methods return views of the samples of the current trial without copying.
+    """
+    def __init__(self):
+        self.Capacity = 0
+        self.KeyPressCapacity = 0
+        self.NumberOfSamples = 0
+        self.NumberOfKeyPresses = 0
+        self.SampleOverflows = 0  # how often the arrays had to be enlarged during the trial, is reported at its end
+        self.KeyPressOverflows = 0
+        self.allocate(0, 0)
+
+    def allocate(self, capacity, keyPressCapacity):
+        self.Times = numpy.zeros(capacity)
+        self.CursorX = numpy.zeros(capacity)
+        self.CursorY = numpy.zeros(capacity)
+        self.Distances = numpy.zeros(capacity)
+        self.JoystickX = numpy.zeros(capacity)
+        self.JoystickY = numpy.zeros(capacity)
+        self.KeyPressTimes = numpy.zeros(keyPressCapacity)
+        self.Capacity = capacity
+        self.KeyPressCapacity = keyPressCapacity
+
+    def reset(self, trialDuration):
+        """Empties the buffers. They are only reallocated if they are too small for a trial of trialDuration seconds."""
+        capacity = int(math.ceil(trialDuration / Constants.TrialTickInterval)) + 1
+        keyPressCapacity = int(math.ceil(trialDuration * Constants.MaxKeyPressRate)) + 1
+        if capacity > self.Capacity or keyPressCapacity > self.KeyPressCapacity:
+            self.allocate(max(capacity, self.Capacity), max(keyPressCapacity, self.KeyPressCapacity))
+        self.NumberOfSamples = 0
+        self.NumberOfKeyPresses = 0
+        self.SampleOverflows = 0
+        self.KeyPressOverflows = 0
+
+    def reallocate(self, capacity, keyPressCapacity):
+        """Allocates the arrays with the new capacities and keeps the samples of the trial"""
+        numberOfSamples = self.NumberOfSamples
+        numberOfKeyPresses = self.NumberOfKeyPresses
+        old = (self.Times, self.CursorX, self.CursorY, self.Distances, self.JoystickX, self.JoystickY, self.KeyPressTimes)
+        self.allocate(capacity, keyPressCapacity)
+        for oldArray, newArray in zip(old[:-1], (self.Times, self.CursorX, self.CursorY, self.Distances, self.JoystickX, self.JoystickY)):
+            newArray[:numberOfSamples] = oldArray[:numberOfSamples]
+        self.KeyPressTimes[:numberOfKeyPresses] = old[-1][:numberOfKeyPresses]
+
+    def growSamples(self):
+        """Doubles the sample arrays when a trial has more samples than expected, e.g. if the trial was longer than planned"""
+        self.SampleOverflows += 1
+        self.reallocate(self.Capacity * 2 + 1, self.KeyPressCapacity)
+
+    def growKeyPresses(self):
+        """Doubles the key press array when a trial has more key presses than expected"""
+        self.KeyPressOverflows += 1
+        self.reallocate(self.Capacity, self.KeyPressCapacity * 2 + 1)
+
+    def reportTrial(self):
+        """Logs at the end of the trial if the arrays had to be enlarged during the trial"""
+        if self.SampleOverflows or self.KeyPressOverflows:
+            message = f"Trial {RuntimeVariables.TrialNumber} had more samples or key presses than preallocated, the sample buffers were enlarged " \
+                      f"{self.SampleOverflows} times for the samples and {self.KeyPressOverflows} times for the key presses"
+            print(message)
+            writeLogFile(message)
+
+    def addSample(self, sampleTime, x, y, distance, joystickX, joystickY):
+        index = self.NumberOfSamples
+        if index == self.Capacity:
+            self.growSamples()
+        self.Times[index] = sampleTime
+        self.CursorX[index] = x
+        self.CursorY[index] = y
+        self.Distances[index] = distance
+        self.JoystickX[index] = joystickX
+        self.JoystickY[index] = joystickY
+        self.NumberOfSamples = index + 1
+
+    def addKeyPress(self, keyPressTime):
+        index = self.NumberOfKeyPresses
+        if index == self.KeyPressCapacity:
+            self.growKeyPresses()
+        self.KeyPressTimes[index] = keyPressTime
+        self.NumberOfKeyPresses = index + 1
+
+    def getTimes(self):
+        return self.Times[:self.NumberOfSamples]
+
+    def getCursorX(self):
+        return self.CursorX[:self.NumberOfSamples]
+
+    def getCursorY(self):
+        return self.CursorY[:self.NumberOfSamples]
+
+    def getDistances(self):
+        return self.Distances[:self.NumberOfSamples]
+
+    def getJoystickX(self):
+        return self.JoystickX[:self.NumberOfSamples]
+
+    def getJoystickY(self):
+        return self.JoystickY[:self.NumberOfSamples]
+
+    def getKeyPressTimes(self):
+        """Returns the start time of the trial and the times of the key presses"""
+        return self.KeyPressTimes[:self.NumberOfKeyPresses]
+
+
+class JoystickSampler:
+    """
+    Samples the joystick axes and buttons with a high rate into a ring buffer. SDL only updates the joystick when the events are
+    pumped on the thread of the window, so the samples are taken on the main thread while the trial loop waits (see sleepUntil()),
+    not only once per tick. Each sample is timestamped with the clock.
+    The ring buffer has one writer (the main thread) and two readers with their own positions, the cursor physics (consumeSamples())
+    and a background thread that writes the samples to the input file, so no locks are needed.
+    """
+    def __init__(self, clock, samplingRate, fileName, append=False, capacitySeconds=4):
+        self.Clock = clock
+        self.SampleInterval = 1.0 / samplingRate
+        # the virtual clock of simulated sessions does not wait, the joystick is only sampled at the deadlines
+        self.SampleWhileWaiting = isinstance(clock, MonotonicClock)
+        self.Capacity = int(samplingRate * capacitySeconds)
+        self.Times = numpy.zeros(self.Capacity)
+        self.AxisX = numpy.zeros(self.Capacity)
+        self.AxisY = numpy.zeros(self.Capacity)
+        self.Buttons = numpy.zeros(self.Capacity, dtype=numpy.uint32)  # bit i is button i
+        self.TrialNumbers = numpy.zeros(self.Capacity, dtype=numpy.int32)
+        self.WriteCount = 0  # number of samples written, only changed by the main thread after the sample is complete
+        self.ConsumeCount = 0  # samples read by consumeSamples()
+        self.LogCount = 0  # samples written to the input file, only changed by the log thread
+        self.LostSamples = 0  # samples overwritten before they were written to the input file
+        self.LastSampleTime = None  # of the current trial
+        self.MaxSampleGap = 0
+        self.SamplesInTrials = 0
+        self.SamplingTime = 0
+        self.InputFile = open(fileName, 'a' if append else 'w')
+        if not append:
+            self.InputFile.write("CurrentTime;TrialNumber;JoystickAxisX;JoystickAxisY;JoystickButtons\n")
+        self.StopLogging = threading.Event()
+        self.LogThread = threading.Thread(target=self.runLog, name="JoystickSampleLog", daemon=True)
+        self.LogThread.start()
+
+    def startTrial(self):
+        """The samples before the trial are not used for the cursor"""
+        self.ConsumeCount = self.WriteCount
+        self.LastSampleTime = None
+
+    def sample(self):
+        """Reads the joystick and adds a sample"""
+        joystick = RuntimeVariables.JoystickObject
+        if joystick is None:
+            return
+        now = self.Clock.now()
+        try:
+            pygame.event.pump()
+            if RuntimeVariables.InputLatencyRecorder:
+                RuntimeVariables.InputLatencyRecorder.poll()
+            axisX = joystick.get_axis(0)
+            axisY = joystick.get_axis(1)
+            buttons = 0
+            for button in range(min(joystick.get_numbuttons(), 32)):
+                if joystick.get_button(button):
+                    buttons |= 1 << button
+        except (pygame.error, NameError, AttributeError):
+            # prevent the program crashing when no joystick is connected
+            return
+        index = self.WriteCount % self.Capacity
+        self.Times[index] = now
+        self.AxisX[index] = axisX
+        self.AxisY[index] = axisY
+        self.Buttons[index] = buttons
+        self.TrialNumbers[index] = RuntimeVariables.TrialNumber
+        self.WriteCount += 1
+        if self.LastSampleTime is not None:
+            self.MaxSampleGap = max(self.MaxSampleGap, now - self.LastSampleTime)
+            self.SamplesInTrials += 1
+            self.SamplingTime += now - self.LastSampleTime
+        self.LastSampleTime = now
+
+    def sleepUntil(self, deadline):
+        """Waits until the deadline like the clock and samples the joystick meanwhile and at the deadline"""
+        if self.SampleWhileWaiting and self.LastSampleTime is not None:
+            nextSampleTime = self.LastSampleTime + self.SampleInterval
+            while nextSampleTime < deadline - Constants.SleepSpinTime:
+                # the samples are timestamped, so they need not be taken exactly on time
+                remaining = nextSampleTime - self.Clock.now()
+                if remaining > 0:
+                    time.sleep(remaining)
+                self.sample()
+                nextSampleTime = self.LastSampleTime + self.SampleInterval
+        self.Clock.sleepUntil(deadline)
+        self.sample()
+
+    def consumeSamples(self, untilTime):
+        """
+        Returns the time and the axis values of the samples since the last call up to untilTime, but at most the samples in the
+        ring buffer. A sample is taken when the waiting returns, which can be after the deadline, such samples are left for the next call.
+        """
+        writeCount = self.WriteCount
+        count = max(self.ConsumeCount, writeCount - self.Capacity)
+        while count < writeCount:
+            index = count % self.Capacity
+            if self.Times[index] > untilTime:
+                break
+            count += 1
+            self.ConsumeCount = count
+            yield self.Times[index], self.AxisX[index], self.AxisY[index]
+        self.ConsumeCount = count
+
+    def writeLog(self):
+        writeCount = self.WriteCount
+        if writeCount - self.LogCount > self.Capacity:
+            self.LostSamples += writeCount - self.Capacity - self.LogCount
+            self.LogCount = writeCount - self.Capacity
+        lines = []
+        for count in range(self.LogCount, writeCount):
+            index = count % self.Capacity
+            lines.append(f"{round((self.Times[index] - RuntimeVariables.StartTimeOfFirstExperiment) * 1000000) / 1000000};{self.TrialNumbers[index]};"
+                         f"{self.AxisX[index]};{self.AxisY[index]};{self.Buttons[index]}\n")
+        self.LogCount = writeCount
+        if lines:
+            self.InputFile.write("".join(lines))
+            self.InputFile.flush()
+
+    def runLog(self):
+        while not self.StopLogging.wait(0.1):
+            self.writeLog()
+
+    def close(self):
+        self.StopLogging.set()
+        self.LogThread.join()
+        self.writeLog()
+        self.InputFile.close()
+        meanRate = self.SamplesInTrials / self.SamplingTime if self.SamplingTime > 0 else 0
+        message = f"Joystick sampler: {self.WriteCount} samples, {meanRate:.0f} per second in the trials (target {1.0 / self.SampleInterval:.0f}), " \
+                  f"longest gap {1000 * self.MaxSampleGap:.1f} ms, {self.LostSamples} samples lost before they were saved"
+        print(message)
+        writeLogFile(message)
+
+
+class InputLatencyRecorder:
+    """
+    Measures the latency of the inputs in the trials: for each input the time it happened, the time it was taken from the event
+    queue, the time the state was updated and the time the display update showing it returned.
+    pygame events carry no timestamp, so an input is assumed to have happened at the previous poll of the events, i.e. the latency
+    is an upper bound (simulated inputs carry their time as EventTime). Joystick samples are their own event and dequeue time.
+    The inputs are written to the latency log at the end of each trial, together with the percentiles in the summary file.
+    """
+    Columns = ["TrialNumber", "Input", "Value", "EventTime", "DequeueTime", "StateUpdateTime", "DisplayTime", "LatencyMs", "SyncPatch"]
+    SummaryColumns = ["TrialNumber", "Input", "Inputs", "NotDisplayed", "LatencyP50Ms", "LatencyP95Ms", "LatencyP99Ms", "LatencyMaxMs",
+                      "QueueDelayP50Ms", "HandlingTimeP50Ms", "DisplayDelayP50Ms"]
+    EventInputs = {pygame.KEYDOWN: "key", pygame.JOYBUTTONDOWN: "buttonDown", pygame.JOYBUTTONUP: "buttonUp",
+                   pygame.JOYAXISMOTION: "joystickAxis", pygame.MOUSEBUTTONDOWN: "mouse"}
+
+    def __init__(self, clock, fileName, summaryFileName, append=False):
+        self.Clock = clock
+        self.LogFile = open(fileName, 'a' if append else 'w')
+        self.SummaryFile = open(summaryFileName, 'a' if append else 'w')
+        if not append:
+            self.LogFile.write(";".join(self.Columns) + "\n")
+            self.SummaryFile.write(";".join(self.SummaryColumns) + "\n")
+        self.Inputs = []  # [input, value, eventTime, dequeueTime, stateUpdateTime, displayTime, syncPatch] of the current trial
+        self.FirstUndisplayedInput = 0
+        self.LastPollTime = clock.now()
+        self.SyncPatchOn = False
+        self.SyncPatchShownOn = None  # the sync patch color in the last display update
+        self.TrialActive = False
+        self.TotalInputs = 0
+
+    def startTrial(self):
+        self.Inputs.clear()
+        self.FirstUndisplayedInput = 0
+        self.TrialActive = True
+        self.SyncPatchShownOn = None  # the sync patch is drawn again
+
+    def poll(self):
+        """Called when the events are polled, returns the earliest time at which the polled events can have happened"""
+        now = self.Clock.now()
+        previousPollTime = self.LastPollTime
+        self.LastPollTime = now
+        return previousPollTime
+
+    def addEvent(self, event, pollTime):
+        """Adds an input from the event queue, the state is updated when stateUpdated() is called"""
+        if not self.TrialActive:
+            return
+        inputName = self.EventInputs.get(event.type)
+        if inputName is None or (event.type == pygame.JOYAXISMOTION and RuntimeVariables.JoystickSampler):
+            return
+        if event.type == pygame.KEYDOWN:
+            value = event.unicode
+        elif event.type == pygame.JOYAXISMOTION:
+            value = round(event.value, 3)
+        else:
+            value = event.button
+        eventTime = getattr(event, "EventTime", pollTime)
+        self.Inputs.append([inputName, value, eventTime, self.Clock.now(), None, None, None])
+
+    def addJoystickSample(self, sampleTime, axisX, axisY):
+        """Adds a joystick sample that changed the axes, it is applied to the cursor immediately"""
+        if self.TrialActive:
+            self.Inputs.append(["joystickSample", f"{axisX:.3f}/{axisY:.3f}", sampleTime, sampleTime, self.Clock.now(), None, None])
+
+    def stateUpdated(self):
+        """The added inputs have been handled"""
+        now = self.Clock.now()
+        firstIndex = len(self.Inputs)
+        while firstIndex > self.FirstUndisplayedInput and self.Inputs[firstIndex - 1][4] is None:
+            firstIndex -= 1
+        for entry in self.Inputs[firstIndex:]:  # in the order of the inputs, so the last one has the color that is shown
+            entry[4] = now
+            if entry[0] != "joystickAxis" and ExperimentSettings.LatencySyncPatch:
+                self.SyncPatchOn = not self.SyncPatchOn
+                entry[6] = int(self.SyncPatchOn)
+
+    def drawSyncPatch(self):
+        """Draws the sync patch before a display update"""
+        if not (self.TrialActive and ExperimentSettings.LatencySyncPatch):
+            return
+        size = Constants.LatencySyncPatchSize
+        y = RuntimeVariables.Screen.get_height() - size
+        if self.SyncPatchOn != self.SyncPatchShownOn or RuntimeVariables.FullScreenDirty:
+            RuntimeVariables.Screen.fill((255, 255, 255) if self.SyncPatchOn else (0, 0, 0), (0, y, size, size))
+            markDirty(0, y, size, size)
+            self.SyncPatchShownOn = self.SyncPatchOn
+
+    def displayUpdated(self):
+        """The display update has returned, it shows all inputs whose state is updated"""
+        if not self.TrialActive:
+            return
+        now = self.Clock.now()
+        index = self.FirstUndisplayedInput
+        while index < len(self.Inputs) and self.Inputs[index][4] is not None:
+            self.Inputs[index][5] = now
+            index += 1
+        self.FirstUndisplayedInput = index
+
+    def endTrial(self):
+        """Writes the inputs of the trial and their percentiles"""
+        self.TrialActive = False
+        startTime = RuntimeVariables.StartTimeOfFirstExperiment
+        lines = []
+        latencies = collections.defaultdict(list)
+        notDisplayed = collections.Counter()
+        for inputName, value, eventTime, dequeueTime, stateUpdateTime, displayTime, syncPatch in self.Inputs:
+            times = [eventTime, dequeueTime, stateUpdateTime, displayTime]
+            if displayTime is None or stateUpdateTime is None:
+                notDisplayed[inputName] += 1
+                latency = ""
+            else:
+                latencies[inputName].append(times)
+                latency = round((displayTime - eventTime) * 1000, 3)
+            lines.append(f"{RuntimeVariables.TrialNumber};{inputName};{value};"
+                         + ";".join("" if t is None else str(round((t - startTime) * 1000000) / 1000000) for t in times)
+                         + f";{latency};{'' if syncPatch is None else syncPatch}\n")
+        self.LogFile.write("".join(lines))
+        self.LogFile.flush()
+        self.TotalInputs += len(self.Inputs)
+
+        messages = []
+        for inputName in sorted(set(latencies) | set(notDisplayed)):
+            times = numpy.array(latencies[inputName]).reshape(-1, 4) * 1000
+            if len(times):
+                latency = numpy.percentile(times[:, 3] - times[:, 0], [50, 95, 99, 100])
+                delays = [numpy.median(times[:, 1] - times[:, 0]), numpy.median(times[:, 2] - times[:, 1]), numpy.median(times[:, 3] - times[:, 2])]
+                values = [f"{value:.3f}" for value in list(latency) + delays]
+                messages.append(f"{inputName} {latency[0]:.1f}/{latency[1]:.1f}/{latency[3]:.1f} ms")
+            else:
+                values = [""] * 7
+            self.SummaryFile.write(f"{RuntimeVariables.TrialNumber};{inputName};{len(times)};{notDisplayed[inputName]};" + ";".join(values) + "\n")
+        self.SummaryFile.flush()
+        if messages:
+            message = "Input latency (median/95th percentile/max): " + ", ".join(messages)
+            print(message)
+            writeLogFile(message)
+
+    def close(self):
+        if self.TrialActive:
+            self.endTrial()
+        self.LogFile.close()
+        self.SummaryFile.close()
+        message = f"Input latency: {self.TotalInputs} inputs logged"
+        print(message)
+        writeLogFile(message)
+
+
+class HotPathProfiler:
+    """
+    Measures the calls of the functions of the trial loops: the number of calls and the total and longest wall time per trial with
+    perf_counter_ns, including the functions they call, and with ExperimentSettings.ProfileAllocations the net growth of the memory
+    traced by tracemalloc during the calls (negative if they freed more than they allocated).
+    install() replaces the module functions with wrappers, so the functions are only profiled in sessions where it is switched on.
+    The overhead of a trial is estimated from the time the wrapper adds to a call and, while the allocations are traced, from the
+    slowdown of tracemalloc, both measured at the start. If it exceeds ExperimentSettings.ProfilingOverheadLimit, the allocations
+    are no longer traced. The functions of each trial and of the whole session are written to the profile file.
+    """
+    FunctionNames = ["updateCursor", "checkKeyPressed", "writeOutputDataFile", "drawTrackingWindow", "drawTypingWindow",
+                     "DisplayLiveFeedbackParallelDualTasks", "GetTypingTaskNumbers", "calculateRmse"]
+    Columns = ["TrialNumber", "Function", "Calls", "TotalMs", "MeanUs", "MaxMs", "MemoryGrowthKB"]
+
+    def __init__(self, fileName, append=False):
+        self.Entries = {}  # [calls, total ns, max ns, memory growth in bytes] of the current trial by function name
+        self.SessionEntries = {name: [0, 0, 0, 0] for name in self.FunctionNames}
+        self.CallDepth = 0
+        self.OuterCallTime = 0  # ns in the profiled functions of the current trial, without the calls between them
+        self.TraceAllocations = ExperimentSettings.ProfileAllocations
+        self.TracingSlowdown = self.measureTracingSlowdown() if self.TraceAllocations else 1
+        if self.TraceAllocations:
+            tracemalloc.start()
+        self.CallOverhead = self.measureCallOverhead()
+        self.TrialStartTime = time.perf_counter_ns()
+        self.SessionOverhead = 0
+        self.SessionTime = 0
+        self.ReportFile = open(fileName, 'a' if append else 'w')
+        if not append:
+            self.ReportFile.write(";".join(self.Columns) + "\n")
+
+    def wrap(self, name, function):
+        entry = self.Entries[name] = [0, 0, 0, 0]
+        perfCounter = time.perf_counter_ns
+        getTracedMemory = tracemalloc.get_traced_memory
+        profiler = self
+
+        @functools.wraps(function)
+        def profiled(*args, **kwargs):
+            traceAllocations = profiler.TraceAllocations
+            if traceAllocations:
+                memoryBefore = getTracedMemory()[0]
+            profiler.CallDepth += 1
+            start = perfCounter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                elapsed = perfCounter() - start
+                profiler.CallDepth -= 1
+                if profiler.CallDepth == 0:
+                    profiler.OuterCallTime += elapsed
+                entry[0] += 1
+                entry[1] += elapsed
+                if elapsed > entry[2]:
+                    entry[2] = elapsed
+                if traceAllocations:
+                    entry[3] += getTracedMemory()[0] - memoryBefore
+        return profiled
+
+    def install(self):
+        module = globals()
+        for name in self.FunctionNames:
+            module[name] = self.wrap(name, module[name])
+
+    def measureCallOverhead(self, calls=20000):
+        """Returns the nanoseconds the wrapper adds to a call"""
+        def emptyFunction():
+            pass
+        profiled = self.wrap("calibration", emptyFunction)
+        start = time.perf_counter_ns()
+        for _ in range(calls):
+            emptyFunction()
+        directTime = time.perf_counter_ns() - start
+        start = time.perf_counter_ns()
+        for _ in range(calls):
+            profiled()
+        profiledTime = time.perf_counter_ns() - start
+        del self.Entries["calibration"]
+        self.OuterCallTime = 0
+        return max(profiledTime - directTime, 0) / calls
+
+    @staticmethod
+    def measureTracingSlowdown(repetitions=3000):
+        """Returns how many times slower a loop that allocates like the trial loop (numbers formatted into rows) runs with tracemalloc"""
+        def allocatingLoop():
+            start = time.perf_counter_ns()
+            for repetition in range(repetitions):
+                values = [repetition * 0.25, [repetition, repetition + 1], str(repetition), {"key": repetition}] * 5
+                ";".join(map(str, values))
+            return time.perf_counter_ns() - start
+        untracedTime = allocatingLoop()
+        tracemalloc.start()
+        tracedTime = allocatingLoop()
+        tracemalloc.stop()
+        return max(tracedTime / max(untracedTime, 1), 1)
+
+    def startTrial(self):
+        for entry in self.Entries.values():
+            entry[:] = [0, 0, 0, 0]
+        self.OuterCallTime = 0
+        self.TrialStartTime = time.perf_counter_ns()
+
+    @staticmethod
+    def formatEntry(trialNumber, name, entry):
+        calls, totalTime, maxTime, memoryGrowth = entry
+        meanTime = totalTime / calls / 1000 if calls else 0
+        return f"{trialNumber};{name};{calls};{totalTime / 1000000:.3f};{meanTime:.1f};{maxTime / 1000000:.3f};{memoryGrowth / 1024:.1f}\n"
+
+    def endTrial(self):
+        """Writes the functions of the trial and checks the overhead"""
+        trialTime = time.perf_counter_ns() - self.TrialStartTime
+        lines = []
+        calls = 0
+        for name in self.FunctionNames:
+            entry = self.Entries[name]
+            sessionEntry = self.SessionEntries[name]
+            sessionEntry[0] += entry[0]
+            sessionEntry[1] += entry[1]
+            sessionEntry[2] = max(sessionEntry[2], entry[2])
+            sessionEntry[3] += entry[3]
+            calls += entry[0]
+            if entry[0]:
+                lines.append(self.formatEntry(RuntimeVariables.TrialNumber, name, entry))
+        overhead = calls * self.CallOverhead
+        if self.TraceAllocations:
+            # the profiled functions would have taken this share of their time without tracemalloc
+            overhead += self.OuterCallTime * (1 - 1 / self.TracingSlowdown)
+        lines.append(f"{RuntimeVariables.TrialNumber};(profiler overhead);{calls};{overhead / 1000000:.3f};{self.CallOverhead / 1000:.1f};;\n")
+        self.ReportFile.write("".join(lines))
+        self.ReportFile.flush()
+        self.SessionOverhead += overhead
+        self.SessionTime += trialTime
+
+        if self.TraceAllocations and trialTime > 0 and overhead / trialTime > ExperimentSettings.ProfilingOverheadLimit:
+            message = f"Profiling overhead of trial {RuntimeVariables.TrialNumber} was {100 * overhead / trialTime:.1f}% of the trial time " \
+                      f"(tracemalloc slows down allocations {self.TracingSlowdown:.1f} times), the allocations are no longer traced"
+            self.TraceAllocations = False
+            tracemalloc.stop()
+            self.CallOverhead = self.measureCallOverhead()
+            print(message)
+            writeLogFile(message)
+
+    def close(self):
+        lines = [self.formatEntry("session", name, self.SessionEntries[name]) for name in self.FunctionNames]
+        self.ReportFile.write("".join(lines))
+        self.ReportFile.close()
+        if self.TraceAllocations:
+            tracemalloc.stop()
+        overheadShare = 100 * self.SessionOverhead / self.SessionTime if self.SessionTime else 0
+        slowestFunctions = sorted(self.FunctionNames, key=lambda name: self.SessionEntries[name][1], reverse=True)[:3]
+        message = f"Hot path profiling: estimated overhead {overheadShare:.2f}% of the trial time, most time in " + \
+                  ", ".join(f"{name} {self.SessionEntries[name][1] / 1000000000:.2f} s" for name in slowestFunctions)
+        print(message)
+        writeLogFile(message)
 
 
 class RuntimeVariables:
@@ -96,8 +957,9 @@ class RuntimeVariables:
     CirclesSmall = []
     CirclesBig = []
     CirclesPractice = []
-    CumulatedTrackingScoreForParallelDualTasks = 0
+    Clock = MonotonicClock()  # all times are measured with this clock
     CurrentCircles = []  # is set for each condition
+    CurrentCircleSet = None  # index of CurrentCircles, see getCurrentCircleSet()
     CurrentTypingTaskNumbers = ""
     CurrentTypingTaskNumbersLength = 1
     CurrentTaskType = None
@@ -106,28 +968,42 @@ class RuntimeVariables:
     CorrectlyTypedDigitsVisit = 0
     CurrentCondition = ""
     CursorCoordinates = Vector2D(Constants.TrackingWindowMiddleX, Constants.TrackingWindowMiddleY)
-    CursorDistancesToMiddle = []
+    CursorDisplayCoordinates = Vector2D(Constants.TrackingWindowMiddleX, Constants.TrackingWindowMiddleY)  # where the cursor is drawn in the current frame
+    CursorPhysics = None  # moves the cursor, is created for each trial
+    RandomStreams = None  # random streams of the current trial
     DictTrialListEntries = {}
-    DigitPressTimes = []
     DisableCorrectTypingScoreOutsideCircle = False
     DisplayScoreForNormalTrials = False
     DisplayScoreForPracticeTrials = False
+    DirtyRectangles = []  # areas of the screen changed since the last display update (RenderingMode.DirtyRectangles)
     DisplayTypingTaskWithinCursor = False
     EnteredDigitsStr = ""
     EnvironmentIsRunning = False
     FeedbackMode = None
+    FullScreenDirty = True  # the next display update must update the whole screen
     IncorrectlyTypedDigitsTrial = 0
     IncorrectlyTypedDigitsVisit = 0
     JoystickAxis = Vector2D(0, 0)  # the motion of the joystick
     JoystickObject = None
-    LengthOfPathTracked = 0
+    JoystickSampler = None  # is created with the output files if ExperimentSettings.JoystickSamplingRate is set
+    InputLatencyRecorder = None  # is created with the output files if ExperimentSettings.InputLatencyLogging is set
+    FrameTimingRecorder = None  # is created with the output files if ExperimentSettings.FrameTimingRecording is set
+    ProfileHotPaths = False
+    HotPathProfiler = None  # is created with the output files if ProfileHotPaths is set
+    LayerCache = None  # is created when the display is initialized
     NumberOfCircleExits = 0
     OutputDataFile = None
     OutputDataFileTrialEnd = None
+    OutputDataWriter = None
+    OutputRowEncoder = None  # builds the rows of the output data files, is created with the files
+    OutputDirectory = ""  # prefix for the output data files, e.g. a directory ending with a separator
+    ResumeSession = False  # continue the last session of the participant after its last completed trial, see resumeSession()
+    DisturbanceDirectory = None  # the disturbances of the trials are saved here
     ParallelDualTasks = False
     Penalty = None
     PenaltyPracticeTrials = None
     PenaltyAmount = 0
+    RenderStatistics = None  # is created when the display is initialized
     RunningOrder = []
     RunPracticeTrials = True
     ShowOnlyGetReadyMessage = False
@@ -136,16 +1012,27 @@ class RuntimeVariables:
     DualTaskScoreOverAllConditions = []
     Screen = None
     StandardDeviationOfNoise = None
-    StartTimeCurrentTrial = time.time()
-    StartTimeOfFirstExperiment = time.time()
+    TextCache = None  # is created when the display is initialized
+    ScreenCache = None  # is created when the display is initialized, the screens are compiled before the session
+    MessageScheduler = None  # is created when the display is initialized
+    TrialWarmUp = None  # preparation of the next trial, see scheduleTrialWarmUp()
+    CurrentTrialSpec = None  # the TrialSpec of the session plan which is run
+    StartTimeCurrentTrial = 0
+    StartTimeOfFirstExperiment = 0
     ParticipantNumber = "0"
+    TrackingStatistics = TrackingStatisticsAccumulator(Constants.TrackingWindowMiddleX, Constants.TrackingWindowMiddleY)  # is reset for each trial
+    TrialSamples = TrialSampleBuffers()  # the samples and key press times of the current trial, is reset for each trial
+    ScoreEngine = ParallelDualTaskScoreEngine()  # scores of parallel dual tasks, is reset for each trial
     TrackingTaskPresent = False
+    TrackingWindowDrawnRects = []  # areas drawn over the tracking window background since it was drawn the last time
     TrackingWindowEntryCounter = 0
     TrackingWindowVisible = False
     TrialNumber = 0
+    TrialScheduler = None  # paces the current trial
     TrialScore = 0
     TypingPenaltyIncorrectDigit = 5
     TypingRewardCorrectDigit = 0
+    TypingTextRect = None  # area of the typing task numbers drawn the last time
     TypingTaskPresent = False
     TypingWindowEntryCounter = 0
     TypingWindowVisible = False
@@ -192,6 +1079,29 @@ class Block:
         self.NumberOfTrials = numberOfTrials
 
 
+class TrialFeedback(Enum):
+    """
+    Used to represent the feedback which is shown after a trial.
+    Do not modify anything here!
+    """
+    NoFeedback = 1
+    ParallelDualTasks = 2  # DisplayFeedbackParallelDualTasksAfterTrial()
+    SwitchingDualTask = 3  # DisplayFeedbackSwitchingDualTaskAfterTrial()
+
+
+class TrialSpec(collections.namedtuple("TrialSpec", [
+        "PlanIndex", "ConditionNumber", "IsPracticeTrial", "TaskType", "BlockNumber", "TrialNumber", "TrialInBlock", "NumberOfTrialsInBlock",
+        "CircleSize", "StandardDeviationOfNoise", "Penalty", "PenaltyAmount", "TypingRewardCorrectDigit", "TrialDuration",
+        "SessionMessagesBefore", "BlockMessages", "BlockIntroductionMessages", "FeedbackAfterTrial", "ConditionScoreAfterTrial",
+        "RandomStreamsKey", "TrialSeed"])):
+    """
+    Everything a trial of the session is run with. The specs are compiled before the session by compileSessionPlan().
+    ConditionNumber is 0 for the practice trials, CircleSize is "practice", "small" or "big".
+    The messages are tuples of (message, displayTime) and are only set for the first trial of a block.
+    """
+    __slots__ = ()
+
+
 class Circle:
     """
     Used to represent a circle.
@@ -209,30 +1119,97 @@ class Circle:
         self.BorderColor = borderColor
 
 
-def CalculateFeedbackParallelDualTasks():
-    factorTyping = 1.0
-    typingScore = factorTyping * RuntimeVariables.CorrectlyTypedDigitsVisit  # One Visit equals one Trial in parallel dual tasks
-    typingScore = int(typingScore)  # cut all decimal places
-
-    factorTracking = 1.0
-    trackingScore = calculateRmse()
-    if trackingScore > 0:  # avoid division by zero!
-        trackingScore = factorTracking * (1.0 / trackingScore)  # Invert RMSE as a higher score should be better.
-
-    # For live feedback, the tracking score must increase over time. To be compareable, it should be calculated the same way for non-live feedback.
-    RuntimeVariables.CumulatedTrackingScoreForParallelDualTasks += trackingScore
-    cumulatedTrackingScore = int(RuntimeVariables.CumulatedTrackingScoreForParallelDualTasks)
-
-    combinedScore = (typingScore + RuntimeVariables.CumulatedTrackingScoreForParallelDualTasks) / 2.0
-    combinedScore = int(combinedScore)  # cut all decimal places
-
-    return typingScore, cumulatedTrackingScore, combinedScore  # return a three-tuple with all feedback
+class CircleSet:
+    """
+    Index of the circles of a condition, to find the circle of a position in constant time without allocations.
+    The positions are divided into zones by the squared distance to the middle: zone k (k < number of circles) lies between
+    the k-th and the (k+1)-th smallest radius, zone number of circles is exactly on the largest radius, the next zone is outside.
+    With a lookup table, the zone of each pixel of the lookup rectangle is stored, if the whole pixel lies in one zone.
+    """
+    NoZone = 255  # the pixel lies in more than one zone
+
+    def __init__(self, circles, middleX, middleY, lookupTableCorner=None, lookupTableSize=None):
+        self.Circles = circles
+        self.MiddleX = middleX
+        self.MiddleY = middleY
+        self.SquaredRadii = sorted(circle.Radius ** 2 for circle in circles)
+        self.SquaredOuterRadius = self.SquaredRadii[-1] if circles else None
+        self.OutsideZone = len(circles) + 1
+
+        # the circle for the typing task numbers is the first circle in the list that contains the position,
+        # the positions of zone k are contained by all circles with a squared radius of at least the k-th smallest one
+        self.ZoneCircles = [None] * (self.OutsideZone + 1)
+        for zone in range(len(circles)):
+            self.ZoneCircles[zone] = next(circle for circle in circles if circle.Radius ** 2 >= self.SquaredRadii[zone])
+
+        self.LookupTable = None
+        if lookupTableCorner and lookupTableSize and circles:
+            self.createLookupTable(lookupTableCorner, lookupTableSize)
+
+    def createLookupTable(self, corner, size):
+        self.LookupTableLeft = corner.X
+        self.LookupTableTop = corner.Y
+        self.LookupTableWidth = size.X
+        self.LookupTableHeight = size.Y
+
+        def getDistanceRange(start, length, middle):
+            """The smallest and largest absolute distance to the middle within each pixel of a row or column"""
+            pixelStarts = numpy.arange(length, dtype=float) + start
+            distancesStart = numpy.abs(pixelStarts - middle)
+            distancesEnd = numpy.abs(pixelStarts + 1 - middle)
+            containsMiddle = (pixelStarts <= middle) & (middle < pixelStarts + 1)
+            return numpy.where(containsMiddle, 0.0, numpy.minimum(distancesStart, distancesEnd)), numpy.maximum(distancesStart, distancesEnd)
+
+        minimumX, maximumX = getDistanceRange(self.LookupTableLeft, self.LookupTableWidth, self.MiddleX)
+        minimumY, maximumY = getDistanceRange(self.LookupTableTop, self.LookupTableHeight, self.MiddleY)
+        zonesMinimum = self.getZonesOfSquaredDistances(minimumY[:, None] ** 2 + minimumX[None, :] ** 2)
+        zonesMaximum = self.getZonesOfSquaredDistances(maximumY[:, None] ** 2 + maximumX[None, :] ** 2)
+        zones = numpy.where(zonesMinimum == zonesMaximum, zonesMinimum, self.NoZone).astype(numpy.uint8)
+        self.LookupTable = zones.tobytes()
+
+    def getZonesOfSquaredDistances(self, squaredDistances):
+        zones = numpy.searchsorted(numpy.array(self.SquaredRadii, dtype=float), squaredDistances, side="right")
+        return zones + (squaredDistances > self.SquaredOuterRadius)
+
+    def getZone(self, x, y):
+        if self.LookupTable is not None:
+            offsetX = x - self.LookupTableLeft
+            offsetY = y - self.LookupTableTop
+            if 0 <= offsetX < self.LookupTableWidth and 0 <= offsetY < self.LookupTableHeight:
+                zone = self.LookupTable[int(offsetY) * self.LookupTableWidth + int(offsetX)]
+                if zone != self.NoZone:
+                    return zone
+        offsetX = x - self.MiddleX
+        offsetY = y - self.MiddleY
+        squaredDistance = offsetX * offsetX + offsetY * offsetY
+        return bisect.bisect_right(self.SquaredRadii, squaredDistance) + (squaredDistance > self.SquaredOuterRadius)
+
+    def getCircle(self, x, y):
+        """Returns the first circle in the list that contains the position, or None"""
+        if not self.Circles:
+            return None
+        return self.ZoneCircles[self.getZone(x, y)]
+
+    def isOutside(self, x, y):
+        """Returns True if the position is outside of the largest circle"""
+        return bool(self.Circles) and self.getZone(x, y) == self.OutsideZone
+
+
+def getCurrentCircleSet():
+    """Returns the CircleSet of RuntimeVariables.CurrentCircles. It is built again when another list of circles is set."""
+    if RuntimeVariables.CurrentCircleSet is None or RuntimeVariables.CurrentCircleSet.Circles is not RuntimeVariables.CurrentCircles:
+        if ExperimentSettings.CircleZoneLookupTable:
+            RuntimeVariables.CurrentCircleSet = CircleSet(RuntimeVariables.CurrentCircles, Constants.TrackingWindowMiddleX, Constants.TrackingWindowMiddleY,
+                                                          Constants.TopLeftCornerOfTrackingTaskWindow, ExperimentSettings.TaskWindowSize)
+        else:
+            RuntimeVariables.CurrentCircleSet = CircleSet(RuntimeVariables.CurrentCircles, Constants.TrackingWindowMiddleX, Constants.TrackingWindowMiddleY)
+    return RuntimeVariables.CurrentCircleSet
 
 
 def DisplayLiveFeedbackParallelDualTasks(taskType: TaskTypes):
     if not RuntimeVariables.ParallelDualTasks:
         raise Exception("Should not display scores for parallel dual task experiments in switching dual task setup")
-    scores = CalculateFeedbackParallelDualTasks()
+    scores = RuntimeVariables.ScoreEngine.Scores
     typingScore = scores[0]
     trackingScore = scores[1]
     combinedScore = scores[2]
@@ -260,22 +1237,22 @@ def DisplayLiveFeedbackParallelDualTasks(taskType: TaskTypes):
 
     top = Constants.OffsetTaskWindowsTop - boxHeight - 10
     if not taskType == TaskTypes.DualTask or RuntimeVariables.CombinedFeedback or RuntimeVariables.DisplayTypingTaskWithinCursor:
-        bg = pygame.Surface((boxWidth, boxHeight)).convert()
-        bg.fill(ExperimentSettings.BackgroundColorTaskWindows)
+        bg = RuntimeVariables.LayerCache.getFilledSurface(boxWidth, boxHeight, ExperimentSettings.BackgroundColorTaskWindows)
         RuntimeVariables.Screen.blit(bg, (offsetLeft, top))
+        markDirty(offsetLeft, top, boxWidth, boxHeight)
         printTextOverMultipleLines(text, Vector2D(offsetLeft + 10, top + 10))
     elif taskType == TaskTypes.DualTask and not RuntimeVariables.CombinedFeedback:
         # draw typing feedback box
         offsetLeft = ((Constants.TopLeftCornerOfTypingTaskWindow.X + ExperimentSettings.TaskWindowSize.X) / 2) - (boxWidth / 2)
-        bg = pygame.Surface((boxWidth, boxHeight)).convert()
-        bg.fill(ExperimentSettings.BackgroundColorTaskWindows)
+        bg = RuntimeVariables.LayerCache.getFilledSurface(boxWidth, boxHeight, ExperimentSettings.BackgroundColorTaskWindows)
         RuntimeVariables.Screen.blit(bg, (offsetLeft, top))
+        markDirty(offsetLeft, top, boxWidth, boxHeight)
         printTextOverMultipleLines(text[0], Vector2D(offsetLeft + 10, top + 10))
         # draw tracking feedback box
         offsetLeft = Constants.TopLeftCornerOfTrackingTaskWindow.X + (ExperimentSettings.TaskWindowSize.X / 2) - (boxWidth / 2)
-        bg = pygame.Surface((boxWidth, boxHeight)).convert()
-        bg.fill(ExperimentSettings.BackgroundColorTaskWindows)
+        bg = RuntimeVariables.LayerCache.getFilledSurface(boxWidth, boxHeight, ExperimentSettings.BackgroundColorTaskWindows)
         RuntimeVariables.Screen.blit(bg, (offsetLeft, top))
+        markDirty(offsetLeft, top, boxWidth, boxHeight)
         printTextOverMultipleLines(text[1], Vector2D(offsetLeft + 10, top + 10))
     else:
         raise Exception("Unknown parallel dual task live feedback mode")
@@ -288,7 +1265,7 @@ def DisplayFeedbackParallelDualTasksAfterTrial():
     """
     if not RuntimeVariables.ParallelDualTasks:
         raise Exception("Should not display scores for parallel dual task experiments in switching dual task setup")
-    scores = CalculateFeedbackParallelDualTasks()
+    scores = RuntimeVariables.ScoreEngine.Scores
     typingScore = scores[0]
     trackingScore = scores[1]
     combinedScore = scores[2]
@@ -333,7 +1310,8 @@ def DisplayFeedbackSwitchingDualTaskAfterTrial():
 
     elif RuntimeVariables.CurrentTaskType == TaskTypes.SingleTyping:
         feedbackText = "Anzahl Fehler: \n"
-        digitScore = RuntimeVariables.DigitPressTimes[-1] - RuntimeVariables.DigitPressTimes[0]
+        keyPressTimes = RuntimeVariables.TrialSamples.getKeyPressTimes()
+        digitScore = keyPressTimes[-1] - keyPressTimes[0]
         digitScore = scipy.special.round(digitScore * 10) / 10  # round values
         feedbackText += "\n\n" + str(RuntimeVariables.IncorrectlyTypedDigitsTrial) + " Fehler"
         scoreForLogging = digitScore
@@ -345,49 +1323,29 @@ def DisplayFeedbackSwitchingDualTaskAfterTrial():
 def calculateRmse():
     """
     The RMSE is calculated from all collected distances in this trial.
-    The distances are collected each time the cursor changes its position.
+    The distances are collected each time the cursor changes its position, the sum of squares is kept up to date in RuntimeVariables.TrackingStatistics.
     The RMSE is calculated every time the data file is written.
     """
-    n = len(RuntimeVariables.CursorDistancesToMiddle)
-    if n == 0:
-        return 0
-    square = 0
-
-    # Calculate square
-    for val in RuntimeVariables.CursorDistancesToMiddle:
-        square += val * val
-
-    # Calculate Mean
-    mean = (square / float(n))
-    # Calculate Root
-    root = math.sqrt(mean)
-    return root
-
-
-def checkMouseClicked():
-    for event in pygame.event.get():
-        if event.type == pygame.QUIT:
-            quitApp()
-        elif event.type == pygame.MOUSEBUTTONDOWN:
-            pos = pygame.mouse.get_pos()
-            posString = str(pos[0]) + "_" + str(pos[1])
-            writeOutputDataFile("MousePressed", posString)
-            return pos[0], pos[1]
-    return False
+    return RuntimeVariables.TrackingStatistics.getRmse()
 
 
 def checkKeyPressed():
+    latencyRecorder = RuntimeVariables.InputLatencyRecorder
+    if latencyRecorder:
+        pollTime = latencyRecorder.poll()
     for event in pygame.event.get():
+        if latencyRecorder:
+            latencyRecorder.addEvent(event, pollTime)
         if event.type == pygame.MOUSEBUTTONDOWN and RuntimeVariables.TrackingWindowVisible:
             pos = pygame.mouse.get_pos()
-            RuntimeVariables.CursorCoordinates = Vector2D(pos[0], pos[1])
+            RuntimeVariables.CursorCoordinates.set(pos[0], pos[1])
         elif event.type == pygame.QUIT:
             quitApp()
         elif event.type == pygame.JOYAXISMOTION:
-            if RuntimeVariables.TrackingTaskPresent:
+            if RuntimeVariables.TrackingTaskPresent and not RuntimeVariables.JoystickSampler:
                 # values between -1 and 1. (-1,-1) top left corner, (1,-1) top right; (-1,1) bottom left, (1,1) bottom right
                 try:
-                    RuntimeVariables.JoystickAxis = Vector2D(RuntimeVariables.JoystickObject.get_axis(0), RuntimeVariables.JoystickObject.get_axis(1))
+                    RuntimeVariables.JoystickAxis.set(RuntimeVariables.JoystickObject.get_axis(0), RuntimeVariables.JoystickObject.get_axis(1))
                 except (pygame.error, NameError, AttributeError):
                     # prevent the program crashing when no joystick is connected
                     pass
@@ -418,7 +1376,7 @@ def checkKeyPressed():
                 dualTaskParallel = RuntimeVariables.TypingTaskPresent and not RuntimeVariables.TypingWindowVisible and RuntimeVariables.ParallelDualTasks
                 if singleTypingTask or dualTaskWithSwitching or dualTaskParallel:
                     key = event.unicode
-                    RuntimeVariables.DigitPressTimes.append(time.time())
+                    RuntimeVariables.TrialSamples.addKeyPress(RuntimeVariables.Clock.now())
 
                     isCorrectKeyPress = key == RuntimeVariables.CurrentTypingTaskNumbers[0]
 
@@ -453,6 +1411,9 @@ def checkKeyPressed():
                     if RuntimeVariables.CurrentTaskType in [TaskTypes.SingleTyping, TaskTypes.PracticeSingleTyping] or not RuntimeVariables.DisplayTypingTaskWithinCursor:
                         drawTypingWindow()
 
+        if latencyRecorder:
+            latencyRecorder.stateUpdated()
+
 
 def switchWindows(taskToOpen):
     # switching is only done in dual-task
@@ -469,73 +1430,244 @@ def switchWindows(taskToOpen):
                 closeTrackingWindow()
 
 
-def printTextOverMultipleLines(text, location: Vector2D):
+def printTextOverMultipleLines(text, location: Vector2D, surface=None):
+    """Prints the text on the surface, by default on the screen. Returns the area of the surface that was drawn."""
+    if surface is None:
+        surface = RuntimeVariables.Screen
     fontsize = ExperimentSettings.GeneralFontSize
     color = (0, 0, 0)
     pygame.event.pump()
     splittedText = text.split("\n")
-    lineDistance = (pygame.font.Font(None, fontsize)).get_linesize()
+    lineDistance = RuntimeVariables.TextCache.getFont(fontsize).get_linesize()
     PositionX = location.X
     PositionY = location.Y
 
+    drawnArea = pygame.Rect(PositionX, PositionY, 0, 0)
     for lines in splittedText:
-        f = pygame.font.Font(None, fontsize)
-        msg = f.render(lines, True, color)
-        RuntimeVariables.Screen.blit(msg, (PositionX, PositionY))
+        msg = RuntimeVariables.TextCache.render(lines, fontsize, color)
+        drawnArea.union_ip(surface.blit(msg, (PositionX, PositionY)))
         PositionY = PositionY + lineDistance
+    return drawnArea
+
+
+def getCountdownMessage(secondsLeft):
+    return "Mach dich bereit!\n\n" \
+           "            " + str(secondsLeft)
 
 
 def CountdownMessage(displayTime):
     if ExperimentSettings.DebugMode:  # change some settings to facilitate debugging
         displayTime = 1
     for i in range(0, displayTime):
-        # prepare background
-        completebg = pygame.Surface((Constants.ExperimentWindowSize.X, Constants.ExperimentWindowSize.Y)).convert()
-        completebg.fill(ExperimentSettings.BackgroundColorEntireScreen)
-        RuntimeVariables.Screen.blit(completebg, (0, 0))
-
-        messageAreaObject = pygame.Surface((int(Constants.ExperimentWindowSize.X / 5), int(Constants.ExperimentWindowSize.Y / 5))).convert()
-        messageAreaObject.fill((255, 255, 255))
-
-        topCornerOfMessageArea = Vector2D(int(Constants.ExperimentWindowSize.X * 2 / 5), int(Constants.TopLeftCornerOfTypingTaskWindow.Y + 10))
-        RuntimeVariables.Screen.blit(messageAreaObject, (topCornerOfMessageArea.X, topCornerOfMessageArea.Y))
-
-        message = "Mach dich bereit!\n\n" \
-                  "            " + str(displayTime - i)
-
-        pygame.display.flip()
-        printTextOverMultipleLines(message, Vector2D(topCornerOfMessageArea.X + 45, topCornerOfMessageArea.Y + 10))
+        message = getCountdownMessage(displayTime - i)
+        RuntimeVariables.ScreenCache.show(ScreenCache.Countdown, message)
         writeLogFile(message)
-        pygame.display.flip()
-        time.sleep(1)
+        RuntimeVariables.MessageScheduler.wait(1)
 
 
 def DisplayMessage(message, displayTime):
     if ExperimentSettings.DebugMode:  # change some settings to facilitate debugging
         displayTime = 1
-    completebg = pygame.Surface((Constants.ExperimentWindowSize.X, Constants.ExperimentWindowSize.Y)).convert()
-    completebg.fill(ExperimentSettings.BackgroundColorEntireScreen)
-    RuntimeVariables.Screen.blit(completebg, (0, 0))
-    messageAreaObject = pygame.Surface((Constants.ExperimentWindowSize.X - 100, Constants.ExperimentWindowSize.Y - 100)).convert()
-    messageAreaObject.fill((255, 255, 255))
-    topCornerOfMessageArea = Vector2D(Constants.OffsetLeftRight, Constants.OffsetTop)
-    RuntimeVariables.Screen.blit(messageAreaObject, (topCornerOfMessageArea.X, topCornerOfMessageArea.Y))
-    location = Vector2D(topCornerOfMessageArea.X + Constants.OffsetLeftRight + 25, topCornerOfMessageArea.Y + Constants.OffsetTop + 25)
-    printTextOverMultipleLines(message, Vector2D(location.X, location.Y))
-    pygame.display.flip()
+    RuntimeVariables.ScreenCache.show(ScreenCache.Message, message)
     writeLogFile(message)
-    time.sleep(displayTime)
+    RuntimeVariables.MessageScheduler.wait(displayTime)
+
+
+class MessageScheduler:
+    """
+    Waits while message screens are shown. Instead of sleeping, it waits for pygame events, so that the window stays responsive
+    and quitting works, and it uses the idle time for jobs that prepare the next trial (see scheduleTrialWarmUp()).
+    """
+    def __init__(self, clock):
+        self.Clock = clock
+        self.Jobs = collections.deque()
+        self.WarmUpSurface = None  # the warm-up render draws on it
+
+    def schedule(self, job):
+        self.Jobs.append(job)
+
+    def runJobs(self):
+        """Runs all jobs which have not been run yet"""
+        while self.Jobs:
+            self.Jobs.popleft()()
+
+    @staticmethod
+    def handleEvent(event):
+        """Handles an event while waiting. Returns True on a mouse click."""
+        if event.type == pygame.QUIT:
+            quitApp()
+        elif event.type == pygame.KEYDOWN and event.key == pygame.K_F4:
+            quitApp("F4 was typed to terminate the app")
+        return event.type == pygame.MOUSEBUTTONDOWN
+
+    def wait(self, seconds, untilMouseClicked=False):
+        """
+        Waits for the given seconds while handling events and running jobs.
+        :param untilMouseClicked: Stop waiting at a mouse click
+        :return: True if the waiting was stopped by a mouse click
+        """
+        deadline = self.Clock.now() + seconds
+        while True:
+            for event in pygame.event.get():
+                if self.handleEvent(event) and untilMouseClicked:
+                    return True
+            if self.Clock.now() >= deadline:
+                return False
+            if self.Jobs:
+                self.Jobs.popleft()()
+                continue
+            event = self.Clock.waitForEvent(deadline)
+            if event is not None and self.handleEvent(event) and untilMouseClicked:
+                return True
+
+
+def getMessageTextLocation():
+    """The top left corner of the text of the message screens"""
+    topCornerOfMessageArea = Vector2D(Constants.OffsetLeftRight, Constants.OffsetTop)
+    return Vector2D(topCornerOfMessageArea.X + Constants.OffsetLeftRight + 25, topCornerOfMessageArea.Y + Constants.OffsetTop + 25)
+
+
+def drawMessageScreen(surface, message, background=True):
+    """
+    Draws a message in the white message area, on the background of the entire screen.
+    :returns The area of the text, or None without a message
+    """
+    topCornerOfMessageArea = Vector2D(Constants.OffsetLeftRight, Constants.OffsetTop)
+    if background:
+        surface.fill(ExperimentSettings.BackgroundColorEntireScreen)
+        surface.fill((255, 255, 255), pygame.Rect(topCornerOfMessageArea.X, topCornerOfMessageArea.Y, Constants.ExperimentWindowSize.X - 100, Constants.ExperimentWindowSize.Y - 100))
+    if message:
+        return printTextOverMultipleLines(message, getMessageTextLocation(), surface)
+    return None
+
+
+def getCountdownTextLocation():
+    """The top left corner of the text of the countdown screens"""
+    topCornerOfMessageArea = Vector2D(int(Constants.ExperimentWindowSize.X * 2 / 5), int(Constants.TopLeftCornerOfTypingTaskWindow.Y + 10))
+    return Vector2D(topCornerOfMessageArea.X + 45, topCornerOfMessageArea.Y + 10)
+
+
+def drawCountdownScreen(surface, message, background=True):
+    """
+    Draws a countdown message in a small white area above the task windows, on the background of the entire screen.
+    :returns The area of the text, or None without a message
+    """
+    topCornerOfMessageArea = Vector2D(int(Constants.ExperimentWindowSize.X * 2 / 5), int(Constants.TopLeftCornerOfTypingTaskWindow.Y + 10))
+    if background:
+        surface.fill(ExperimentSettings.BackgroundColorEntireScreen)
+        surface.fill((255, 255, 255), pygame.Rect(topCornerOfMessageArea.X, topCornerOfMessageArea.Y, int(Constants.ExperimentWindowSize.X / 5), int(Constants.ExperimentWindowSize.Y / 5)))
+    if message:
+        return printTextOverMultipleLines(message, getCountdownTextLocation(), surface)
+    return None
+
+
+class ScreenCache:
+    """
+    The messages and countdowns of the session. They are rendered before the session starts by compileSessionScreens(),
+    so that showing them is a blit of the empty screen of their kind and a blit of their text area. Only the empty screens
+    are kept as full screens, the messages only keep the area of their text. Messages that are only known during the session
+    (e.g. feedback with scores) are drawn onto the empty screen of their kind.
+    With a directory, the rendered screens and text areas are stored as PNG files, named by a hash of the text and the layout,
+    and loaded from there in the next sessions.
+    """
+    Message = "message"
+    Countdown = "countdown"
+
+    def __init__(self, memoryBudget, directory):
+        self.MemoryBudget = memoryBudget
+        self.Directory = directory
+        self.Screens = {}  # the surface and its position for each kind and text, the empty screens have the position (0, 0)
+        self.MemoryUsed = 0
+        self.Rendered = 0
+        self.LoadedFromDisk = 0
+        self.Skipped = 0  # screens that did not fit into the memory budget
+        self.Hits = 0
+        self.Misses = 0
+
+    @staticmethod
+    def draw(kind, surface, text, background=True):
+        if kind == ScreenCache.Message:
+            return drawMessageScreen(surface, text, background)
+        return drawCountdownScreen(surface, text, background)
+
+    @staticmethod
+    def getPosition(kind, text):
+        """The position of the cached surface of a text on the screen"""
+        if not text:
+            return 0, 0
+        location = getMessageTextLocation() if kind == ScreenCache.Message else getCountdownTextLocation()
+        return location.X, location.Y
+
+    @staticmethod
+    def getDiskCacheFileName(directory, kind, text, position):
+        layout = (kind, text, position, Constants.ExperimentWindowSize.X, Constants.ExperimentWindowSize.Y, Constants.OffsetLeftRight, Constants.OffsetTop,
+                  Constants.TopLeftCornerOfTypingTaskWindow.Y, ExperimentSettings.GeneralFontSize, ExperimentSettings.BackgroundColorEntireScreen)
+        return path.join(directory, hashlib.sha256(repr(layout).encode()).hexdigest() + ".png")
+
+    def compile(self, kind, text):
+        """Renders a screen, or the text area of a message on the empty screen of its kind, into the cache, or loads it from the directory"""
+        if (kind, text) in self.Screens:
+            return
+        emptyScreen = self.Screens.get((kind, ""))
+        if text and emptyScreen is None:
+            self.Skipped += 1
+            return
+        position = self.getPosition(kind, text)
+        fileName = self.getDiskCacheFileName(self.Directory, kind, text, position) if self.Directory else None
+        if fileName and path.exists(fileName):
+            surface = pygame.image.load(fileName).convert()
+            self.LoadedFromDisk += 1
+        else:
+            surface = createSurface((Constants.ExperimentWindowSize.X, Constants.ExperimentWindowSize.Y))
+            if text:
+                surface.blit(emptyScreen[0], (0, 0))
+                textArea = self.draw(kind, surface, text, background=False)
+                surface = surface.subsurface(pygame.Rect(position, (textArea.right - position[0], textArea.bottom - position[1])).clip(surface.get_rect())).copy()
+            else:
+                self.draw(kind, surface, text)
+            self.Rendered += 1
+            if fileName:
+                os.makedirs(self.Directory, exist_ok=True)
+                pygame.image.save(surface, fileName)
+        if self.MemoryUsed + TextCache.getSurfaceMemory(surface) > self.MemoryBudget:
+            self.Skipped += 1
+            return
+        self.Screens[(kind, text)] = (surface, position)
+        self.MemoryUsed += TextCache.getSurfaceMemory(surface)
+
+    def show(self, kind, text):
+        """Shows a screen. If it is not in the cache, the text is drawn onto the empty screen of its kind."""
+        emptyScreen = self.Screens.get((kind, ""))
+        if emptyScreen is not None:
+            RuntimeVariables.Screen.blit(*emptyScreen)
+        cachedSurface = self.Screens.get((kind, text))
+        if cachedSurface is not None:
+            self.Hits += 1
+            if text:
+                RuntimeVariables.Screen.blit(*cachedSurface)
+        else:
+            self.Misses += 1
+            self.draw(kind, RuntimeVariables.Screen, text, background=emptyScreen is None)
+        pygame.event.pump()
+        pygame.display.flip()
+
+    def report(self):
+        message = f"Screen cache: {len(self.Screens)} screens, {self.MemoryUsed / (1024 * 1024):.1f} MB " \
+                  f"({self.Rendered} rendered, {self.LoadedFromDisk} loaded from disk, {self.Skipped} beyond the memory budget), " \
+                  f"{self.Hits} shown from the cache, {self.Misses} drawn"
+        print(message)
+        writeLogFile(message)
 
 
 def drawCanvas():
-    completebg = pygame.Surface((Constants.ExperimentWindowSize.X, Constants.ExperimentWindowSize.Y)).convert()
+    completebg = createSurface((Constants.ExperimentWindowSize.X, Constants.ExperimentWindowSize.Y))
     completebg.fill(ExperimentSettings.BackgroundColorEntireScreen)
     RuntimeVariables.Screen.blit(completebg, (0, 0))
-    messageAreaObject = pygame.Surface((Constants.ExperimentWindowSize.X - 100, Constants.ExperimentWindowSize.Y - 100)).convert()
+    messageAreaObject = createSurface((Constants.ExperimentWindowSize.X - 100, Constants.ExperimentWindowSize.Y - 100))
     messageAreaObject.fill((255, 255, 255))
     topCornerOfMessageArea = Vector2D(Constants.OffsetLeftRight, Constants.OffsetTop)
     RuntimeVariables.Screen.blit(messageAreaObject, (topCornerOfMessageArea.X, topCornerOfMessageArea.Y))
-    buttonAreaObject = pygame.Surface((Constants.ExperimentWindowSize.X - 300, Constants.ExperimentWindowSize.Y - 300)).convert()
+    buttonAreaObject = createSurface((Constants.ExperimentWindowSize.X - 300, Constants.ExperimentWindowSize.Y - 300))
     buttonAreaObject.fill((150, 150, 150))
     RuntimeVariables.Screen.blit(buttonAreaObject, (150, 150))
 
@@ -569,15 +1701,11 @@ def GetTypingTaskNumbers(count):
     isSwitchingDualTask = RuntimeVariables.CurrentTaskType in [TaskTypes.DualTask, TaskTypes.PracticeDualTask] and not RuntimeVariables.ParallelDualTasks
     isSingleTypingTask = RuntimeVariables.CurrentTaskType in [TaskTypes.SingleTyping, TaskTypes.PracticeSingleTyping]
     if isSwitchingDualTask or isSingleTypingTask:
-        return ''.join([random.choice(ExperimentSettings.SingleTypingTaskNumbers) for _ in range(count)])
+        return ''.join([RuntimeVariables.RandomStreams.SingleTypingTaskNumbers.choice(ExperimentSettings.SingleTypingTaskNumbers) for _ in range(count)])
 
     # For dual task with both tracking and typing window visible, determine the typing string from the cursor position
-    distanceCursorMiddle = math.sqrt((abs(Constants.TrackingWindowMiddleX - RuntimeVariables.CursorCoordinates.X)) ** 2 + (abs(Constants.TrackingWindowMiddleY - RuntimeVariables.CursorCoordinates.Y)) ** 2)
-    possibleCharacters = None
-    for circle in RuntimeVariables.CurrentCircles:
-        if distanceCursorMiddle < circle.Radius:
-            possibleCharacters = circle.TypingTaskNumbersDualTask
-            break
+    circle = getCurrentCircleSet().getCircle(RuntimeVariables.CursorCoordinates.X, RuntimeVariables.CursorCoordinates.Y)
+    possibleCharacters = circle.TypingTaskNumbersDualTask if circle else None
 
     # If the cursor is outside the outermost circle radius, the tpying task should show an "e"
     if not possibleCharacters and RuntimeVariables.ParallelDualTasks and RuntimeVariables.CurrentTaskType in [TaskTypes.DualTask, TaskTypes.PracticeDualTask]:
@@ -586,11 +1714,270 @@ def GetTypingTaskNumbers(count):
         raise Exception("Could not get a random typing task number for the current circle radius!")
 
     # Return the specified number of random characters
-    return ''.join([random.choice(possibleCharacters) for _ in range(count)])
+    return ''.join([RuntimeVariables.RandomStreams.DualTypingTaskNumbers.choice(possibleCharacters) for _ in range(count)])
+
+
+def createSurface(size, alpha=False):
+    """Allocates a new surface in the display format. All allocations are counted in RuntimeVariables.RenderStatistics."""
+    if RuntimeVariables.RenderStatistics:
+        RuntimeVariables.RenderStatistics.SurfaceAllocations += 1
+    if alpha:
+        return pygame.Surface(size).convert_alpha()
+    return pygame.Surface(size).convert()
+
+
+class RenderStatistics:
+    """
+    Counts the surface allocations of a trial. In steady state, frames should only blit cached surfaces and allocate nothing.
+    """
+    def __init__(self):
+        self.SurfaceAllocations = 0
+        self.DisplayUpdates = 0
+        self.DisplayUpdateTime = 0
+        self.TrialStartTime = RuntimeVariables.Clock.now()
+
+    def startTrial(self):
+        self.SurfaceAllocations = 0
+        self.DisplayUpdates = 0
+        self.DisplayUpdateTime = 0
+        self.TrialStartTime = RuntimeVariables.Clock.now()
+
+    def reportTrial(self):
+        duration = max(RuntimeVariables.Clock.now() - self.TrialStartTime, 0.001)
+        meanDisplayUpdateTime = 1000 * self.DisplayUpdateTime / self.DisplayUpdates if self.DisplayUpdates > 0 else 0
+        message = f"Rendering: {self.SurfaceAllocations} surface allocations in {duration:.1f} s ({self.SurfaceAllocations / duration:.1f} per second), " \
+                  f"{self.DisplayUpdates} display updates ({ExperimentSettings.RenderingMode}) taking {meanDisplayUpdateTime:.3f} ms on average"
+        textCache = RuntimeVariables.TextCache
+        if textCache:
+            message += f", text cache: {textCache.Hits} hits, {textCache.Misses} misses, {textCache.Evictions} evictions, {textCache.MemoryUsed / 1024:.0f} KB"
+        print(message)
+        writeLogFile(message)
+
+
+class FrameTimingRecorder:
+    """
+    Records the timing of each frame of a trial in a preallocated array: the time since its deadline when the loop woke up
+    (lateness), the time until the display update started (render time), the duration of the display update and the number of
+    refreshes it probably missed, i.e. how many refresh intervals after its deadline it was shown. The times are in milliseconds.
+    The array of each trial is saved if ExperimentSettings.SaveFrameTimes is set. In debug mode, a histogram of the frame times
+    is shown after each block.
+    """
+    FrameType = numpy.dtype([("TrialTime", "f4"), ("Lateness", "f4"), ("RenderTime", "f4"), ("FlipTime", "f4"), ("DroppedFrames", "u2")])
+
+    def __init__(self, clock, directory=None):
+        self.Clock = clock
+        self.Directory = directory
+        self.Frames = numpy.zeros(0, dtype=self.FrameType)
+        self.NumberOfFrames = 0
+        self.Deadline = None  # of the current frame
+        self.WakeUpTime = None
+        self.LastFlipEnd = None
+        self.BlockFrameTimes = []  # arrays of the frame times of the trials of the current block
+        self.FlaggedTrials = 0
+
+    def startTrial(self, trialDuration):
+        """Empties the array, it is only reallocated if it is too small for a trial of trialDuration seconds"""
+        capacity = int(math.ceil(trialDuration * (ExperimentSettings.DisplayRefreshRate + 1 / Constants.TrialTickInterval))) + 1
+        if capacity > len(self.Frames):
+            self.Frames = numpy.zeros(capacity, dtype=self.FrameType)
+        self.NumberOfFrames = 0
+        self.Deadline = None
+        self.LastFlipEnd = None
+
+    def wokeUp(self, deadline, now):
+        """The loop woke up for a frame due at deadline"""
+        self.Deadline = deadline
+        self.WakeUpTime = now
+
+    def frameShown(self, flipStart, flipEnd):
+        if self.Deadline is None:
+            return
+        if self.NumberOfFrames == len(self.Frames):
+            self.Frames = numpy.concatenate((self.Frames, numpy.zeros(len(self.Frames) + 1, dtype=self.FrameType)))
+        renderStart = self.WakeUpTime if self.LastFlipEnd is None else max(self.WakeUpTime, self.LastFlipEnd)
+        frame = self.Frames[self.NumberOfFrames]
+        frame["TrialTime"] = self.Deadline - RuntimeVariables.StartTimeCurrentTrial
+        frame["Lateness"] = 1000 * (self.WakeUpTime - self.Deadline)
+        frame["RenderTime"] = 1000 * (flipStart - renderStart)
+        frame["FlipTime"] = 1000 * (flipEnd - flipStart)
+        frame["DroppedFrames"] = min(int((flipEnd - self.Deadline) * ExperimentSettings.DisplayRefreshRate), 65535)
+        self.NumberOfFrames += 1
+        self.LastFlipEnd = flipEnd
+
+    def getFrameTimes(self):
+        frames = self.Frames[:self.NumberOfFrames]
+        return frames["Lateness"] + frames["RenderTime"] + frames["FlipTime"]
+
+    def endTrial(self):
+        """Saves the frames of the trial and returns the flags for the trialEnd row, - if the trial kept the frame time budget"""
+        frames = self.Frames[:self.NumberOfFrames]
+        if self.Directory and ExperimentSettings.SaveFrameTimes:
+            numpy.save(path.join(self.Directory, f"trial_{RuntimeVariables.TrialNumber}.npy"), frames)
+        frameTimes = self.getFrameTimes()
+        self.BlockFrameTimes.append(frameTimes)
+        if len(frames) == 0:
+            return "-"
+        flags = []
+        percentile = numpy.percentile(frameTimes, ExperimentSettings.FrameTimeBudgetPercentile)
+        if percentile > ExperimentSettings.FrameTimeBudgetMilliseconds:
+            flags.append(f"frameTimeP{ExperimentSettings.FrameTimeBudgetPercentile}={percentile:.1f}ms")
+        droppedFrames = int(frames["DroppedFrames"].sum())
+        if droppedFrames > ExperimentSettings.MaxDroppedFramesPerTrial:
+            flags.append(f"droppedFrames={droppedFrames}")
+        if not flags:
+            return "-"
+        self.FlaggedTrials += 1
+        message = f"Frame timing of trial {RuntimeVariables.TrialNumber} exceeded the budget: " + ", ".join(flags) + \
+                  f" ({len(frames)} frames, longest render {frames['RenderTime'].max():.1f} ms, longest display update {frames['FlipTime'].max():.1f} ms)"
+        print(message)
+        writeLogFile(message)
+        return ",".join(flags)
+
+    def reportBlock(self):
+        """Shows a histogram of the frame times of the block in debug mode"""
+        frameTimes = numpy.concatenate(self.BlockFrameTimes) if self.BlockFrameTimes else numpy.zeros(0)
+        self.BlockFrameTimes = []
+        if not ExperimentSettings.DebugMode or len(frameTimes) == 0:
+            return
+        budget = ExperimentSettings.FrameTimeBudgetMilliseconds
+        edges = sorted({0, 1, 2, 4, 8, budget, 2 * budget, 4 * budget}) + [math.inf]
+        counts, _ = numpy.histogram(frameTimes, edges)
+        lines = [f"Frame times of block {RuntimeVariables.BlockNumber}: {len(frameTimes)} frames, median {numpy.median(frameTimes):.2f} ms, max {frameTimes.max():.2f} ms"]
+        for lower, upper, count in zip(edges, edges[1:], counts):
+            bar = "#" * int(math.ceil(50 * count / len(frameTimes)))
+            lines.append(f"  {lower:6.1f} - {upper:6.1f} ms {count:8d} {bar}")
+        message = "\n".join(lines)
+        print(message)
+        writeLogFile(message)
 
+    def close(self):
+        message = f"Frame timing: {self.FlaggedTrials} trials exceeded the frame time budget"
+        print(message)
+        writeLogFile(message)
+
+
+class TextCache:
+    """
+    Fonts by size and rendered text surfaces by (text, size, color). The surfaces are kept in least recently used order
+    and the oldest ones are dropped when ExperimentSettings.TextCacheMemoryBudget is exceeded.
+    """
+    def __init__(self, memoryBudget):
+        self.MemoryBudget = memoryBudget
+        self.MemoryUsed = 0
+        self.Fonts = {}
+        self.Surfaces = collections.OrderedDict()
+        self.Hits = 0
+        self.Misses = 0
+        self.Evictions = 0
+
+    def getFont(self, size):
+        font = self.Fonts.get(size)
+        if font is None:
+            font = pygame.font.Font(None, size)
+            self.Fonts[size] = font
+        return font
+
+    def render(self, text, size, color):
+        """Returns the rendered text, it is only rendered if it is not in the cache"""
+        key = (text, size, tuple(color))
+        surface = self.Surfaces.get(key)
+        if surface is not None:
+            self.Hits += 1
+            self.Surfaces.move_to_end(key)
+            return surface
+        self.Misses += 1
+        if RuntimeVariables.RenderStatistics:
+            RuntimeVariables.RenderStatistics.SurfaceAllocations += 1
+        surface = self.getFont(size).render(text, True, color)
+        self.Surfaces[key] = surface
+        self.MemoryUsed += self.getSurfaceMemory(surface)
+        while self.MemoryUsed > self.MemoryBudget and len(self.Surfaces) > 1:
+            _, oldestSurface = self.Surfaces.popitem(last=False)
+            self.MemoryUsed -= self.getSurfaceMemory(oldestSurface)
+            self.Evictions += 1
+        return surface
+
+    @staticmethod
+    def getSurfaceMemory(surface):
+        return surface.get_pitch() * surface.get_height()
+
+
+def markDirty(x, y, width, height):
+    """
+    Marks an area of the screen as changed, so that it is transferred with the next display update (RenderingMode.DirtyRectangles).
+    The area is enlarged by one pixel as blit positions are fractional.
+    """
+    if ExperimentSettings.RenderingMode == RenderingMode.DirtyRectangles:
+        rect = pygame.Rect(int(x) - 1, int(y) - 1, int(width) + 2, int(height) + 2)
+        RuntimeVariables.DirtyRectangles.append(rect)
+        return rect
+    return None
 
-def drawCircles(bg):
-    for circle in reversed(RuntimeVariables.CurrentCircles):
+
+def markScreenDirty():
+    """Marks the whole screen as changed, e.g. after drawing a background or switching windows"""
+    RuntimeVariables.FullScreenDirty = True
+
+
+def updateDisplay():
+    """Shows the drawn frame, depending on ExperimentSettings.RenderingMode either the whole screen or only the changed areas"""
+    startTime = time.perf_counter()
+    flipStart = RuntimeVariables.Clock.now()
+    if RuntimeVariables.InputLatencyRecorder:
+        RuntimeVariables.InputLatencyRecorder.drawSyncPatch()
+    if ExperimentSettings.RenderingMode == RenderingMode.FullFlip or RuntimeVariables.FullScreenDirty:
+        pygame.display.flip()
+    elif RuntimeVariables.DirtyRectangles:
+        pygame.display.update(RuntimeVariables.DirtyRectangles)
+    RuntimeVariables.DirtyRectangles.clear()
+    RuntimeVariables.FullScreenDirty = False
+    if RuntimeVariables.FrameTimingRecorder:
+        RuntimeVariables.FrameTimingRecorder.frameShown(flipStart, RuntimeVariables.Clock.now())
+    if RuntimeVariables.InputLatencyRecorder:
+        RuntimeVariables.InputLatencyRecorder.displayUpdated()
+    if RuntimeVariables.RenderStatistics:
+        RuntimeVariables.RenderStatistics.DisplayUpdates += 1
+        RuntimeVariables.RenderStatistics.DisplayUpdateTime += time.perf_counter() - startTime
+
+
+class LayerCache:
+    """
+    Surfaces which do not change during a condition: the tracking window with its circles, covers and window backgrounds.
+    Each layer is keyed by everything it is drawn from, so it is rendered again automatically when a condition changes it.
+    """
+    def __init__(self):
+        self.TrackingWindowKey = None
+        self.TrackingWindow = None
+        self.FilledSurfaces = {}
+
+    def getTrackingWindow(self, circles=None):
+        """Returns the background of the tracking window with the circles drawn on it, by default RuntimeVariables.CurrentCircles"""
+        if circles is None:
+            circles = RuntimeVariables.CurrentCircles
+        key = (tuple((circle.Radius, circle.InnerCircleColor, circle.BorderColor) for circle in circles),
+               ExperimentSettings.TaskWindowSize.X, ExperimentSettings.TaskWindowSize.Y,
+               ExperimentSettings.BackgroundColorTaskWindows, ExperimentSettings.CircleBorderThickness)
+        if key != self.TrackingWindowKey:
+            bg = createSurface((ExperimentSettings.TaskWindowSize.X, ExperimentSettings.TaskWindowSize.Y))
+            bg.fill(ExperimentSettings.BackgroundColorTaskWindows)
+            drawCircles(bg, circles)
+            self.TrackingWindow = bg
+            self.TrackingWindowKey = key
+        return self.TrackingWindow
+
+    def getFilledSurface(self, width, height, color):
+        """Returns a surface of the given size filled with one color, e.g. a cover, a window background or the cursor"""
+        key = (int(width), int(height), tuple(color))
+        surface = self.FilledSurfaces.get(key)
+        if surface is None:
+            surface = createSurface((key[0], key[1]))
+            surface.fill(color)
+            self.FilledSurfaces[key] = surface
+        return surface
+
+
+def drawCircles(bg, circles):
+    for circle in reversed(circles):
         # draw a filled circle
         drawCircle(bg, circle.InnerCircleColor, circle.Radius, 0)
         # Draws a circular shape on the Surface. The pos argument is the center of the circle, and radius is the size.
@@ -606,7 +1993,7 @@ def drawCircle(image, colour, radius, width=0):
     else:
         if radius > 65534 / 5:
             radius = 65534 / 5
-        circle = pygame.Surface([radius * 2 + width, radius * 2 + width]).convert_alpha()
+        circle = createSurface((radius * 2 + width, radius * 2 + width), alpha=True)
         circle.fill([0, 0, 0, 0])
         pygame.draw.circle(circle, colour, (int(circle.get_width() / 2), int(circle.get_height() / 2)), int(radius + (width / 2)))
         if int(radius - (width / 2)) > 0:
@@ -615,100 +2002,53 @@ def drawCircle(image, colour, radius, width=0):
 
 
 def updateCursor(sleepTime):
-    x = RuntimeVariables.CursorCoordinates.X
-    y = RuntimeVariables.CursorCoordinates.Y
+    """
+    Moves the cursor until the end of the current tick (sleepTime seconds after its deadline).
+    The cursor dynamics run in fixed steps of RuntimeVariables.CursorPhysics, so they do not depend on the frame rate.
+    If the tracking window is visible, frames are drawn at ExperimentSettings.DisplayRefreshRate with the cursor position
+    interpolated between the physics steps.
+    """
+    scheduler = RuntimeVariables.TrialScheduler
+    physics = RuntimeVariables.CursorPhysics
     oldX = RuntimeVariables.CursorCoordinates.X
     oldY = RuntimeVariables.CursorCoordinates.Y
+    # the cursor may have been moved without the physics, e.g. by a mouse click
+    if physics.X != oldX or physics.Y != oldY:
+        physics.setPosition(oldX, oldY)
 
-    # only add noise if tracking is not moving.
-    # define joystick as moved if one of its axis is in [-1, -0.08] or [0.08, 1]. Joystick precision requires this.
-    joystickIsMoving = RuntimeVariables.JoystickAxis.X > Constants.MotionTolerance or \
-                       RuntimeVariables.JoystickAxis.X < -Constants.MotionTolerance or \
-                       RuntimeVariables.JoystickAxis.Y > Constants.MotionTolerance or \
-                       RuntimeVariables.JoystickAxis.Y < -Constants.MotionTolerance
-
-    # Always add random noise, except when the tracking window is visible and the joystick is moved
-    if not (RuntimeVariables.TrackingWindowVisible and joystickIsMoving):
-        final_x = x + random.gauss(0, RuntimeVariables.StandardDeviationOfNoise)
-        final_y = y + random.gauss(0, RuntimeVariables.StandardDeviationOfNoise)
-    else:
-        final_x = x
-        final_y = y
-
-    # Apply the joystick movement to the cursor, but only if the tracking window is open (i.e. when the participant sees what way the cursor moves!)
-    if RuntimeVariables.TrackingWindowVisible:
-        final_x += RuntimeVariables.JoystickAxis.X * Constants.ScalingJoystickAxis
-        final_y += RuntimeVariables.JoystickAxis.Y * Constants.ScalingJoystickAxis
-
-    # now iterate through updates (but only do that if the window is open - if it's closed do it without mini-steps, so as to make computation faster)
-    nrUpdates = int(sleepTime / Constants.StepSizeOfTrackingScreenUpdate)
-    delta_x = (final_x - x) / nrUpdates
-    delta_y = (final_y - y) / nrUpdates
+    tickEnd = min(scheduler.TickDeadline + sleepTime, scheduler.EndTime)
 
     if RuntimeVariables.TrackingWindowVisible:
-        drawTrackingWindow()
-        drawCursor()
-
-        for i in range(0, nrUpdates):
-            x += delta_x
-            y += delta_y
-
-            if x != RuntimeVariables.CursorCoordinates.X and y != RuntimeVariables.CursorCoordinates.Y:
-                # now check if the cursor is still within screen range
-                if x < (Constants.TopLeftCornerOfTrackingTaskWindow.X + ExperimentSettings.CursorSize.X / 2):
-                    x = Constants.TopLeftCornerOfTrackingTaskWindow.X + ExperimentSettings.CursorSize.X / 2
-                elif x > (Constants.TopLeftCornerOfTrackingTaskWindow.X + ExperimentSettings.TaskWindowSize.X - ExperimentSettings.CursorSize.X / 2):
-                    x = Constants.TopLeftCornerOfTrackingTaskWindow.X + ExperimentSettings.TaskWindowSize.X - ExperimentSettings.CursorSize.X / 2
-
-                if y < (Constants.TopLeftCornerOfTrackingTaskWindow.Y + ExperimentSettings.CursorSize.Y / 2):
-                    y = Constants.TopLeftCornerOfTrackingTaskWindow.Y + ExperimentSettings.CursorSize.Y / 2
-                elif y > (Constants.TopLeftCornerOfTrackingTaskWindow.Y + ExperimentSettings.TaskWindowSize.Y - ExperimentSettings.CursorSize.Y / 2):
-                    y = Constants.TopLeftCornerOfTrackingTaskWindow.Y + ExperimentSettings.TaskWindowSize.Y - ExperimentSettings.CursorSize.Y / 2
-
-                drawCursor()
-                if RuntimeVariables.CurrentTaskType in [TaskTypes.DualTask, TaskTypes.PracticeDualTask] and RuntimeVariables.DisplayTypingTaskWithinCursor and RuntimeVariables.ParallelDualTasks:
-                    drawTypingTaskWithinCursor()
-
-            pygame.display.flip()
-            time.sleep(Constants.StepSizeOfTrackingScreenUpdate)
-
-        # see if there is additional time to sleep
-        mods = sleepTime % Constants.StepSizeOfTrackingScreenUpdate
-        if mods != 0:
-            time.sleep(mods)
-
-    # if tracking window is not visible, just update the values
-    else:
-        # Apply random noise and joystick movement if present
-        x = final_x
-        y = final_y
-
-        # now check if the cursor is still within screen range
-        if x != RuntimeVariables.CursorCoordinates.X and y != RuntimeVariables.CursorCoordinates.Y:
-            limitLeftX = Constants.TopLeftCornerOfTrackingTaskWindow.X + ExperimentSettings.CursorSize.X / 2
-            limitLeftY = Constants.TopLeftCornerOfTrackingTaskWindow.Y + ExperimentSettings.CursorSize.Y / 2
-            limitRightX = Constants.TopLeftCornerOfTrackingTaskWindow.X + ExperimentSettings.TaskWindowSize.X - ExperimentSettings.CursorSize.X / 2
-            limitRightY = Constants.TopLeftCornerOfTrackingTaskWindow.Y + ExperimentSettings.TaskWindowSize.Y - ExperimentSettings.CursorSize.Y / 2
-            if x < limitLeftX:
-                x = limitLeftX
-            elif x > limitRightX:
-                x = limitRightX
-            if y < limitLeftY:
-                y = limitLeftX
-            elif y > limitRightY:
-                y = limitRightY
-
-        # if display is not updated, sleep for entire time
-        time.sleep(sleepTime)
+        # frames are drawn at fixed times from the trial start, between them the physics advances in its own steps
+        frameInterval = 1.0 / ExperimentSettings.DisplayRefreshRate
+        frameNumber = math.ceil((RuntimeVariables.Clock.now() - scheduler.StartTime) / frameInterval)
+        frameTime = scheduler.StartTime + frameNumber * frameInterval
+        while frameTime < tickEnd:
+            sleepUntilAndSampleJoystick(frameTime)
+            advanceCursorPhysics(physics, frameTime)
+            physics.getInterpolatedPosition(frameTime, RuntimeVariables.CursorDisplayCoordinates)
+
+            drawTrackingWindow()
+            drawCursor()
+            if RuntimeVariables.CurrentTaskType in [TaskTypes.DualTask, TaskTypes.PracticeDualTask] and RuntimeVariables.DisplayTypingTaskWithinCursor and RuntimeVariables.ParallelDualTasks:
+                drawTypingTaskWithinCursor()
+            updateDisplay()
+
+            frameNumber += 1
+            frameTime = scheduler.StartTime + frameNumber * frameInterval
+
+    # The cursor position of the tick is the one at the end of the tick, also if tracking is not visible
+    sleepUntilAndSampleJoystick(tickEnd)
+    advanceCursorPhysics(physics, tickEnd)
+    x = physics.X
+    y = physics.Y
 
     # always update coordinates
-    RuntimeVariables.CursorCoordinates = Vector2D(x, y)
-
-    # collect distances of the cursor to the circle middle for the RMSE
-    RuntimeVariables.CursorDistancesToMiddle.append(math.sqrt((Constants.TrackingWindowMiddleX - x) ** 2 + (Constants.TrackingWindowMiddleY - y) ** 2))
+    RuntimeVariables.CursorCoordinates.set(x, y)
 
-    # collect cumulatively the distance the cursor has moved
-    RuntimeVariables.LengthOfPathTracked += math.sqrt((oldX - x) ** 2 + (oldY - y) ** 2)
+    # collect the distance of the cursor to the circle middle for the RMSE and cumulatively the distance the cursor has moved
+    distance = RuntimeVariables.TrackingStatistics.addSample(x, y, oldX, oldY)
+    RuntimeVariables.TrialSamples.addSample(tickEnd, x, y, distance, RuntimeVariables.JoystickAxis.X, RuntimeVariables.JoystickAxis.Y)
 
     # Detect whether the cursor is outside the circle, also if tracking is not visible.
     isCursorOutsideCircleVar = isCursorOutsideCircle()
@@ -732,29 +2072,299 @@ def updateCursor(sleepTime):
     RuntimeVariables.WasCursorOutsideRadiusBefore = isCursorOutsideCircleVar
 
 
-def isCursorOutsideCircle():
+def sleepUntilAndSampleJoystick(deadline):
+    if RuntimeVariables.JoystickSampler:
+        RuntimeVariables.JoystickSampler.sleepUntil(deadline)
+    else:
+        RuntimeVariables.Clock.sleepUntil(deadline)
+    if RuntimeVariables.FrameTimingRecorder:
+        RuntimeVariables.FrameTimingRecorder.wokeUp(deadline, RuntimeVariables.Clock.now())
+
+
+def advanceCursorPhysics(physics, currentTime):
+    """Advances the cursor physics to currentTime. With the joystick sampler, each step uses the last joystick sample before it."""
+    if RuntimeVariables.JoystickSampler:
+        latencyRecorder = RuntimeVariables.InputLatencyRecorder
+        # the samples after currentTime are used by the next call, the steps never go beyond the tick and the trial end
+        for sampleTime, axisX, axisY in RuntimeVariables.JoystickSampler.consumeSamples(currentTime):
+            physics.advanceTo(sampleTime, RuntimeVariables.JoystickAxis.X, RuntimeVariables.JoystickAxis.Y, RuntimeVariables.TrackingWindowVisible)
+            if latencyRecorder and (axisX != RuntimeVariables.JoystickAxis.X or axisY != RuntimeVariables.JoystickAxis.Y):
+                latencyRecorder.addJoystickSample(sampleTime, axisX, axisY)
+            RuntimeVariables.JoystickAxis.set(float(axisX), float(axisY))
+    physics.advanceTo(currentTime, RuntimeVariables.JoystickAxis.X, RuntimeVariables.JoystickAxis.Y, RuntimeVariables.TrackingWindowVisible)
+
+
+class CursorPhysics:
+    """
+    Moves the cursor in fixed steps of 1 / physicsRate seconds, independent of the rate at which frames are drawn.
+    Constants.ScalingJoystickAxis refers to Constants.NoiseReferenceInterval and is scaled to the step time, so the joystick
+    speed is the same for all physics rates. The disturbance contains the displacement of each step (see generateDisturbance()).
+    The steps end at endTime, the end of the trial.
+    """
+    def __init__(self, physicsRate, startTime, endTime, x, y, disturbance):
+        self.StepTime = 1.0 / physicsRate
+        self.StartTime = startTime
+        self.EndTime = endTime
+        self.StepNumber = 0  # number of steps done since startTime
+        self.X = x
+        self.Y = y
+        self.PreviousX = x  # position one step earlier, used to interpolate between the steps
+        self.PreviousY = y
+        self.JoystickScalingPerStep = Constants.ScalingJoystickAxis * self.StepTime / Constants.NoiseReferenceInterval
+        # plain lists are indexed faster than numpy arrays in the step loop
+        self.DisturbanceX = disturbance[:, 0].tolist()
+        self.DisturbanceY = disturbance[:, 1].tolist()
+        self.LimitLeftX = Constants.TopLeftCornerOfTrackingTaskWindow.X + ExperimentSettings.CursorSize.X / 2
+        self.LimitLeftY = Constants.TopLeftCornerOfTrackingTaskWindow.Y + ExperimentSettings.CursorSize.Y / 2
+        self.LimitRightX = Constants.TopLeftCornerOfTrackingTaskWindow.X + ExperimentSettings.TaskWindowSize.X - ExperimentSettings.CursorSize.X / 2
+        self.LimitRightY = Constants.TopLeftCornerOfTrackingTaskWindow.Y + ExperimentSettings.TaskWindowSize.Y - ExperimentSettings.CursorSize.Y / 2
+
+    def handleMissingDisturbance(self):
+        """
+        The steps are limited to the trial end and the disturbance has a margin beyond it, so this is a bug. It fails simulated sessions
+        and the debug mode, a session with a participant keeps the cursor where it is and logs it once.
+        """
+        message = f"The cursor physics ran past the disturbance of trial {RuntimeVariables.TrialNumber} ({len(self.DisturbanceX)} steps)"
+        if ExperimentSettings.DebugMode or isinstance(RuntimeVariables.Clock, VirtualClock):
+            raise Exception(message)
+        if self.StepNumber == len(self.DisturbanceX):
+            print(message)
+            writeLogFile(message)
+        self.StepNumber += 1
+
+    def setPosition(self, x, y):
+        self.X = x
+        self.Y = y
+        self.PreviousX = x
+        self.PreviousY = y
+
+    def advanceTo(self, currentTime, joystickAxisX, joystickAxisY, trackingWindowVisible):
+        """Does all steps up to currentTime, at most up to the end of the trial, with the given joystick axis values"""
+        currentTime = min(currentTime, self.EndTime)
+        while self.StartTime + (self.StepNumber + 1) * self.StepTime <= currentTime:
+            self.step(joystickAxisX, joystickAxisY, trackingWindowVisible)
+
+    def step(self, joystickAxisX, joystickAxisY, trackingWindowVisible):
+        if self.StepNumber >= len(self.DisturbanceX):
+            self.handleMissingDisturbance()
+            return
+        x = self.X
+        y = self.Y
+
+        # only add noise if tracking is not moving.
+        # define joystick as moved if one of its axis is in [-1, -0.08] or [0.08, 1]. Joystick precision requires this.
+        joystickIsMoving = joystickAxisX > Constants.MotionTolerance or joystickAxisX < -Constants.MotionTolerance or \
+                           joystickAxisY > Constants.MotionTolerance or joystickAxisY < -Constants.MotionTolerance
+
+        # Always add random noise, except when the tracking window is visible and the joystick is moved
+        if not (trackingWindowVisible and joystickIsMoving):
+            x += self.DisturbanceX[self.StepNumber]
+            y += self.DisturbanceY[self.StepNumber]
+
+        # Apply the joystick movement to the cursor, but only if the tracking window is open (i.e. when the participant sees what way the cursor moves!)
+        if trackingWindowVisible:
+            x += joystickAxisX * self.JoystickScalingPerStep
+            y += joystickAxisY * self.JoystickScalingPerStep
+
+        # now check if the cursor is still within screen range
+        x = min(max(x, self.LimitLeftX), self.LimitRightX)
+        y = min(max(y, self.LimitLeftY), self.LimitRightY)
+
+        self.PreviousX = self.X
+        self.PreviousY = self.Y
+        self.X = x
+        self.Y = y
+        self.StepNumber += 1
+
+    def getInterpolatedPosition(self, currentTime, position):
+        """Sets position (a Vector2D) to the position to draw at currentTime, interpolated between the last two steps"""
+        fraction = (currentTime - (self.StartTime + self.StepNumber * self.StepTime)) / self.StepTime
+        fraction = min(max(fraction, 0.0), 1.0)
+        position.set(self.PreviousX + (self.X - self.PreviousX) * fraction, self.PreviousY + (self.Y - self.PreviousY) * fraction)
+
+
+def generateDisturbance(model, numberOfSteps, stepTime, standardDeviationOfNoise, generator):
+    """
+    Generates the displacement of the cursor for each physics step of a trial.
+    standardDeviationOfNoise refers to Constants.NoiseReferenceInterval. The other models are scaled to the root mean square
+    displacement of the white noise within ExperimentSettings.DisturbanceScalingInterval.
+    :param generator: a numpy.random.Generator
+    :returns An array with the shape (numberOfSteps, 2)
+    """
+    standardDeviationPerStep = standardDeviationOfNoise * math.sqrt(stepTime / Constants.NoiseReferenceInterval)
+    if model == DisturbanceModel.WhiteNoise:
+        return generator.normal(0, standardDeviationPerStep, (numberOfSteps, 2))
+
+    if model == DisturbanceModel.SumOfSines:
+        frequencies = numpy.array(ExperimentSettings.SumOfSinesFrequencies)
+        phases = generator.uniform(0, 2 * math.pi, (len(frequencies), 2))
+        times = numpy.arange(numberOfSteps + 1) * stepTime
+        positions = numpy.stack([numpy.sin(2 * math.pi * numpy.outer(times, frequencies) + phases[:, axis]).sum(axis=1) for axis in range(2)], axis=1)
+        disturbance = numpy.diff(positions, axis=0)
+    elif model == DisturbanceModel.BandLimitedNoise:
+        spectrum = numpy.fft.rfft(generator.normal(0, 1, (numberOfSteps, 2)), axis=0)
+        spectrum[numpy.fft.rfftfreq(numberOfSteps, stepTime) > ExperimentSettings.BandLimitedNoiseCutoffFrequency] = 0
+        disturbance = numpy.fft.irfft(spectrum, numberOfSteps, axis=0)
+    else:
+        raise Exception(f"Unknown disturbance model {model}")
+
+    # scale to the same root mean square displacement within the scaling interval as the white noise
+    stepsPerInterval = min(max(int(round(ExperimentSettings.DisturbanceScalingInterval / stepTime)), 1), numberOfSteps)
+    positions = numpy.concatenate([numpy.zeros((1, 2)), numpy.cumsum(disturbance, axis=0)])
+    displacements = positions[stepsPerInterval:] - positions[:-stepsPerInterval]
+    rootMeanSquare = numpy.sqrt(numpy.mean(displacements ** 2, axis=0))
+    rootMeanSquare[rootMeanSquare == 0] = 1
+    return disturbance * (standardDeviationPerStep * math.sqrt(stepsPerInterval) / rootMeanSquare)
+
+
+def createCursorPhysics(trialDuration):
+    """
+    Creates the cursor physics for the current trial with the disturbance of the whole trial.
+    The disturbance is saved if ExperimentSettings.SaveDisturbances is set.
+    """
+    warmUp = getTrialWarmUp()
+    if warmUp and warmUp.Disturbance is not None:
+        disturbance = warmUp.Disturbance
+    else:
+        disturbance = generateTrialDisturbance(RuntimeVariables.RandomStreams, trialDuration, RuntimeVariables.StandardDeviationOfNoise)
+    if ExperimentSettings.SaveDisturbances and RuntimeVariables.DisturbanceDirectory:
+        numpy.save(path.join(RuntimeVariables.DisturbanceDirectory, f"trial_{RuntimeVariables.TrialNumber}.npy"), disturbance)
+    RuntimeVariables.CursorPhysics = CursorPhysics(ExperimentSettings.PhysicsRate, RuntimeVariables.StartTimeCurrentTrial, RuntimeVariables.StartTimeCurrentTrial + trialDuration,
+                                                   Constants.TrackingWindowMiddleX, Constants.TrackingWindowMiddleY, disturbance)
+
+
+def generateTrialDisturbance(randomStreams, trialDuration, standardDeviationOfNoise):
+    """Generates the disturbance of a trial from its noise stream, with the steps of a tick as margin beyond the trial end"""
+    stepTime = 1.0 / ExperimentSettings.PhysicsRate
+    numberOfSteps = int(math.ceil(trialDuration / stepTime)) + 1 + int(math.ceil(Constants.TrialTickInterval / stepTime))
+    generator = numpy.random.default_rng(randomStreams.Noise.getrandbits(64))
+    return generateDisturbance(ExperimentSettings.DisturbanceModel, numberOfSteps, stepTime, standardDeviationOfNoise, generator)
+
+
+class TrialWarmUp:
+    """
+    Preparation of the next trial of the session plan: its random streams, its cursor disturbance, the joystick, the layers of
+    the trial and a warm-up render. The jobs are run while message screens are shown, so the first frames of the trial have no
+    startup hitches.
+    """
+    def __init__(self, spec):
+        self.Spec = spec
+        self.TrackingTaskPresent = spec.TaskType not in [TaskTypes.SingleTyping, TaskTypes.PracticeSingleTyping]
+        self.RandomStreams = None
+        self.Disturbance = None
+        self.JoystickInitialized = False
+
+    def getJobs(self):
+        jobs = [self.createRandomStreams]
+        if self.TrackingTaskPresent:
+            jobs += [self.generateDisturbance, self.initializeJoystick]
+        jobs.append(self.render)
+        return jobs
+
+    def createRandomStreams(self):
+        self.RandomStreams = TrialRandomStreams(*self.Spec.RandomStreamsKey)
+
+    def generateDisturbance(self):
+        self.Disturbance = generateTrialDisturbance(self.RandomStreams, self.Spec.TrialDuration, self.Spec.StandardDeviationOfNoise)
+
+    def initializeJoystick(self):
+        initializeJoystick()
+        self.JoystickInitialized = True
+
+    def render(self):
+        """Renders the layers of the trial and draws them once onto a surface which is not shown"""
+        scheduler = RuntimeVariables.MessageScheduler
+        if scheduler.WarmUpSurface is None:
+            scheduler.WarmUpSurface = createSurface((Constants.ExperimentWindowSize.X, Constants.ExperimentWindowSize.Y))
+        surface = scheduler.WarmUpSurface
+        surface.blit(RuntimeVariables.LayerCache.getFilledSurface(Constants.ExperimentWindowSize.X, Constants.ExperimentWindowSize.Y, ExperimentSettings.BackgroundColorEntireScreen), (0, 0))
+        surface.blit(RuntimeVariables.LayerCache.getFilledSurface(ExperimentSettings.TaskWindowSize.X, ExperimentSettings.TaskWindowSize.Y, ExperimentSettings.BackgroundColorTaskWindows),
+                     (Constants.TopLeftCornerOfTypingTaskWindow.X, Constants.TopLeftCornerOfTypingTaskWindow.Y))
+        RuntimeVariables.TextCache.getFont(ExperimentSettings.FontSizeTypingTaskNumberSingleTask)
+        if self.TrackingTaskPresent:
+            surface.blit(RuntimeVariables.LayerCache.getTrackingWindow(getTrialSpecCircles(self.Spec)), (Constants.TopLeftCornerOfTrackingTaskWindow.X, Constants.TopLeftCornerOfTrackingTaskWindow.Y))
+
+
+def scheduleTrialWarmUp(spec):
+    """Prepares the trial of the spec while the following message screens are shown. Jobs of an earlier warm-up which were not run are dropped."""
+    RuntimeVariables.TrialWarmUp = TrialWarmUp(spec)
+    RuntimeVariables.MessageScheduler.Jobs.clear()
+    for job in RuntimeVariables.TrialWarmUp.getJobs():
+        RuntimeVariables.MessageScheduler.schedule(job)
+
+
+def getTrialWarmUp():
+    """Returns the warm-up of the current trial with all its jobs done, or None if the trial was not prepared"""
+    warmUp = RuntimeVariables.TrialWarmUp
+    if warmUp is None or warmUp.Spec is not RuntimeVariables.CurrentTrialSpec:
+        return None
+    RuntimeVariables.MessageScheduler.runJobs()  # the jobs which did not fit into the time of the messages
+    return warmUp
+
+
+def initializeJoystick():
+    # prevent the program crashing when no joystick is connected
     try:
-        position = RuntimeVariables.CursorCoordinates
-        distanceCursorMiddle = math.sqrt((abs(Constants.TrackingWindowMiddleX - position.X)) ** 2 + (abs(Constants.TrackingWindowMiddleY - position.Y)) ** 2)
-        largestCircleRadius = max(list(map(lambda circle: circle.Radius, RuntimeVariables.CurrentCircles)))
-        return distanceCursorMiddle > largestCircleRadius
-    except:
-        return False
+        pygame.joystick.init()
+        RuntimeVariables.JoystickObject = pygame.joystick.Joystick(0)
+        RuntimeVariables.JoystickObject.init()
+    except (pygame.error, NameError):
+        pass
+
+
+def ReportRmseInvarianceAcrossRenderRates(participantNumber, outputDirectory="", displayRefreshRates=(60, 120, 144, 240)):
+    """
+    Runs the simulated session of the participant (see RunSimulation()) once per display refresh rate, each in its own process,
+    and prints the distribution of the RMSE of the trialEnd rows of the tracking and dual task trials per refresh rate.
+    The sessions use the same seeds, so each trial is also compared with the same trial at the first refresh rate. The synthetic
+    participant acts when the clock advances, i.e. at the frames, so small differences remain even with identical cursor dynamics.
+    """
+    processes = {}
+    for displayRefreshRate in displayRefreshRates:
+        directory = path.join(outputDirectory, f"rmse_invariance_{displayRefreshRate}Hz")
+        processes[displayRefreshRate] = (directory, subprocess.Popen([sys.executable, path.abspath(__file__), "--simulate", str(participantNumber),
+                                                                      "--display-refresh-rate", str(displayRefreshRate), "--output-directory", directory],
+                                                                     stdout=subprocess.DEVNULL))
+    rmsesByRate = {}
+    for displayRefreshRate, (directory, process) in processes.items():
+        if process.wait() != 0:
+            raise Exception(f"The simulated session with {displayRefreshRate} Hz failed")
+        fileName = sorted(glob.glob(path.join(directory, f"participant_{participantNumber}_data_lastTrialEntry_*.csv")))[-1]
+        rows = readCsvFile(fileName)
+        column = {name: index for index, name in enumerate(rows[0])}
+        rmsesByRate[displayRefreshRate] = {int(row[column["TrialNumber"]]): float(row[column["RMSE"]]) for row in rows[1:]
+                                           if row[column["EventMessage1"]] == "trialEnd" and row[column["TrackingTaskPresent"]] == "True"}
+
+    referenceRate = displayRefreshRates[0]
+    print(f"RMSE of the tracking and dual task trials of simulated sessions of participant {participantNumber}, physics rate {ExperimentSettings.PhysicsRate} Hz")
+    for displayRefreshRate, rmses in rmsesByRate.items():
+        values = numpy.array(sorted(rmses.values()))
+        differences = numpy.array([abs(rmse - rmsesByRate[referenceRate][trialNumber]) for trialNumber, rmse in rmses.items()])
+        relativeDifferences = differences / numpy.array([rmsesByRate[referenceRate][trialNumber] for trialNumber in rmses])
+        print(f"  display {displayRefreshRate:3} Hz: {len(values)} trials, mean {values.mean():8.3f}  sd {values.std():7.3f}  median {numpy.median(values):8.3f}  "
+              f"difference to the same trial at {referenceRate} Hz: mean {100 * relativeDifferences.mean():.2f}%, max {100 * relativeDifferences.max():.2f}%")
+
+
+def isCursorOutsideCircle():
+    """Returns True if the cursor is outside of the largest circle. Without circles (e.g. before the first condition), it is never outside."""
+    return getCurrentCircleSet().isOutside(RuntimeVariables.CursorCoordinates.X, RuntimeVariables.CursorCoordinates.Y)
 
 
 def drawTypingTaskWithinCursor():
     fontsize = ExperimentSettings.FontSizeTypingTaskNumberWithinCursor
-    f = pygame.font.Font(None, fontsize)
-    typingTaskNumberText = f.render(RuntimeVariables.CurrentTypingTaskNumbers, True, ExperimentSettings.FontColorTypingTaskNumberWithinCursor)
+    f = RuntimeVariables.TextCache.getFont(fontsize)
+    typingTaskNumberText = RuntimeVariables.TextCache.render(RuntimeVariables.CurrentTypingTaskNumbers, fontsize, ExperimentSettings.FontColorTypingTaskNumberWithinCursor)
     textWidth, textHeight = f.size(RuntimeVariables.CurrentTypingTaskNumbers)
-    x = RuntimeVariables.CursorCoordinates.X - (textWidth / 2)
-    y = RuntimeVariables.CursorCoordinates.Y - (textHeight / 2)
+    x = RuntimeVariables.CursorDisplayCoordinates.X - (textWidth / 2)
+    y = RuntimeVariables.CursorDisplayCoordinates.Y - (textHeight / 2)
     RuntimeVariables.Screen.blit(typingTaskNumberText, (x, y))
+    markTrackingWindowDrawing(x, y, textWidth, textHeight)
 
 
 def closeTypingWindow():
     RuntimeVariables.TypingWindowVisible = False
-    RuntimeVariables.VisitEndTime = time.time()
+    markScreenDirty()
+    RuntimeVariables.VisitEndTime = RuntimeVariables.Clock.now()
 
 
 def drawCover(windowSide):
@@ -766,13 +2376,13 @@ def drawCover(windowSide):
         raise Exception("invalid window side specified")
 
     # draw background
-    bg = pygame.Surface((ExperimentSettings.TaskWindowSize.X, ExperimentSettings.TaskWindowSize.Y)).convert()
-    bg.fill(ExperimentSettings.CoverColor)
+    bg = RuntimeVariables.LayerCache.getFilledSurface(ExperimentSettings.TaskWindowSize.X, ExperimentSettings.TaskWindowSize.Y, ExperimentSettings.CoverColor)
     RuntimeVariables.Screen.blit(bg, (location.X, location.Y))
 
 
 def openTypingWindow():
-    RuntimeVariables.VisitStartTime = time.time()
+    markScreenDirty()
+    RuntimeVariables.VisitStartTime = RuntimeVariables.Clock.now()
     RuntimeVariables.CorrectlyTypedDigitsVisit = 0
     RuntimeVariables.IncorrectlyTypedDigitsVisit = 0
     RuntimeVariables.TypingWindowEntryCounter = RuntimeVariables.TypingWindowEntryCounter + 1
@@ -782,11 +2392,13 @@ def openTypingWindow():
 
 def closeTrackingWindow():
     RuntimeVariables.TrackingWindowVisible = False
-    RuntimeVariables.VisitEndTime = time.time()
+    markScreenDirty()
+    RuntimeVariables.VisitEndTime = RuntimeVariables.Clock.now()
 
 
 def openTrackingWindow():
-    RuntimeVariables.VisitStartTime = time.time()
+    markScreenDirty()
+    RuntimeVariables.VisitStartTime = RuntimeVariables.Clock.now()
     RuntimeVariables.TrackingWindowEntryCounter += 1
     RuntimeVariables.TrackingWindowVisible = True
 
@@ -794,34 +2406,42 @@ def openTrackingWindow():
         ApplyRewardForTypingTaskScores()
 
     # get the cursor angle
+    if RuntimeVariables.JoystickSampler:
+        RuntimeVariables.JoystickSampler.sample()  # the physics uses it from now on
+        return
     try:
-        RuntimeVariables.JoystickAxis = Vector2D(RuntimeVariables.JoystickObject.get_axis(0), RuntimeVariables.JoystickObject.get_axis(1))
+        RuntimeVariables.JoystickAxis.set(RuntimeVariables.JoystickObject.get_axis(0), RuntimeVariables.JoystickObject.get_axis(1))
     except (pygame.error, NameError, AttributeError):
         # prevent the program crashing when no joystick is connected
         pass
 
 
 def drawTypingWindow():
-    bg = pygame.Surface((ExperimentSettings.TaskWindowSize.X, ExperimentSettings.TaskWindowSize.Y)).convert()
-    bg.fill(ExperimentSettings.BackgroundColorTaskWindows)
+    bg = RuntimeVariables.LayerCache.getFilledSurface(ExperimentSettings.TaskWindowSize.X, ExperimentSettings.TaskWindowSize.Y, ExperimentSettings.BackgroundColorTaskWindows)
     RuntimeVariables.Screen.blit(bg, (Constants.TopLeftCornerOfTypingTaskWindow.X, Constants.TopLeftCornerOfTypingTaskWindow.Y))
 
     if not RuntimeVariables.ParallelDualTasks and (RuntimeVariables.CurrentTaskType == TaskTypes.DualTask or RuntimeVariables.CurrentTaskType == TaskTypes.PracticeDualTask):
         drawCover("tracking")
 
-    f = pygame.font.Font(None, ExperimentSettings.FontSizeTypingTaskNumberSingleTask)
-    typingTaskNumberText = f.render(RuntimeVariables.CurrentTypingTaskNumbers, True, (0, 0, 0))
+    f = RuntimeVariables.TextCache.getFont(ExperimentSettings.FontSizeTypingTaskNumberSingleTask)
+    typingTaskNumberText = RuntimeVariables.TextCache.render(RuntimeVariables.CurrentTypingTaskNumbers, ExperimentSettings.FontSizeTypingTaskNumberSingleTask, (0, 0, 0))
     textWidth, textHeight = f.size(RuntimeVariables.CurrentTypingTaskNumbers)
     x = (Constants.TopLeftCornerOfTypingTaskWindow.X + ExperimentSettings.TaskWindowSize.X / 2) - (textWidth / 2)
     y = (Constants.TopLeftCornerOfTypingTaskWindow.Y + ExperimentSettings.TaskWindowSize.Y / 2) - (textHeight / 2)
     RuntimeVariables.Screen.blit(typingTaskNumberText, (x, y))
+    # the old text is covered by the background, so both the old and the new text area have changed
+    if RuntimeVariables.TypingTextRect:
+        RuntimeVariables.DirtyRectangles.append(RuntimeVariables.TypingTextRect)
+    RuntimeVariables.TypingTextRect = markDirty(x, y, textWidth, textHeight)
 
 
 def drawTrackingWindow():
-    bg = pygame.Surface((ExperimentSettings.TaskWindowSize.X, ExperimentSettings.TaskWindowSize.Y)).convert()
-    bg.fill(ExperimentSettings.BackgroundColorTaskWindows)
-    drawCircles(bg)
+    bg = RuntimeVariables.LayerCache.getTrackingWindow()  # background and circles are only rendered again when they change
     RuntimeVariables.Screen.blit(bg, (Constants.TopLeftCornerOfTrackingTaskWindow.X, Constants.TopLeftCornerOfTrackingTaskWindow.Y))
+    # The background covers everything drawn since the last time, e.g. the old cursor positions
+    for rect in RuntimeVariables.TrackingWindowDrawnRects:
+        RuntimeVariables.DirtyRectangles.append(rect)
+    RuntimeVariables.TrackingWindowDrawnRects.clear()
     # Show the number of points above the tracking circle
     displayForNormalTasks = RuntimeVariables.CurrentTaskType == TaskTypes.DualTask and RuntimeVariables.DisplayScoreForNormalTrials
     displayForPracticeTasks = RuntimeVariables.CurrentTaskType == TaskTypes.PracticeDualTask and RuntimeVariables.DisplayScoreForPracticeTrials
@@ -829,22 +2449,31 @@ def drawTrackingWindow():
         drawDualTaskScoreAboveCircle()
 
 
+def markTrackingWindowDrawing(x, y, width, height):
+    """Marks an area drawn over the tracking window background, it is changed again when the background is drawn the next time"""
+    rect = markDirty(x, y, width, height)
+    if rect:
+        RuntimeVariables.TrackingWindowDrawnRects.append(rect)
+
+
 def drawCursor():
-    newCursorLocation = Vector2D(RuntimeVariables.CursorCoordinates.X - (ExperimentSettings.CursorSize.X / 2), RuntimeVariables.CursorCoordinates.Y - (ExperimentSettings.CursorSize.Y / 2))
-    newCursor = pygame.Surface((ExperimentSettings.CursorSize.X, ExperimentSettings.CursorSize.Y)).convert()
-    newCursor.fill(RuntimeVariables.CurrentCursorColor)
-    RuntimeVariables.Screen.blit(newCursor, (newCursorLocation.X, newCursorLocation.Y))  # blit puts something new on the screen
+    newCursorX = RuntimeVariables.CursorDisplayCoordinates.X - (ExperimentSettings.CursorSize.X / 2)
+    newCursorY = RuntimeVariables.CursorDisplayCoordinates.Y - (ExperimentSettings.CursorSize.Y / 2)
+    newCursor = RuntimeVariables.LayerCache.getFilledSurface(ExperimentSettings.CursorSize.X, ExperimentSettings.CursorSize.Y, RuntimeVariables.CurrentCursorColor)
+    RuntimeVariables.Screen.blit(newCursor, (newCursorX, newCursorY))  # blit puts something new on the screen
+    markTrackingWindowDrawing(newCursorX, newCursorY, ExperimentSettings.CursorSize.X, ExperimentSettings.CursorSize.Y)
 
 
 def drawDualTaskScoreAboveCircle():
     """Draws the visit score above the circle for switching dual tasks"""
     intermediateMessage = f"{int(RuntimeVariables.VisitScore)} Punkte"
     fontsize = ExperimentSettings.GeneralFontSize
-    f = pygame.font.Font(None, fontsize)
+    f = RuntimeVariables.TextCache.getFont(fontsize)
     textWidth, textHeight = f.size(intermediateMessage)
     x = Constants.TopLeftCornerOfTrackingTaskWindow.X + (ExperimentSettings.TaskWindowSize.X / 2) - (textWidth / 2)
     y = Constants.TopLeftCornerOfTrackingTaskWindow.Y + 10
     printTextOverMultipleLines(intermediateMessage, Vector2D(x, y))
+    markTrackingWindowDrawing(x, y, textWidth, textHeight)
 
 
 def ApplyRewardForTypingTaskScores():
@@ -878,331 +2507,340 @@ def ApplyRewardForTypingTaskScores():
     writeOutputDataFile("updatedVisitScore", "penaltyApplied" if applyPenalty else "NoPenaltyApplied")
 
 
-def runSingleTaskTypingTrials(isPracticeTrial, numberOfTrials):
-    writeLogFile("--> Practice SingleTyping" if isPracticeTrial else "SingleTyping")
-    RuntimeVariables.BlockNumber += 1
-
-    if isPracticeTrial:
-        RuntimeVariables.CurrentTaskType = TaskTypes.PracticeSingleTyping
-        if not RuntimeVariables.ShowOnlyGetReadyMessage:
-            DisplayMessage("Nur Tippen\n\n"
-                           "In diesen Durchgängen übst du nur die Tippaufgabe.\n"
-                           "Kopiere die Ziffern, die dir auf dem Bildschirm angezeigt werden so schnell wie möglich.\n\n"
-                           "Wenn du einen Fehler machst, wird die Ziffernfolge nicht fortgesetzt.\n"
-                           "(In zukünftigen Durchgängen würdest du dadurch Punkte verlieren.)", 15)
-    else:
-        RuntimeVariables.CurrentTaskType = TaskTypes.SingleTyping
-        if not RuntimeVariables.ShowOnlyGetReadyMessage:
-            DisplayMessage("Nur Tippen\n\n"
-                           "Kopiere die Ziffern so schnell wie möglich.\n"
-                           "Wenn du einen Fehler machst, wird die Ziffernfolge nicht fortgesetzt.\n", 10)
-
-    RuntimeVariables.CurrentTypingTaskNumbersLength = ExperimentSettings.SingleTypingTaskNumbersLength
-
-    print(f"{RuntimeVariables.CurrentTaskType}, total {numberOfTrials} trials")
-    for i in range(0, numberOfTrials):
-        print(f"Trial {i}")
-        RuntimeVariables.NumberOfCircleExits = 0
-        RuntimeVariables.TrialScore = 0
-        RuntimeVariables.CorrectlyTypedDigitsVisit = 0
-        RuntimeVariables.IncorrectlyTypedDigitsVisit = 0
-        RuntimeVariables.IncorrectlyTypedDigitsTrial = 0
-        RuntimeVariables.CursorDistancesToMiddle = []
-        RuntimeVariables.LengthOfPathTracked = 0
-        RuntimeVariables.CumulatedTrackingScoreForParallelDualTasks = 0
-
-        CountdownMessage(3)
-        pygame.event.clear()  # clear all events
-        RuntimeVariables.TrackingWindowVisible = False
-        RuntimeVariables.TypingWindowVisible = True
-
-        RuntimeVariables.TrackingTaskPresent = False
-        RuntimeVariables.TypingTaskPresent = True
-        RuntimeVariables.TrialNumber += 1
-        RuntimeVariables.TrackingWindowEntryCounter = 0
-        RuntimeVariables.TypingWindowEntryCounter = 0
+def runSingleTaskTypingTrial(spec):
+    RuntimeVariables.NumberOfCircleExits = 0
+    RuntimeVariables.TrialScore = 0
+    RuntimeVariables.CorrectlyTypedDigitsVisit = 0
+    RuntimeVariables.IncorrectlyTypedDigitsVisit = 0
+    RuntimeVariables.IncorrectlyTypedDigitsTrial = 0
+    RuntimeVariables.TrackingStatistics.reset()
+    RuntimeVariables.TrialSamples.reset(spec.TrialDuration)
+    RuntimeVariables.ScoreEngine.reset()
 
-        completebg = pygame.Surface((Constants.ExperimentWindowSize.X, Constants.ExperimentWindowSize.Y)).convert()
-        completebg.fill(ExperimentSettings.BackgroundColorEntireScreen)
-        RuntimeVariables.Screen.blit(completebg, (0, 0))
+    CountdownMessage(3)
+    pygame.event.clear()  # clear all events
+    RuntimeVariables.TrackingWindowVisible = False
+    RuntimeVariables.TypingWindowVisible = True
 
-        RuntimeVariables.StartTimeCurrentTrial = time.time()
+    RuntimeVariables.TrackingTaskPresent = False
+    RuntimeVariables.TypingTaskPresent = True
+    RuntimeVariables.TrialNumber = spec.TrialNumber
+    createTrialRandomStreams()
+    RuntimeVariables.TrackingWindowEntryCounter = 0
+    RuntimeVariables.TypingWindowEntryCounter = 0
 
-        if RuntimeVariables.TypingTaskPresent:
-            UpdateTypingTaskString(reset=True)  # generate numbers initially
-            RuntimeVariables.EnteredDigitsStr = ""
-            RuntimeVariables.DigitPressTimes = [RuntimeVariables.StartTimeCurrentTrial]
+    completebg = RuntimeVariables.LayerCache.getFilledSurface(Constants.ExperimentWindowSize.X, Constants.ExperimentWindowSize.Y, ExperimentSettings.BackgroundColorEntireScreen)
+    RuntimeVariables.Screen.blit(completebg, (0, 0))
+    markScreenDirty()
 
-            if RuntimeVariables.TypingWindowVisible:
-                openTypingWindow()
-            else:
-                closeTypingWindow()
+    RuntimeVariables.StartTimeCurrentTrial = RuntimeVariables.Clock.now()
+    RuntimeVariables.TrialScheduler = TrialScheduler(RuntimeVariables.Clock, Constants.TrialTickInterval, spec.TrialDuration, RuntimeVariables.StartTimeCurrentTrial)
 
-        writeOutputDataFile("trialStart", "-")
+    if RuntimeVariables.TypingTaskPresent:
+        UpdateTypingTaskString(reset=True)  # generate numbers initially
+        RuntimeVariables.EnteredDigitsStr = ""
+        RuntimeVariables.TrialSamples.addKeyPress(RuntimeVariables.StartTimeCurrentTrial)
 
-        while (time.time() - RuntimeVariables.StartTimeCurrentTrial) < ExperimentSettings.MaxTrialTimeSingleTyping and RuntimeVariables.EnvironmentIsRunning:
-            checkKeyPressed()  # checks keypresses for both the tracking task and the typingTask and starts relevant display updates
+        if RuntimeVariables.TypingWindowVisible:
+            openTypingWindow()
+        else:
+            closeTypingWindow()
+
+    if RuntimeVariables.HotPathProfiler:
+        RuntimeVariables.HotPathProfiler.startTrial()
+    writeOutputDataFile("trialStart", "-")
+    RuntimeVariables.RenderStatistics.startTrial()
+    if RuntimeVariables.FrameTimingRecorder:
+        RuntimeVariables.FrameTimingRecorder.startTrial(spec.TrialDuration)
+    if RuntimeVariables.InputLatencyRecorder:
+        RuntimeVariables.InputLatencyRecorder.startTrial()
+
+    while RuntimeVariables.TrialScheduler.waitForNextTick() and RuntimeVariables.EnvironmentIsRunning:
+        checkKeyPressed()  # checks keypresses for both the tracking task and the typingTask and starts relevant display updates
+        if RuntimeVariables.ParallelDualTasks:
+            RuntimeVariables.ScoreEngine.advance()
+            if (not spec.IsPracticeTrial and RuntimeVariables.FeedbackMode == FeedbackMode.Live) or (spec.IsPracticeTrial and RuntimeVariables.DisplayScoreForPracticeTrials):
+                DisplayLiveFeedbackParallelDualTasks(TaskTypes.SingleTyping)
+        updateDisplay()
+
+    frameTimingFlags = RuntimeVariables.FrameTimingRecorder.endTrial() if RuntimeVariables.FrameTimingRecorder else "-"
+    writeOutputDataFile("trialEnd", frameTimingFlags, endOfTrial=True)
+    RuntimeVariables.RenderStatistics.reportTrial()
+    RuntimeVariables.TrialSamples.reportTrial()
+    if RuntimeVariables.InputLatencyRecorder:
+        RuntimeVariables.InputLatencyRecorder.endTrial()
+    if RuntimeVariables.HotPathProfiler:
+        RuntimeVariables.HotPathProfiler.endTrial()
+    RuntimeVariables.TrialScheduler = None
+
+
+def runSingleTaskTrackingTrial(spec):
+    RuntimeVariables.NumberOfCircleExits = 0
+    RuntimeVariables.TrialScore = 0
+    CountdownMessage(3)
+    pygame.event.clear()
+    RuntimeVariables.TrackingWindowVisible = True
+    RuntimeVariables.TypingWindowVisible = False
+    RuntimeVariables.TrackingTaskPresent = True
+    RuntimeVariables.TypingTaskPresent = False
+    RuntimeVariables.CorrectlyTypedDigitsVisit = 0
+    RuntimeVariables.IncorrectlyTypedDigitsVisit = 0
+    RuntimeVariables.IncorrectlyTypedDigitsTrial = 0
+    RuntimeVariables.TrackingStatistics.reset()
+    RuntimeVariables.TrialSamples.reset(spec.TrialDuration)
+    RuntimeVariables.ScoreEngine.reset()
+
+    RuntimeVariables.TrialNumber = spec.TrialNumber
+    createTrialRandomStreams()
+    bg = RuntimeVariables.LayerCache.getFilledSurface(Constants.ExperimentWindowSize.X, Constants.ExperimentWindowSize.Y, ExperimentSettings.BackgroundColorEntireScreen)
+    RuntimeVariables.Screen.blit(bg, (0, 0))
+    markScreenDirty()
+
+    RuntimeVariables.StartTimeCurrentTrial = RuntimeVariables.Clock.now()
+    RuntimeVariables.TrialScheduler = TrialScheduler(RuntimeVariables.Clock, Constants.TrialTickInterval, spec.TrialDuration, RuntimeVariables.StartTimeCurrentTrial)
+    createCursorPhysics(spec.TrialDuration)
+
+    RuntimeVariables.TrackingWindowEntryCounter = 0
+    RuntimeVariables.TypingWindowEntryCounter = 0
+    RuntimeVariables.CursorCoordinates.set(Constants.TrackingWindowMiddleX, Constants.TrackingWindowMiddleY)
+
+    if RuntimeVariables.TrackingTaskPresent:
+        RuntimeVariables.JoystickAxis.set(0, 0)
+        warmUp = getTrialWarmUp()
+        if not (warmUp and warmUp.JoystickInitialized):
+            initializeJoystick()
+        if RuntimeVariables.JoystickSampler:
+            RuntimeVariables.JoystickSampler.startTrial()
+
+        if RuntimeVariables.TrackingWindowVisible:
+            openTrackingWindow()
+        else:
+            closeTrackingWindow()
+
+    if RuntimeVariables.HotPathProfiler:
+        RuntimeVariables.HotPathProfiler.startTrial()
+    writeOutputDataFile("trialStart", "-")
+    RuntimeVariables.RenderStatistics.startTrial()
+    if RuntimeVariables.FrameTimingRecorder:
+        RuntimeVariables.FrameTimingRecorder.startTrial(spec.TrialDuration)
+    if RuntimeVariables.InputLatencyRecorder:
+        RuntimeVariables.InputLatencyRecorder.startTrial()
+
+    while RuntimeVariables.TrialScheduler.waitForNextTick() and RuntimeVariables.EnvironmentIsRunning:
+        checkKeyPressed()  # checks keypresses for both the trackingtask and the typingTask and starts relevant display updates
+
+        if RuntimeVariables.ParallelDualTasks:
+            if (not spec.IsPracticeTrial and RuntimeVariables.FeedbackMode == FeedbackMode.Live) or (spec.IsPracticeTrial and RuntimeVariables.DisplayScoreForPracticeTrials):
+                DisplayLiveFeedbackParallelDualTasks(TaskTypes.SingleTracking)
+
+        if RuntimeVariables.TrackingTaskPresent and RuntimeVariables.TrackingWindowVisible:
+            updateCursor(Constants.TrialTickInterval)  # calls drawTrackingWindow() and drawCursor()
             if RuntimeVariables.ParallelDualTasks:
-                if (not isPracticeTrial and RuntimeVariables.FeedbackMode == FeedbackMode.Live) or (isPracticeTrial and RuntimeVariables.DisplayScoreForPracticeTrials):
-                    DisplayLiveFeedbackParallelDualTasks(TaskTypes.SingleTyping)
-            pygame.display.flip()
-            time.sleep(0.02)
+                RuntimeVariables.ScoreEngine.advance()  # with the RMSE of this tick, the row and the next live feedback read it
+            writeOutputDataFile("trackingVisible", "-")
+
+    frameTimingFlags = RuntimeVariables.FrameTimingRecorder.endTrial() if RuntimeVariables.FrameTimingRecorder else "-"
+    writeOutputDataFile("trialEnd", frameTimingFlags, endOfTrial=True)
+    RuntimeVariables.RenderStatistics.reportTrial()
+    RuntimeVariables.TrialSamples.reportTrial()
+    if RuntimeVariables.InputLatencyRecorder:
+        RuntimeVariables.InputLatencyRecorder.endTrial()
+    if RuntimeVariables.HotPathProfiler:
+        RuntimeVariables.HotPathProfiler.endTrial()
+    RuntimeVariables.TrialScheduler = None
+
+
+def runDualTaskTrial(spec):
+    RuntimeVariables.NumberOfCircleExits = 0
+    RuntimeVariables.TrialScore = 0
+    RuntimeVariables.CorrectlyTypedDigitsVisit = 0
+    RuntimeVariables.IncorrectlyTypedDigitsVisit = 0
+    RuntimeVariables.IncorrectlyTypedDigitsTrial = 0
+    RuntimeVariables.TrackingStatistics.reset()
+    RuntimeVariables.TrialSamples.reset(spec.TrialDuration)
+    RuntimeVariables.ScoreEngine.reset()
 
-        writeOutputDataFile("trialEnd", "-", endOfTrial=True)
+    CountdownMessage(3)
+    pygame.event.clear()  # clear all events
 
-        if not isPracticeTrial and RuntimeVariables.DisplayScoreForNormalTrials:
-            if RuntimeVariables.ParallelDualTasks:
-                if RuntimeVariables.FeedbackMode == FeedbackMode.AfterTrialsInInterval and ((i + 1) % RuntimeVariables.IntervalForFeedbackAfterTrials == 0 or i == numberOfTrials - 1):
-                    DisplayFeedbackParallelDualTasksAfterTrial()
-            else:
-                DisplayFeedbackSwitchingDualTaskAfterTrial()
-
-
-def runSingleTaskTrackingTrials(isPracticeTrial, numberOfTrials):
-    writeLogFile("--> Practice SingleTracking" if isPracticeTrial else "SingleTracking")
-    RuntimeVariables.BlockNumber += 1
-
-    if isPracticeTrial:
-        RuntimeVariables.CurrentTaskType = TaskTypes.PracticeSingleTracking
-        if not RuntimeVariables.ShowOnlyGetReadyMessage:
-            DisplayMessage(
-                "Nur Tracking\n\n"
-                "In diesen Durchgängen übst du nur die Trackingaufgabe.\n"
-                "Du kannst ausprobieren, wie der Joystick funktioniert und sehen, wie schnell der Cursor umherwandert.\n"
-                "Der Cursor bewegt sich so lange frei herum, bis du ihn mit dem Joystick bewegst.\n"
-                "Denk daran: deine Aufgabe ist es, zu verhindern, dass der Cursor den Kreis verlässt!",
-                15)
-    else:
-        RuntimeVariables.CurrentTaskType = TaskTypes.SingleTracking
-        if not RuntimeVariables.ShowOnlyGetReadyMessage:
-            DisplayMessage("Nur Tracking\n\n"
-                           "Nutze diesen Durchgang, um dich mit der Geschwindigkeit des Cursors vertraut zu machen, \n"
-                           "und denk daran den Cursor mit deinem Joystick in der Kreismitte zu halten.",
-                           10)
-
-    print(f"{RuntimeVariables.CurrentTaskType}, total {numberOfTrials} trials")
-    for i in range(0, numberOfTrials):
-        print(f"Trial {i}")
-        RuntimeVariables.NumberOfCircleExits = 0
-        RuntimeVariables.TrialScore = 0
-        CountdownMessage(3)
-        pygame.event.clear()
+    if RuntimeVariables.DisplayTypingTaskWithinCursor:
         RuntimeVariables.TrackingWindowVisible = True
         RuntimeVariables.TypingWindowVisible = False
-        RuntimeVariables.TrackingTaskPresent = True
-        RuntimeVariables.TypingTaskPresent = False
-        RuntimeVariables.CorrectlyTypedDigitsVisit = 0
-        RuntimeVariables.IncorrectlyTypedDigitsVisit = 0
-        RuntimeVariables.IncorrectlyTypedDigitsTrial = 0
-        RuntimeVariables.CursorDistancesToMiddle = []
-        RuntimeVariables.LengthOfPathTracked = 0
-        RuntimeVariables.CumulatedTrackingScoreForParallelDualTasks = 0
-
-        RuntimeVariables.TrialNumber = RuntimeVariables.TrialNumber + 1
-        bg = pygame.Surface((Constants.ExperimentWindowSize.X, Constants.ExperimentWindowSize.Y)).convert()
-        bg.fill(ExperimentSettings.BackgroundColorEntireScreen)
-        RuntimeVariables.Screen.blit(bg, (0, 0))
-
-        RuntimeVariables.StartTimeCurrentTrial = time.time()
-
-        RuntimeVariables.TrackingWindowEntryCounter = 0
-        RuntimeVariables.TypingWindowEntryCounter = 0
-        RuntimeVariables.CursorCoordinates = Vector2D(Constants.TrackingWindowMiddleX, Constants.TrackingWindowMiddleY)
-
-        if RuntimeVariables.TrackingTaskPresent:
-            RuntimeVariables.JoystickAxis = Vector2D(0, 0)
-            # prevent the program crashing when no joystick is connected
-            try:
-                pygame.joystick.init()
-                RuntimeVariables.JoystickObject = pygame.joystick.Joystick(0)
-                RuntimeVariables.JoystickObject.init()
-            except (pygame.error, NameError):
-                pass
-
-            if RuntimeVariables.TrackingWindowVisible:
-                openTrackingWindow()
-            else:
-                closeTrackingWindow()
-
-        writeOutputDataFile("trialStart", "-")
-
-        while ((time.time() - RuntimeVariables.StartTimeCurrentTrial) < ExperimentSettings.MaxTrialTimeSingleTracking) and RuntimeVariables.EnvironmentIsRunning:
-            checkKeyPressed()  # checks keypresses for both the trackingtask and the typingTask and starts relevant display updates
-
-            if RuntimeVariables.ParallelDualTasks:
-                if (not isPracticeTrial and RuntimeVariables.FeedbackMode == FeedbackMode.Live) or (isPracticeTrial and RuntimeVariables.DisplayScoreForPracticeTrials):
-                    DisplayLiveFeedbackParallelDualTasks(TaskTypes.SingleTracking)
-
-            if RuntimeVariables.TrackingTaskPresent and RuntimeVariables.TrackingWindowVisible:
-                updateCursor(0.02)  # calls drawTrackingWindow() and drawCursor()
-                writeOutputDataFile("trackingVisible", "-")
-
-        writeOutputDataFile("trialEnd", "-", endOfTrial=True)
-
-        if not isPracticeTrial and RuntimeVariables.DisplayScoreForNormalTrials:
-            if RuntimeVariables.ParallelDualTasks:
-                if RuntimeVariables.FeedbackMode == FeedbackMode.AfterTrialsInInterval and ((i + 1) % RuntimeVariables.IntervalForFeedbackAfterTrials == 0 or i == numberOfTrials - 1):
-                    DisplayFeedbackParallelDualTasksAfterTrial()
-
-        # At the trial end: clear distances for RMSE
-        RuntimeVariables.CursorDistancesToMiddle = []
+    elif RuntimeVariables.ParallelDualTasks:
+        RuntimeVariables.TrackingWindowVisible = True
+        RuntimeVariables.TypingWindowVisible = True
+    else:  # normal dual task with switching
+        RuntimeVariables.TrackingWindowVisible = False
+        RuntimeVariables.TypingWindowVisible = True
 
+    RuntimeVariables.TrackingTaskPresent = True
+    RuntimeVariables.TypingTaskPresent = True
 
-def runDualTaskTrials(isPracticeTrial, numberOfTrials):
-    writeLogFile("--> Practice DualTask" if isPracticeTrial else "DualTask")
-    RuntimeVariables.BlockNumber += 1
+    RuntimeVariables.TrackingWindowEntryCounter = 0
+    RuntimeVariables.TypingWindowEntryCounter = 0
+    RuntimeVariables.TrialNumber = spec.TrialNumber
+    createTrialRandomStreams()
+    RuntimeVariables.CursorCoordinates.set(Constants.TrackingWindowMiddleX, Constants.TrackingWindowMiddleY)
 
-    if isPracticeTrial:
-        RuntimeVariables.CurrentTaskType = TaskTypes.PracticeDualTask
+    completebg = RuntimeVariables.LayerCache.getFilledSurface(Constants.ExperimentWindowSize.X, Constants.ExperimentWindowSize.Y, ExperimentSettings.BackgroundColorEntireScreen)
+    RuntimeVariables.Screen.blit(completebg, (0, 0))
+    markScreenDirty()
+
+    RuntimeVariables.StartTimeCurrentTrial = RuntimeVariables.Clock.now()
+    RuntimeVariables.TrialScheduler = TrialScheduler(RuntimeVariables.Clock, Constants.TrialTickInterval, spec.TrialDuration, RuntimeVariables.StartTimeCurrentTrial)
+    createCursorPhysics(spec.TrialDuration)
+
+    if RuntimeVariables.TrackingTaskPresent:
+        RuntimeVariables.JoystickAxis.set(0, 0)
+        warmUp = getTrialWarmUp()
+        if not (warmUp and warmUp.JoystickInitialized):
+            initializeJoystick()
+        if RuntimeVariables.JoystickSampler:
+            RuntimeVariables.JoystickSampler.startTrial()
+
+        if RuntimeVariables.TrackingWindowVisible:
+            openTrackingWindow()
+        else:
+            closeTrackingWindow()
 
-        if not RuntimeVariables.ShowOnlyGetReadyMessage:
-            message = "Tracking + Tippen (MULTITASKING)\n\n" \
-                      "Du übst jetzt beide Aufgaben gleichzeitig!\n\n"
+    if RuntimeVariables.TypingTaskPresent:
+        UpdateTypingTaskString(reset=True)  # generate numbers initially
+        RuntimeVariables.EnteredDigitsStr = ""
+        RuntimeVariables.TrialSamples.addKeyPress(RuntimeVariables.StartTimeCurrentTrial)
+        if RuntimeVariables.TypingWindowVisible:
+            openTypingWindow()
+        else:
+            closeTypingWindow()
+
+    if RuntimeVariables.HotPathProfiler:
+        RuntimeVariables.HotPathProfiler.startTrial()
+    writeOutputDataFile("trialStart", "-")
+    RuntimeVariables.RenderStatistics.startTrial()
+    if RuntimeVariables.FrameTimingRecorder:
+        RuntimeVariables.FrameTimingRecorder.startTrial(spec.TrialDuration)
+    if RuntimeVariables.InputLatencyRecorder:
+        RuntimeVariables.InputLatencyRecorder.startTrial()
+
+    while RuntimeVariables.TrialScheduler.waitForNextTick() and RuntimeVariables.EnvironmentIsRunning:
+        checkKeyPressed()  # checks keypresses for both the tracking task and the typingTask and starts relevant display updates
+
+        if RuntimeVariables.ParallelDualTasks and RuntimeVariables.TypingTaskPresent and RuntimeVariables.TypingWindowVisible and not RuntimeVariables.DisplayTypingTaskWithinCursor:
+            drawTypingWindow()
+        if RuntimeVariables.ParallelDualTasks:
+            if (not spec.IsPracticeTrial and RuntimeVariables.FeedbackMode == FeedbackMode.Live) or (spec.IsPracticeTrial and RuntimeVariables.DisplayScoreForPracticeTrials):
+                DisplayLiveFeedbackParallelDualTasks(TaskTypes.DualTask)
+        updateCursor(Constants.TrialTickInterval)  # also draws tracking window and typing task in cursor
+        if RuntimeVariables.ParallelDualTasks:
+            RuntimeVariables.ScoreEngine.advance()  # with the RMSE of this tick, the row and the next live feedback read it
+
+        if RuntimeVariables.TrackingTaskPresent and RuntimeVariables.TrackingWindowVisible:
             if not RuntimeVariables.ParallelDualTasks:
-                message += "Die Ziffernaufgabe wird dir immer zuerst angezeigt.\n" \
-                           "Drücke den Schalter unter deinem Zeigefinger am Joystick, um zu kontrollieren ob der Cursor\n" \
-                           "noch innerhalb des Kreises ist.\n" \
-                           "Lasse den Schalter wieder los, um zur Ziffernaufgabe zurück zu gelangen.\n" \
-                           "Du kannst immer nur eine Aufgabe bearbeiten."
-            DisplayMessage(message, 10)
-
-            message = ""
-            if RuntimeVariables.DisplayScoreForPracticeTrials:
-                message += "Dein Ziel:\n\n" \
-                           "Kopiere die Ziffern so schnell wie möglich, dadurch gewinnst du Punkte.\n" \
-                           "Fehler beim Tippen führen zu Punkteverlust.\n"
-            if not RuntimeVariables.Penalty == Penalty.NoPenalty:
-                message += "Pass auf, dass der Cursor den Kreis nicht verlässt, sonst verlierst du Punkte.\n"
-            if message:
-                DisplayMessage(message, 10)
-
-    # Normal (no practice) trial
+                drawCover("typing")
+
+        # When drawing the typing task in cursor, the display update is done in updateCursor(). For switching dual tasks, update must be done here.
+        if not (RuntimeVariables.DisplayTypingTaskWithinCursor and RuntimeVariables.ParallelDualTasks):
+            updateDisplay()
+
+        if RuntimeVariables.ParallelDualTasks:
+            eventMsg = "trackingAndTypingVisible"
+        elif RuntimeVariables.TrackingWindowVisible:
+            eventMsg = "trackingVisible"
+        elif RuntimeVariables.TypingWindowVisible:
+            eventMsg = "typingVisible"
+        else:
+            eventMsg = ""
+
+        writeOutputDataFile(eventMsg, "-")
+
+    RuntimeVariables.VisitEndTime = RuntimeVariables.Clock.now()
+    ApplyRewardForTypingTaskScores()
+
+    frameTimingFlags = RuntimeVariables.FrameTimingRecorder.endTrial() if RuntimeVariables.FrameTimingRecorder else "-"
+    writeOutputDataFile("trialEnd", frameTimingFlags, endOfTrial=True)
+    RuntimeVariables.RenderStatistics.reportTrial()
+    RuntimeVariables.TrialSamples.reportTrial()
+    if RuntimeVariables.InputLatencyRecorder:
+        RuntimeVariables.InputLatencyRecorder.endTrial()
+    if RuntimeVariables.HotPathProfiler:
+        RuntimeVariables.HotPathProfiler.endTrial()
+    RuntimeVariables.TrialScheduler = None
+
+
+def startCondition(spec):
+    """Sets the condition of the spec, at the first trial of each condition"""
+    RuntimeVariables.StandardDeviationOfNoise = spec.StandardDeviationOfNoise
+    RuntimeVariables.CurrentCircles = getTrialSpecCircles(spec)
+    getCurrentCircleSet()  # build the index before the first trial
+    RuntimeVariables.Penalty = spec.Penalty
+    RuntimeVariables.PenaltyAmount = spec.PenaltyAmount
+    RuntimeVariables.TypingRewardCorrectDigit = spec.TypingRewardCorrectDigit
+    RuntimeVariables.OutputRowEncoder.conditionChanged()
+    if spec.IsPracticeTrial:
+        print(f"Practice trial. Penalty: {RuntimeVariables.Penalty}, Noise: {RuntimeVariables.StandardDeviationOfNoise}, Gain: {RuntimeVariables.TypingRewardCorrectDigit}")
     else:
-        RuntimeVariables.CurrentTaskType = TaskTypes.DualTask
-        if not RuntimeVariables.ShowOnlyGetReadyMessage:
-            if RuntimeVariables.DisplayScoreForNormalTrials:
-                message = "Dein Ziel:\n\n" \
-                          "Kopiere die Ziffern so schnell wie möglich, dadurch gewinnst du Punkte.\n" \
-                          "Fehler beim Tippen führen zu Punkteverlust.\n"
-                if not RuntimeVariables.Penalty == Penalty.NoPenalty:
-                    message += "Aber pass auf, dass der Cursor den Kreis nicht verlässt, sonst verlierst du Punkte.\n"
-                message += "Wichtig: Deine Leistung in diesen Durchgängen zählt für deine Gesamtpunktzahl."
-                DisplayMessage(message, 18)
-            if not RuntimeVariables.ParallelDualTasks:
-                DisplayMessage("Drücke den Schalter unter deinem Zeigefinger, um das Trackingfenster zu öffnen.\n"
-                               "Um wieder zurück zur Tippaufgabe zu gelangen, lässt du den Schalter wieder los.\n"
-                               "Du kannst immer nur eine Aufgabe bearbeiten.", 15)
-
-    RuntimeVariables.CurrentTypingTaskNumbersLength = 1 if RuntimeVariables.ParallelDualTasks else ExperimentSettings.SingleTypingTaskNumbersLength
-
-    print(f"{RuntimeVariables.CurrentTaskType}, total {numberOfTrials} trials")
-    for i in range(0, numberOfTrials):
-        print(f"Trial {i}")
-        RuntimeVariables.NumberOfCircleExits = 0
-        RuntimeVariables.TrialScore = 0
-        RuntimeVariables.CorrectlyTypedDigitsVisit = 0
-        RuntimeVariables.IncorrectlyTypedDigitsVisit = 0
-        RuntimeVariables.IncorrectlyTypedDigitsTrial = 0
-        RuntimeVariables.CursorDistancesToMiddle = []
-        RuntimeVariables.LengthOfPathTracked = 0
-        RuntimeVariables.CumulatedTrackingScoreForParallelDualTasks = 0
-
-        CountdownMessage(3)
-        pygame.event.clear()  # clear all events
-
-        if RuntimeVariables.DisplayTypingTaskWithinCursor:
-            RuntimeVariables.TrackingWindowVisible = True
-            RuntimeVariables.TypingWindowVisible = False
-        elif RuntimeVariables.ParallelDualTasks:
-            RuntimeVariables.TrackingWindowVisible = True
-            RuntimeVariables.TypingWindowVisible = True
-        else:  # normal dual task with switching
-            RuntimeVariables.TrackingWindowVisible = False
-            RuntimeVariables.TypingWindowVisible = True
-
-        RuntimeVariables.TrackingTaskPresent = True
-        RuntimeVariables.TypingTaskPresent = True
-
-        RuntimeVariables.TrackingWindowEntryCounter = 0
-        RuntimeVariables.TypingWindowEntryCounter = 0
-        RuntimeVariables.TrialNumber = RuntimeVariables.TrialNumber + 1
-        RuntimeVariables.CursorCoordinates = Vector2D(Constants.TrackingWindowMiddleX, Constants.TrackingWindowMiddleY)
-
-        completebg = pygame.Surface((Constants.ExperimentWindowSize.X, Constants.ExperimentWindowSize.Y)).convert()
-        completebg.fill(ExperimentSettings.BackgroundColorEntireScreen)
-        RuntimeVariables.Screen.blit(completebg, (0, 0))
-
-        RuntimeVariables.StartTimeCurrentTrial = time.time()
-
-        if RuntimeVariables.TrackingTaskPresent:
-            RuntimeVariables.JoystickAxis = Vector2D(0, 0)
-            # prevent the program crashing when no joystick is connected
-            try:
-                pygame.joystick.init()
-                RuntimeVariables.JoystickObject = pygame.joystick.Joystick(0)
-                RuntimeVariables.JoystickObject.init()
-            except (pygame.error, NameError):
-                pass
-
-            if RuntimeVariables.TrackingWindowVisible:
-                openTrackingWindow()
-            else:
-                closeTrackingWindow()
-
-        if RuntimeVariables.TypingTaskPresent:
-            UpdateTypingTaskString(reset=True)  # generate numbers initially
-            RuntimeVariables.EnteredDigitsStr = ""
-            RuntimeVariables.DigitPressTimes = [RuntimeVariables.StartTimeCurrentTrial]
-            if RuntimeVariables.TypingWindowVisible:
-                openTypingWindow()
-            else:
-                closeTypingWindow()
-
-        writeOutputDataFile("trialStart", "-")
-
-        while (time.time() - RuntimeVariables.StartTimeCurrentTrial) < ExperimentSettings.MaxTrialTimeDual and RuntimeVariables.EnvironmentIsRunning:
-            checkKeyPressed()  # checks keypresses for both the tracking task and the typingTask and starts relevant display updates
-
-            if RuntimeVariables.ParallelDualTasks and RuntimeVariables.TypingTaskPresent and RuntimeVariables.TypingWindowVisible and not RuntimeVariables.DisplayTypingTaskWithinCursor:
-                drawTypingWindow()
-            if RuntimeVariables.ParallelDualTasks:
-                if (not isPracticeTrial and RuntimeVariables.FeedbackMode == FeedbackMode.Live) or (isPracticeTrial and RuntimeVariables.DisplayScoreForPracticeTrials):
-                    DisplayLiveFeedbackParallelDualTasks(TaskTypes.DualTask)
-            updateCursor(0.02)  # also draws tracking window and typing task in cursor
-
-            if RuntimeVariables.TrackingTaskPresent and RuntimeVariables.TrackingWindowVisible:
-                if not RuntimeVariables.ParallelDualTasks:
-                    drawCover("typing")
-
-            # When drawing the typing task in cursor, the display update is done in updateCursor(). For switching dual tasks, update must be done here.
-            if not (RuntimeVariables.DisplayTypingTaskWithinCursor and RuntimeVariables.ParallelDualTasks):
-                pygame.display.flip()  # update display
-
-            if RuntimeVariables.ParallelDualTasks:
-                eventMsg = "trackingAndTypingVisible"
-            elif RuntimeVariables.TrackingWindowVisible:
-                eventMsg = "trackingVisible"
-            elif RuntimeVariables.TypingWindowVisible:
-                eventMsg = "typingVisible"
-            else:
-                eventMsg = ""
+        logText = f"Participant {RuntimeVariables.ParticipantNumber}, Penalty {RuntimeVariables.Penalty}, Noise: {RuntimeVariables.StandardDeviationOfNoise}, Gain: {RuntimeVariables.TypingRewardCorrectDigit}"
+        print(logText)
+        writeLogFile(logText)
 
-            writeOutputDataFile(eventMsg, "-")
 
-        RuntimeVariables.VisitEndTime = time.time()
-        ApplyRewardForTypingTaskScores()
+def startBlock(spec):
+    """Sets the block of the spec, at the first trial of each block"""
+    writeLogFile(("--> Practice " if spec.IsPracticeTrial else "") + spec.TaskType.name.replace("Practice", ""))
+    RuntimeVariables.BlockNumber = spec.BlockNumber
+    RuntimeVariables.CurrentTaskType = spec.TaskType
+    RuntimeVariables.OutputRowEncoder.conditionChanged()
+    if spec.TaskType in [TaskTypes.SingleTyping, TaskTypes.PracticeSingleTyping]:
+        RuntimeVariables.CurrentTypingTaskNumbersLength = ExperimentSettings.SingleTypingTaskNumbersLength
+    elif spec.TaskType in [TaskTypes.DualTask, TaskTypes.PracticeDualTask]:
+        RuntimeVariables.CurrentTypingTaskNumbersLength = 1 if RuntimeVariables.ParallelDualTasks else ExperimentSettings.SingleTypingTaskNumbersLength
+    print(f"{RuntimeVariables.CurrentTaskType}, total {spec.NumberOfTrialsInBlock} trials")
 
-        writeOutputDataFile("trialEnd", "-", endOfTrial=True)
-
-        if not isPracticeTrial and RuntimeVariables.DisplayScoreForNormalTrials:
-            if RuntimeVariables.ParallelDualTasks:
-                if RuntimeVariables.FeedbackMode == FeedbackMode.AfterTrialsInInterval and ((i + 1) % RuntimeVariables.IntervalForFeedbackAfterTrials == 0 or i == numberOfTrials - 1):
-                    DisplayFeedbackParallelDualTasksAfterTrial()
-            else:
-                DisplayFeedbackSwitchingDualTaskAfterTrial()
 
+def runSessionPlan(sessionPlan, firstPlanIndex=0):
+    """
+    Runs the trials of the session plan and shows its messages.
+    :param firstPlanIndex: The index of the first trial, later than 0 when a session is resumed
+    """
+    previousSpec = None
+    for spec in sessionPlan.Trials[firstPlanIndex:]:
+        if previousSpec is None:
+            scheduleTrialWarmUp(spec)
+        for message, displayTime in spec.SessionMessagesBefore:
+            DisplayMessage(message, displayTime)
+        if previousSpec is None or spec.ConditionNumber != previousSpec.ConditionNumber:
+            startCondition(spec)
+        for message, displayTime in spec.BlockMessages:
+            DisplayMessage(message, displayTime)
+        if previousSpec is None or spec.TrialInBlock == 0:
+            startBlock(spec)
+        for message, displayTime in spec.BlockIntroductionMessages:
+            DisplayMessage(message, displayTime)
+
+        print(f"Trial {spec.TrialInBlock}")
+        RuntimeVariables.CurrentTrialSpec = spec
+        if spec.TaskType in [TaskTypes.SingleTyping, TaskTypes.PracticeSingleTyping]:
+            runSingleTaskTypingTrial(spec)
+        elif spec.TaskType in [TaskTypes.SingleTracking, TaskTypes.PracticeSingleTracking]:
+            runSingleTaskTrackingTrial(spec)
+        else:
+            runDualTaskTrial(spec)
+
+        if spec.PlanIndex + 1 < len(sessionPlan.Trials):
+            scheduleTrialWarmUp(sessionPlan.Trials[spec.PlanIndex + 1])  # prepared while the following messages are shown
+        if spec.FeedbackAfterTrial == TrialFeedback.ParallelDualTasks:
+            DisplayFeedbackParallelDualTasksAfterTrial()
+        elif spec.FeedbackAfterTrial == TrialFeedback.SwitchingDualTask:
+            DisplayFeedbackSwitchingDualTaskAfterTrial()
         # At the trial end: clear distances for RMSE
-        RuntimeVariables.CursorDistancesToMiddle = []
+        RuntimeVariables.TrackingStatistics.reset()
+        if spec.ConditionScoreAfterTrial:
+            DisplayMessage("Bisher hast du: " + str(scipy.sum(RuntimeVariables.DualTaskScoreOverAllConditions)) + " Punkte", 8)
+        if RuntimeVariables.FrameTimingRecorder and spec.TrialInBlock == spec.NumberOfTrialsInBlock - 1:
+            RuntimeVariables.FrameTimingRecorder.reportBlock()
+        previousSpec = spec
+
+    for message, displayTime in sessionPlan.FinalMessages:
+        DisplayMessage(message, displayTime)
 
 
 def ShowStartExperimentScreen():
@@ -1213,9 +2851,11 @@ def ShowStartExperimentScreen():
     printTextOverMultipleLines(message, Vector2D(location.X, location.Y))
     pygame.display.flip()
 
-    while not checkMouseClicked():  # wait for a mouseclick
-        time.sleep(0.25)
-    RuntimeVariables.StartTimeCurrentTrial = time.time()
+    while not RuntimeVariables.MessageScheduler.wait(0.25, untilMouseClicked=True):  # wait for a mouseclick
+        pass
+    pos = pygame.mouse.get_pos()
+    writeOutputDataFile("MousePressed", str(pos[0]) + "_" + str(pos[1]))
+    RuntimeVariables.StartTimeCurrentTrial = RuntimeVariables.Clock.now()
 
 
 def SetDebuggingSettings():
@@ -1243,9 +2883,13 @@ def StartExperiment():
     RuntimeVariables.CirclesBig.sort(key=lambda circle: circle.Radius, reverse=False)
     RuntimeVariables.CirclesPractice.sort(key=lambda circle: circle.Radius, reverse=False)
 
+    # verify all conditions and compile the session before the experiment starts so that the program would crash at the start if it does
     conditions = readParticipantFile()
-    initializeOutputFiles()
-    RuntimeVariables.StartTimeOfFirstExperiment = time.time()
+    sessionPlan = compileSessionPlan(verifyConditions(conditions))
+    resumedTimestamp, firstPlanIndex, lastCurrentTime = resumeSession(sessionPlan) if RuntimeVariables.ResumeSession else (None, 0, 0)
+    initializeOutputFiles(sessionPlan, resumedTimestamp)
+    # the CurrentTime of a resumed session continues after the last row of the data file
+    RuntimeVariables.StartTimeOfFirstExperiment = RuntimeVariables.Clock.now() - lastCurrentTime
 
     pygame.init()
     if ExperimentSettings.DebugMode:  # No fullscreen in debug mode
@@ -1253,8 +2897,34 @@ def StartExperiment():
     else:
         RuntimeVariables.Screen = pygame.display.set_mode((Constants.ExperimentWindowSize.X, Constants.ExperimentWindowSize.Y), pygame.FULLSCREEN)
     pygame.display.set_caption(Constants.Title)
+    RuntimeVariables.LayerCache = LayerCache()
+    RuntimeVariables.TextCache = TextCache(ExperimentSettings.TextCacheMemoryBudget)
+    RuntimeVariables.ScreenCache = ScreenCache(ExperimentSettings.ScreenCacheMemoryBudget, ExperimentSettings.ScreenCacheDirectory)
+    RuntimeVariables.MessageScheduler = MessageScheduler(RuntimeVariables.Clock)
+    RuntimeVariables.RenderStatistics = RenderStatistics()
+
+    compileSessionScreens(sessionPlan)
+
+    if not ExperimentSettings.DebugMode:
+        ShowStartExperimentScreen()
+
+    RuntimeVariables.StartTime = RuntimeVariables.Clock.now()
+
+    if resumedTimestamp:
+        # the marker row belongs to the trial the session continues with
+        RuntimeVariables.TrialNumber = sessionPlan.Trials[firstPlanIndex].TrialNumber
+        RuntimeVariables.BlockNumber = sessionPlan.Trials[firstPlanIndex].BlockNumber
+        writeOutputDataFile("sessionResumed", sessionPlan.Trials[firstPlanIndex].TrialNumber)
+    runSessionPlan(sessionPlan, firstPlanIndex)
+    RuntimeVariables.ScreenCache.report()
+    quitApp()
 
-    # verify all conditions before the experiment starts so that the program would crash at the start if it does
+
+def verifyConditions(conditions):
+    """
+    Verifies the conditions of the participant file and converts them to the values used in the session.
+    :returns A list of dictionaries
+    """
     conditionsVerified = []
     for currentCondition in conditions:
         conditionStandardDeviationOfNoise = currentCondition['standardDeviationOfNoise']
@@ -1279,11 +2949,9 @@ def StartExperiment():
         if conditionCircleSize == "small":  # small radius
             if len(RuntimeVariables.CirclesSmall) == 0:
                 raise Exception("You tried to run a trial with small circles but you don't have small circle radii defined!")
-            radiusCircle = RuntimeVariables.CirclesSmall
         elif conditionCircleSize == "big":
             if len(RuntimeVariables.CirclesBig) == 0:
                 raise Exception("You tried to run a trial with big circles but you don't have big circle radii defined!")
-            radiusCircle = RuntimeVariables.CirclesBig
         else:
             raise Exception("Invalid circle size: " + conditionCircleSize)
 
@@ -1310,88 +2978,229 @@ def StartExperiment():
         conditionsVerified.append({
             "standardDeviationOfNoise": standardDeviationOfNoise,
             "noiseMsg": noiseMsg,
-            "radiusCircle": radiusCircle,
+            "circleSize": conditionCircleSize,
             "penalty": penalty,
             "penaltyMsg": penaltyMsg,
             "penaltyAmount": penaltyAmount,
             "conditionGainCorrectDigit": conditionGainCorrectDigit
         })
+    return conditionsVerified
 
-    if not ExperimentSettings.DebugMode:
-        ShowStartExperimentScreen()
-
-    RuntimeVariables.StartTime = time.time()
 
-    if RuntimeVariables.RunPracticeTrials:
-        DisplayMessage("Willkommen zum Experiment!\n\n\n"
-                       "Wir beginnen mit den Übungsdurchläufen.", 10)
-
-        # do practice trials
-        RuntimeVariables.CurrentCircles = RuntimeVariables.CirclesPractice
-        RuntimeVariables.StandardDeviationOfNoise = ExperimentSettings.CursorNoisePracticeTrials
-        RuntimeVariables.Penalty = RuntimeVariables.PenaltyPracticeTrials
-        if RuntimeVariables.PenaltyPracticeTrials == Penalty.LoseAmount:
-            RuntimeVariables.PenaltyAmount = 500
-        print(f"Practice trial. Penalty: {RuntimeVariables.Penalty}, Noise: {RuntimeVariables.StandardDeviationOfNoise}, Gain: {RuntimeVariables.TypingRewardCorrectDigit}")
-
-        for block in RuntimeVariables.RunningOrder:
-            if len(RuntimeVariables.CirclesPractice) == 0 and (block.TaskType == TaskTypes.PracticeSingleTracking or block.TaskType == TaskTypes.PracticeDualTask):
-                raise Exception("You tried to run practice trials but you don't have practice circle radii defined!")
-            if block.TaskType == TaskTypes.PracticeSingleTracking:
-                runSingleTaskTrackingTrials(isPracticeTrial=True, numberOfTrials=block.NumberOfTrials)
-            elif block.TaskType == TaskTypes.PracticeSingleTyping:
-                runSingleTaskTypingTrials(isPracticeTrial=True, numberOfTrials=block.NumberOfTrials)
-            elif block.TaskType == TaskTypes.PracticeDualTask:
-                runDualTaskTrials(isPracticeTrial=True, numberOfTrials=block.NumberOfTrials)
-
-        msg = "Nun beginnt der Hauppteil und wir testen deine Leistung in den Aufgaben, die du \n"\
-              "gerade geübt hast.\n"
+def getBlockIntroductionMessages(taskType, penalty):
+    """
+    The messages shown at the start of a block of trials.
+    :returns A list of (message, displayTime)
+    """
+    messages = []
+    if taskType == TaskTypes.PracticeSingleTyping:
+        messages.append(("Nur Tippen\n\n"
+                         "In diesen Durchgängen übst du nur die Tippaufgabe.\n"
+                         "Kopiere die Ziffern, die dir auf dem Bildschirm angezeigt werden so schnell wie möglich.\n\n"
+                         "Wenn du einen Fehler machst, wird die Ziffernfolge nicht fortgesetzt.\n"
+                         "(In zukünftigen Durchgängen würdest du dadurch Punkte verlieren.)", 15))
+    elif taskType == TaskTypes.SingleTyping:
+        messages.append(("Nur Tippen\n\n"
+                         "Kopiere die Ziffern so schnell wie möglich.\n"
+                         "Wenn du einen Fehler machst, wird die Ziffernfolge nicht fortgesetzt.\n", 10))
+    elif taskType == TaskTypes.PracticeSingleTracking:
+        messages.append(("Nur Tracking\n\n"
+                         "In diesen Durchgängen übst du nur die Trackingaufgabe.\n"
+                         "Du kannst ausprobieren, wie der Joystick funktioniert und sehen, wie schnell der Cursor umherwandert.\n"
+                         "Der Cursor bewegt sich so lange frei herum, bis du ihn mit dem Joystick bewegst.\n"
+                         "Denk daran: deine Aufgabe ist es, zu verhindern, dass der Cursor den Kreis verlässt!", 15))
+    elif taskType == TaskTypes.SingleTracking:
+        messages.append(("Nur Tracking\n\n"
+                         "Nutze diesen Durchgang, um dich mit der Geschwindigkeit des Cursors vertraut zu machen, \n"
+                         "und denk daran den Cursor mit deinem Joystick in der Kreismitte zu halten.", 10))
+    elif taskType == TaskTypes.PracticeDualTask:
+        message = "Tracking + Tippen (MULTITASKING)\n\n" \
+                  "Du übst jetzt beide Aufgaben gleichzeitig!\n\n"
+        if not RuntimeVariables.ParallelDualTasks:
+            message += "Die Ziffernaufgabe wird dir immer zuerst angezeigt.\n" \
+                       "Drücke den Schalter unter deinem Zeigefinger am Joystick, um zu kontrollieren ob der Cursor\n" \
+                       "noch innerhalb des Kreises ist.\n" \
+                       "Lasse den Schalter wieder los, um zur Ziffernaufgabe zurück zu gelangen.\n" \
+                       "Du kannst immer nur eine Aufgabe bearbeiten."
+        messages.append((message, 10))
+
+        message = ""
+        if RuntimeVariables.DisplayScoreForPracticeTrials:
+            message += "Dein Ziel:\n\n" \
+                       "Kopiere die Ziffern so schnell wie möglich, dadurch gewinnst du Punkte.\n" \
+                       "Fehler beim Tippen führen zu Punkteverlust.\n"
+        if not penalty == Penalty.NoPenalty:
+            message += "Pass auf, dass der Cursor den Kreis nicht verlässt, sonst verlierst du Punkte.\n"
+        if message:
+            messages.append((message, 10))
+    elif taskType == TaskTypes.DualTask:
         if RuntimeVariables.DisplayScoreForNormalTrials:
-            msg += "Versuche im Laufe des Experiments so viele Punkte wie möglich zu gewinnen!"
-        DisplayMessage(msg, 10)
-
-    # main experiment loop with verified conditions
-    for condition in conditionsVerified:
-        RuntimeVariables.BlockNumber = 0
-        # set global and local variables
-        RuntimeVariables.StandardDeviationOfNoise = condition["standardDeviationOfNoise"]
-        noiseMsg = condition["noiseMsg"]
-        RuntimeVariables.CurrentCircles = condition["radiusCircle"]
-        RuntimeVariables.Penalty = condition["penalty"]
-        RuntimeVariables.PenaltyAmount = condition["penaltyAmount"]
-        penaltyMsg = condition["penaltyMsg"]
-        RuntimeVariables.TypingRewardCorrectDigit = condition["conditionGainCorrectDigit"]
-        logText = f"Participant {RuntimeVariables.ParticipantNumber}, Penalty {RuntimeVariables.Penalty}, Noise: {RuntimeVariables.StandardDeviationOfNoise}, Gain: {RuntimeVariables.TypingRewardCorrectDigit}"
-        print(logText)
-        writeLogFile(logText)
+            message = "Dein Ziel:\n\n" \
+                      "Kopiere die Ziffern so schnell wie möglich, dadurch gewinnst du Punkte.\n" \
+                      "Fehler beim Tippen führen zu Punkteverlust.\n"
+            if not penalty == Penalty.NoPenalty:
+                message += "Aber pass auf, dass der Cursor den Kreis nicht verlässt, sonst verlierst du Punkte.\n"
+            message += "Wichtig: Deine Leistung in diesen Durchgängen zählt für deine Gesamtpunktzahl."
+            messages.append((message, 18))
+        if not RuntimeVariables.ParallelDualTasks:
+            messages.append(("Drücke den Schalter unter deinem Zeigefinger, um das Trackingfenster zu öffnen.\n"
+                             "Um wieder zurück zur Tippaufgabe zu gelangen, lässt du den Schalter wieder los.\n"
+                             "Du kannst immer nur eine Aufgabe bearbeiten.", 15))
+    return messages
+
+
+def getMainPartMessage():
+    """The message after the practice trials"""
+    msg = "Nun beginnt der Hauppteil und wir testen deine Leistung in den Aufgaben, die du \n"\
+          "gerade geübt hast.\n"
+    if RuntimeVariables.DisplayScoreForNormalTrials:
+        msg += "Versuche im Laufe des Experiments so viele Punkte wie möglich zu gewinnen!"
+    return msg
+
+
+class SessionPlan:
+    """
+    The trials of a session in the order they are run, see compileSessionPlan(). FinalMessages are shown after the last trial.
+    The plan is written to a json file before the session starts.
+    """
+    def __init__(self, trials, finalMessages):
+        self.Trials = tuple(trials)
+        self.FinalMessages = tuple(finalMessages)
+
+    def getMessages(self):
+        """Returns all messages of the plan"""
+        messages = []
+        for spec in self.Trials:
+            messages += [message for message, displayTime in spec.SessionMessagesBefore + spec.BlockMessages + spec.BlockIntroductionMessages]
+        return messages + [message for message, displayTime in self.FinalMessages]
+
+    @staticmethod
+    def getTrialJson(spec):
+        trial = {}
+        for name, value in spec._asdict().items():
+            if isinstance(value, Enum):
+                value = value.name
+            elif isinstance(value, tuple):
+                value = [list(item) if isinstance(item, tuple) else item for item in value]
+            trial[name] = value
+        trial["CircleRadii"] = [circle.Radius for circle in getTrialSpecCircles(spec)]
+        return trial
+
+    def write(self, fileName):
+        with open(fileName, "w", encoding="utf-8") as planFile:
+            json.dump({"Trials": [self.getTrialJson(spec) for spec in self.Trials],
+                       "FinalMessages": [list(message) for message in self.FinalMessages]}, planFile, ensure_ascii=False, indent=1)
+
+
+def getTrialSpecCircles(spec):
+    return {"practice": RuntimeVariables.CirclesPractice, "small": RuntimeVariables.CirclesSmall, "big": RuntimeVariables.CirclesBig}[spec.CircleSize]
+
+
+def getTrialFeedback(taskType, isPracticeTrial, trialInBlock, numberOfTrials):
+    """Returns the feedback shown after a trial"""
+    if isPracticeTrial or not RuntimeVariables.DisplayScoreForNormalTrials:
+        return TrialFeedback.NoFeedback
+    if RuntimeVariables.ParallelDualTasks:
+        if RuntimeVariables.FeedbackMode == FeedbackMode.AfterTrialsInInterval and ((trialInBlock + 1) % RuntimeVariables.IntervalForFeedbackAfterTrials == 0 or trialInBlock == numberOfTrials - 1):
+            return TrialFeedback.ParallelDualTasks
+        return TrialFeedback.NoFeedback
+    # there is no feedback after single tracking trials with switching dual tasks
+    return TrialFeedback.NoFeedback if taskType == TaskTypes.SingleTracking else TrialFeedback.SwitchingDualTask
 
+
+def compileSessionPlan(conditionsVerified):
+    """
+    Expands the blocks of RuntimeVariables.RunningOrder for the practice trials and each verified condition into the trials of the
+    session. Blocks without trials are left out.
+    :returns A SessionPlan
+    """
+    sessionConditions = []
+    if RuntimeVariables.RunPracticeTrials:
+        practicePenaltyAmount = 500 if RuntimeVariables.PenaltyPracticeTrials == Penalty.LoseAmount else RuntimeVariables.PenaltyAmount
+        sessionConditions.append({"conditionNumber": 0, "circleSize": "practice", "standardDeviationOfNoise": ExperimentSettings.CursorNoisePracticeTrials,
+                                  "penalty": RuntimeVariables.PenaltyPracticeTrials, "penaltyAmount": practicePenaltyAmount,
+                                  "conditionGainCorrectDigit": RuntimeVariables.TypingRewardCorrectDigit})
+    for conditionNumber, condition in enumerate(conditionsVerified, 1):
+        sessionConditions.append(dict(condition, conditionNumber=conditionNumber))
+
+    practiceTaskTypes = [TaskTypes.PracticeSingleTracking, TaskTypes.PracticeSingleTyping, TaskTypes.PracticeDualTask]
+    trialDurations = {TaskTypes.SingleTyping: ExperimentSettings.MaxTrialTimeSingleTyping, TaskTypes.PracticeSingleTyping: ExperimentSettings.MaxTrialTimeSingleTyping,
+                      TaskTypes.SingleTracking: ExperimentSettings.MaxTrialTimeSingleTracking, TaskTypes.PracticeSingleTracking: ExperimentSettings.MaxTrialTimeSingleTracking,
+                      TaskTypes.DualTask: ExperimentSettings.MaxTrialTimeDual, TaskTypes.PracticeDualTask: ExperimentSettings.MaxTrialTimeDual}
+    trials = []
+    sessionMessages = [(Constants.WelcomeMessage, 10)] if RuntimeVariables.RunPracticeTrials else []  # shown before the next trial
+    trialNumber = RuntimeVariables.TrialNumber
+    for condition in sessionConditions:
+        isPracticeTrial = condition["conditionNumber"] == 0
+        penalty = condition["penalty"]
+        conditionKey = f"{penalty};{condition['standardDeviationOfNoise']}"
+        blockNumber = RuntimeVariables.BlockNumber if isPracticeTrial else 0
         wasDualTaskInCondition = False
+        numberOfTrialsBefore = len(trials)
         for block in RuntimeVariables.RunningOrder:
-            if block.TaskType == TaskTypes.SingleTracking:
-                message = getMessageBeforeTrial(TaskTypes.SingleTracking, noiseMsg, penaltyMsg)
-                if not RuntimeVariables.ShowOnlyGetReadyMessage:
-                    DisplayMessage(message, 12)
-                runSingleTaskTrackingTrials(isPracticeTrial=False, numberOfTrials=block.NumberOfTrials)
-            if block.TaskType == TaskTypes.SingleTyping:
-                message = getMessageBeforeTrial(TaskTypes.SingleTyping, noiseMsg, penaltyMsg)
-                if not RuntimeVariables.ShowOnlyGetReadyMessage:
-                    DisplayMessage(message, 12)
-                runSingleTaskTypingTrials(isPracticeTrial=False, numberOfTrials=block.NumberOfTrials)
-            if block.TaskType == TaskTypes.DualTask:
-                wasDualTaskInCondition = True
-                message = getMessageBeforeTrial(TaskTypes.DualTask, noiseMsg, penaltyMsg)
-                if not RuntimeVariables.ShowOnlyGetReadyMessage:
-                    DisplayMessage(message, 12)
-                runDualTaskTrials(isPracticeTrial=False, numberOfTrials=block.NumberOfTrials)
-
-        if wasDualTaskInCondition and not RuntimeVariables.ParallelDualTasks and RuntimeVariables.DisplayScoreForNormalTrials:
-            DisplayMessage("Bisher hast du: " + str(scipy.sum(RuntimeVariables.DualTaskScoreOverAllConditions)) + " Punkte", 8)
-
-    DisplayMessage("Dies ist das Ende der Studie.", 10)
-    quitApp()
-
-
-def getMessageBeforeTrial(trialType, noiseMsg, penaltyMsg):
+            if (block.TaskType in practiceTaskTypes) != isPracticeTrial:
+                continue
+            if isPracticeTrial and len(RuntimeVariables.CirclesPractice) == 0 and block.TaskType in [TaskTypes.PracticeSingleTracking, TaskTypes.PracticeDualTask]:
+                raise Exception("You tried to run practice trials but you don't have practice circle radii defined!")
+            blockNumber += 1
+            wasDualTaskInCondition = wasDualTaskInCondition or block.TaskType == TaskTypes.DualTask
+            blockMessages = []
+            introductionMessages = []
+            if not RuntimeVariables.ShowOnlyGetReadyMessage:
+                if not isPracticeTrial:
+                    blockMessages.append((getMessageBeforeTrial(block.TaskType, condition["noiseMsg"], condition["penaltyMsg"], penalty, condition["conditionGainCorrectDigit"]), 12))
+                introductionMessages = getBlockIntroductionMessages(block.TaskType, penalty)
+
+            for trialInBlock in range(block.NumberOfTrials):
+                trialNumber += 1
+                randomStreamsKey = (ExperimentSettings.RandomSeed, RuntimeVariables.ParticipantNumber, conditionKey, blockNumber, trialNumber)
+                isFirstTrialInBlock = trialInBlock == 0
+                trials.append(TrialSpec(
+                    PlanIndex=len(trials),
+                    ConditionNumber=condition["conditionNumber"],
+                    IsPracticeTrial=isPracticeTrial,
+                    TaskType=block.TaskType,
+                    BlockNumber=blockNumber,
+                    TrialNumber=trialNumber,
+                    TrialInBlock=trialInBlock,
+                    NumberOfTrialsInBlock=block.NumberOfTrials,
+                    CircleSize=condition["circleSize"],
+                    StandardDeviationOfNoise=condition["standardDeviationOfNoise"],
+                    Penalty=penalty,
+                    PenaltyAmount=condition["penaltyAmount"],
+                    TypingRewardCorrectDigit=condition["conditionGainCorrectDigit"],
+                    TrialDuration=trialDurations[block.TaskType],
+                    SessionMessagesBefore=tuple(sessionMessages) if isFirstTrialInBlock else (),
+                    BlockMessages=tuple(blockMessages) if isFirstTrialInBlock else (),
+                    BlockIntroductionMessages=tuple(introductionMessages) if isFirstTrialInBlock else (),
+                    FeedbackAfterTrial=getTrialFeedback(block.TaskType, isPracticeTrial, trialInBlock, block.NumberOfTrials),
+                    ConditionScoreAfterTrial=False,
+                    RandomStreamsKey=randomStreamsKey,
+                    TrialSeed=TrialRandomStreams.getTrialSeed(*randomStreamsKey)))
+                sessionMessages = []
+
+        if isPracticeTrial:
+            sessionMessages.append((getMainPartMessage(), 10))
+        elif wasDualTaskInCondition and not RuntimeVariables.ParallelDualTasks and RuntimeVariables.DisplayScoreForNormalTrials and len(trials) > numberOfTrialsBefore:
+            trials[-1] = trials[-1]._replace(ConditionScoreAfterTrial=True)
+
+    return SessionPlan(trials, sessionMessages + [(Constants.EndMessage, 10)])
+
+
+def compileSessionScreens(sessionPlan):
+    """Renders all messages and countdowns that the session will show into RuntimeVariables.ScreenCache"""
+    screenCache = RuntimeVariables.ScreenCache
+    # the empty screens are used for the messages that are only known during the session
+    screenCache.compile(ScreenCache.Message, "")
+    screenCache.compile(ScreenCache.Countdown, "")
+    for secondsLeft in range(1, 4):
+        screenCache.compile(ScreenCache.Countdown, getCountdownMessage(secondsLeft))
+    for message in sessionPlan.getMessages():
+        screenCache.compile(ScreenCache.Message, message)
+    screenCache.report()
+
+
+def getMessageBeforeTrial(trialType, noiseMsg, penaltyMsg, penalty, typingRewardCorrectDigit):
     message = "NEUER BLOCK: \n\n\n"
     if trialType in [TaskTypes.SingleTracking, TaskTypes.DualTask]:
         message += f"In den folgenden Durchgängen bewegt sich der Cursor mit {noiseMsg} Geschwindigkeit. \n"
@@ -1408,7 +3217,7 @@ def getMessageBeforeTrial(trialType, noiseMsg, penaltyMsg):
 
     # The number of points to be won by typing should always be shown
     if trialType in [TaskTypes.SingleTyping, TaskTypes.DualTask]:
-        message += f"Für jede korrekt eingegebene Ziffer bekommst du {RuntimeVariables.TypingRewardCorrectDigit} Punkte. \n"
+        message += f"Für jede korrekt eingegebene Ziffer bekommst du {typingRewardCorrectDigit} Punkte. \n"
 
     if RuntimeVariables.ShowPenaltyRewardNoise:
         message2 = "Achtung: "
@@ -1416,18 +3225,18 @@ def getMessageBeforeTrial(trialType, noiseMsg, penaltyMsg):
         if trialType in [TaskTypes.DualTask, TaskTypes.SingleTyping]:
             message2 += f"Bei jeder falsch eingetippten Ziffer verlierst du {RuntimeVariables.TypingPenaltyIncorrectDigit} Punkte. \n"
             append = True
-        if trialType in [TaskTypes.DualTask, TaskTypes.SingleTracking] and RuntimeVariables.Penalty != Penalty.NoPenalty:
+        if trialType in [TaskTypes.DualTask, TaskTypes.SingleTracking] and penalty != Penalty.NoPenalty:
             message2 += f"Wenn der Cursor den Kreis verlässt, verlierst du {penaltyMsg} deiner Punkte."
             append = True
         if append:
             message += message2
 
     elif not RuntimeVariables.ShowPenaltyRewardNoise:
-        if (trialType == TaskTypes.DualTask and RuntimeVariables.Penalty == Penalty.NoPenalty) or trialType == TaskTypes.SingleTyping:
+        if (trialType == TaskTypes.DualTask and penalty == Penalty.NoPenalty) or trialType == TaskTypes.SingleTyping:
             message += "Achtung: Du verlierst Punkte für falsch eingegebene Ziffern."
         elif trialType == TaskTypes.DualTask:
             message += "Achtung: Du verlierst Punkte für falsch eingegebene Ziffern und wenn der Cursor den Kreis verlässt."
-        elif trialType == TaskTypes.SingleTracking and RuntimeVariables.Penalty != Penalty.NoPenalty:
+        elif trialType == TaskTypes.SingleTracking and penalty != Penalty.NoPenalty:
             message += "Achtung: Du verlierst Punkte wenn der Cursor den Kreis verlässt."
     return message
 
@@ -1443,7 +3252,7 @@ def readCsvFile(filePath):
     """
     Reads a multi-line CSV file separated with ;
     """
-    f = open(filePath, 'r')
+    f = open(filePath, 'r', errors='replace')  # the settings file may have been written with another encoding (e.g. block titles with umlauts)
     individualLines = f.read().split('\n')
     f.close()
     lines = list(map(lambda x: x.split(';'), individualLines))  # split all elements
@@ -1476,147 +3285,1054 @@ def readParticipantFile():
     return conditions
 
 
-def initializeOutputFiles():
-    """
-    Set the participant condition. Initialize the output files
-    """
-    outputText = \
-        "SubjectNr" + ";" \
-        "RadiusCircle" + ";" \
-        "StandardDeviationOfNoise" + ";" \
-        "CurrentTime" + ";" \
-        "TrialTime" + ";" \
-        "VisitTime" + ";" \
-        "BlockNumber" + ";" \
-        "TrialNumber" + ";" \
-        "Experiment" + ";" \
-        "TrackingTaskPresent" + ";" \
-        "TypingTaskPresent" + ";" \
-        "TrackingWindowVisible" + ";" \
-        "TypingWindowVisible" + ";" \
-        "TrackingWindowEntryCounter" + ";" \
-        "TypingWindowEntryCounter" + ";" \
-        "RMSE" + ";" \
-        "LengthPathTrackedPixel" + ";" \
-        "CursorCoordinatesX" + ";" \
-        "CursorCoordinatesY" + ";" \
-        "JoystickAxisX" + ";" \
-        "JoystickAxisY" + ";" \
-        "EnteredDigits" + ";" \
-        "EnteredDigitsLength" + ";" \
-        "CurrentTypingTaskNumbers" + ";" \
-        "GeneratedTypingTaskNumberLength" + ";" \
-        "NumberOfCircleExits" + ";" \
-        "TrialScore" + ";" \
-        "VisitScore" + ";" \
-        "CorrectDigitsVisit" + ";" \
-        "IncorrectDigitsVisit" + ";" \
-        "IncorrectDigitsTrial" + ";" \
-        "OutsideRadius" + ";" \
-        "TypingRewardCorrectDigit" + ";" \
-        "TypingScoreParallelSetup" + ";" \
-        "TrackingScoreParallelSetup" + ";" \
-        "CombinedScoreParallelSetup" + ";" \
-        "EventMessage1" + ";" \
-        "EventMessage2" + "\n"
-
-    timestamp = time.strftime("%Y-%m-%d_%H-%M")
-    dataFileName = "participant_" + str(RuntimeVariables.ParticipantNumber) + "_data_" + timestamp + ".csv"
-    RuntimeVariables.OutputDataFile = open(dataFileName, 'w')  # contains the user data
-    RuntimeVariables.OutputDataFile.write(outputText)
+class BufferedOutputWriter:
+    """
+    Writes the rows of the output data file on a background thread, so that disk latency does not stall the trial loops.
+    The file is forced to disk according to the fsync policy and always after a trialEnd row.
+    A row is a line of text for a csv file, or the list of the column values for a BinarySampleFile.
+    The time the main thread needs per row (formatting and queueing) is measured and reported against the frame budget.
+    """
+    def __init__(self, outputFile, fsyncPolicy, fsyncIntervalRows, fsyncIntervalMilliseconds):
+        self.OutputFile = outputFile
+        self.FsyncPolicy = fsyncPolicy
+        self.FsyncIntervalRows = fsyncIntervalRows
+        self.FsyncIntervalSeconds = fsyncIntervalMilliseconds / 1000.0
+        self.RowQueue = queue.Queue()
+        self.RowsQueued = 0  # only changed by the main thread
+        self.RowsDurable = 0  # only changed by the writer thread
+        self.MaxRowsAtRiskTrial = 0  # rows that could have been lost on a crash during the current trial
+        self.MaxRowsAtRiskSession = 0
+        self.MainThreadTime = 0  # seconds the main thread needed for the rows
+        self.MaxMainThreadTime = 0
+        self.Error = None
+        self.Thread = threading.Thread(target=self.run, name="OutputDataWriter", daemon=True)
+        self.Thread.start()
+
+    def write(self, row, endOfTrial=False, trialNumber=None):
+        """:param trialNumber: The trial that ends with the row, if endOfTrial"""
+        if self.Error:
+            raise Exception(f"Writing the output data file failed: {self.Error}")
+        self.RowsQueued += 1
+        self.RowQueue.put((row, endOfTrial, trialNumber))
+        rowsAtRisk = self.getRowsAtRisk()
+        self.MaxRowsAtRiskTrial = max(self.MaxRowsAtRiskTrial, rowsAtRisk)
+        self.MaxRowsAtRiskSession = max(self.MaxRowsAtRiskSession, rowsAtRisk)
+
+    def getRowsAtRisk(self):
+        """Returns the number of rows that were handed to the writer but are not on disk yet"""
+        return self.RowsQueued - self.RowsDurable
+
+    def reportRowsAtRisk(self):
+        """Logs how many rows could have been lost on a crash during the trial and starts counting for the next trial"""
+        message = f"Output writer: at most {self.MaxRowsAtRiskTrial} rows could have been lost on a crash during this trial ({self.FsyncPolicy})"
+        print(message)
+        writeLogFile(message)
+        self.MaxRowsAtRiskTrial = self.getRowsAtRisk()
+
+    def addMainThreadTime(self, seconds):
+        self.MainThreadTime += seconds
+        self.MaxMainThreadTime = max(self.MaxMainThreadTime, seconds)
+
+    def close(self):
+        """Writes all remaining rows to disk and stops the writer thread"""
+        self.RowQueue.put(None)
+        self.Thread.join()
+        message = f"Output writer closed: {self.RowsDurable} rows written, at most {self.MaxRowsAtRiskSession} rows could have been lost on a crash during the session"
+        print(message)
+        writeLogFile(message)
+        if self.RowsQueued > 0:
+            frameBudget = 1.0 / ExperimentSettings.DisplayRefreshRate
+            message = f"Output writer: the main thread needed {1000000 * self.MainThreadTime / self.RowsQueued:.0f} us per row on average, " \
+                      f"at most {1000000 * self.MaxMainThreadTime:.0f} us ({self.MaxMainThreadTime / frameBudget:.1%} of the frame budget of {1000 * frameBudget:.1f} ms)"
+            print(message)
+            writeLogFile(message)
+
+    def run(self):
+        rowsSinceFsync = 0
+        lastFsyncTime = time.perf_counter()
+        while True:
+            timeout = None
+            if self.FsyncPolicy == FsyncPolicy.EveryNMilliseconds and rowsSinceFsync > 0:
+                timeout = max(0.0, lastFsyncTime + self.FsyncIntervalSeconds - time.perf_counter())
+            try:
+                item = self.RowQueue.get(timeout=timeout)
+            except queue.Empty:
+                item = ()  # the time interval has passed without new rows
+            if item is None:
+                break
+            if self.Error:
+                continue  # keep draining the queue so that close() does not block
+            try:
+                endOfTrial = False
+                if item:
+                    row, endOfTrial, trialNumber = item
+                    self.OutputFile.write(row)
+                    rowsSinceFsync += 1
+                    if endOfTrial and hasattr(self.OutputFile, "markTrialEnd"):
+                        self.OutputFile.markTrialEnd(trialNumber)
+                if self.FsyncPolicy == FsyncPolicy.EveryNRows:
+                    forceToDisk = rowsSinceFsync >= self.FsyncIntervalRows
+                elif self.FsyncPolicy == FsyncPolicy.EveryNMilliseconds:
+                    forceToDisk = rowsSinceFsync > 0 and time.perf_counter() - lastFsyncTime >= self.FsyncIntervalSeconds
+                else:
+                    forceToDisk = False
+                if endOfTrial or forceToDisk:
+                    self.forceToDisk(rowsSinceFsync)
+                    rowsSinceFsync = 0
+                    lastFsyncTime = time.perf_counter()
+            except Exception as e:
+                self.Error = e
+        if not self.Error and rowsSinceFsync > 0:
+            self.forceToDisk(rowsSinceFsync)
+
+    def forceToDisk(self, numberOfRows):
+        self.OutputFile.flush()
+        os.fsync(self.OutputFile.fileno())
+        self.RowsDurable += numberOfRows
+
+
+class BinarySampleFile:
+    """
+    Writes the rows of the output data file in a columnar binary format, which is much smaller than the csv file.
+    Rows are collected and written in chunks. Each column of a chunk is stored as an array of the narrowest type for its values:
+    integers, floats that were rounded to some decimals (as scaled integers), other floats, bools, or indices of strings in a
+    dictionary that grows with each chunk. Values that do not fit the type of the array are stored as exceptions referring to the
+    dictionary. Converting the file back gives exactly the rows of the csv file.
+
+    Layout (little endian): the magic bytes, a uint32 with the length of the JSON header and the header with the column names.
+    Then the chunks, each consisting of:
+    "CHNK", uint32 number of rows, uint32 number of new dictionary strings, each as uint32 length and UTF-8 bytes,
+    and for each column: uint8 value type, uint8 index in DataTypes, uint8 decimals of scaled floats, the array,
+    uint32 number of exceptions, the row indices and the dictionary indices (uint32 each).
+    """
+    Magic = b"MTXSAMP1"
+    ChunkMarker = b"CHNK"
+    TypeFloat = 0
+    TypeInteger = 1
+    TypeBool = 2
+    TypeString = 3  # only dictionary indices
+    DataTypes = ["u1", "<u2", "<u4", "i1", "<i2", "<i4", "<i8", "<f8"]
+    MaxDecimals = 6  # floats with more decimals are stored as float64
+
+    def __init__(self, fileName, columnNames, chunkRows, append=False):
+        self.ColumnNames = columnNames
+        self.ChunkRows = chunkRows
+        self.Rows = []
+        self.Dictionary = {}
+        self.NewDictionaryEntries = []
+        if append:
+            # the new chunks continue the dictionary of the existing chunks
+            existingColumnNames, dictionary, end = self.scan(fileName)
+            if existingColumnNames != columnNames:
+                raise Exception(f"The columns of {fileName} are different, rows cannot be appended")
+            self.Dictionary = {text: index for index, text in enumerate(dictionary)}
+            self.File = open(fileName, 'r+b')
+            self.File.truncate(end)
+            self.File.seek(end)
+        else:
+            self.File = open(fileName, 'wb')
+            header = json.dumps({"format": "MultitaskingExperiment binary samples", "version": 1, "columns": columnNames}).encode()
+            self.File.write(self.Magic + len(header).to_bytes(4, "little") + header)
+
+    @staticmethod
+    def scan(fileName):
+        """
+        Finds the complete chunks of a file, e.g. after a crash during writing.
+        :returns The column names, the dictionary of the complete chunks and the offset after the last complete chunk
+        """
+        with open(fileName, 'rb') as binaryFile:
+            data = binaryFile.read()
+        if not data.startswith(BinarySampleFile.Magic):
+            raise Exception(f"{fileName} is not a binary output data file")
+
+        def readUInt32(offset):
+            return int.from_bytes(data[offset:offset + 4], "little")
+
+        headerStart = len(BinarySampleFile.Magic) + 4
+        position = headerStart + readUInt32(len(BinarySampleFile.Magic))
+        columnNames = json.loads(data[headerStart:position])["columns"]
+        dictionary = []
+        end = position
+        try:
+            while data[position:position + 4] == BinarySampleFile.ChunkMarker:
+                numberOfRows = readUInt32(position + 4)
+                numberOfEntries = readUInt32(position + 8)
+                position += 12
+                entries = []
+                for _ in range(numberOfEntries):
+                    length = readUInt32(position)
+                    entries.append(data[position + 4:position + 4 + length].decode())
+                    position += 4 + length
+                for _ in columnNames:
+                    position += 3 + numberOfRows * numpy.dtype(BinarySampleFile.DataTypes[data[position + 1]]).itemsize
+                    position += 4 + 8 * readUInt32(position)
+                if position > len(data):
+                    break
+                dictionary += entries
+                end = position
+        except (IndexError, UnicodeDecodeError):
+            pass  # the last chunk is incomplete
+        return columnNames, dictionary, end
+
+    @staticmethod
+    def truncateIncompleteChunk(fileName):
+        """Removes a chunk at the end of the file that was not completely written"""
+        columnNames, dictionary, end = BinarySampleFile.scan(fileName)
+        with open(fileName, 'r+b') as binaryFile:
+            binaryFile.truncate(end)
+
+    def write(self, row):
+        """Adds a row, given as the list of the column values"""
+        self.Rows.append(row)
+        if len(self.Rows) >= self.ChunkRows:
+            self.writeChunk()
+
+    def flush(self):
+        self.writeChunk()
+        self.File.flush()
+
+    def fileno(self):
+        return self.File.fileno()
+
+    def close(self):
+        self.flush()
+        self.File.close()
+
+    def getDictionaryIndex(self, text):
+        index = self.Dictionary.get(text)
+        if index is None:
+            index = len(self.Dictionary)
+            self.Dictionary[text] = index
+            self.NewDictionaryEntries.append(text)
+        return index
+
+    @staticmethod
+    def getValueType(value):
+        if isinstance(value, bool):
+            return BinarySampleFile.TypeBool
+        if isinstance(value, int):
+            return BinarySampleFile.TypeInteger
+        if isinstance(value, (float, numpy.floating)):
+            return BinarySampleFile.TypeFloat
+        return BinarySampleFile.TypeString
+
+    @staticmethod
+    def getIntegerDataType(values):
+        """Returns the index in DataTypes of the narrowest integer type for the values"""
+        minimum = min(values, default=0)
+        maximum = max(values, default=0)
+        candidates = ["u1", "<u2", "<u4"] if minimum >= 0 else ["i1", "<i2", "<i4"]
+        for dataType in candidates:
+            if numpy.iinfo(numpy.dtype(dataType)).min <= minimum and maximum <= numpy.iinfo(numpy.dtype(dataType)).max:
+                return BinarySampleFile.DataTypes.index(dataType)
+        return BinarySampleFile.DataTypes.index("<i8")
+
+    @staticmethod
+    def getScaledFloats(values):
+        """Returns the number of decimals and the values as scaled integers, if the values can be restored exactly from them"""
+        if not all(math.isfinite(value) and abs(value) < 2 ** 31 for value in values):
+            return None, None
+        for decimals in range(BinarySampleFile.MaxDecimals + 1):
+            scale = 10 ** decimals
+            scaledValues = [round(value * scale) for value in values]
+            if all(scaledValue / scale == value for scaledValue, value in zip(scaledValues, values)):
+                return decimals, scaledValues
+        return None, None
+
+    def encodeColumn(self, columnValues):
+        valueTypes = [self.getValueType(value) for value in columnValues]
+        numericTypes = [valueType for valueType in valueTypes if valueType != self.TypeString]
+        columnType = max(set(numericTypes), key=numericTypes.count) if numericTypes else self.TypeString
+
+        values = [0] * len(columnValues)
+        exceptionRows = []
+        exceptionIndices = []
+        for rowIndex, (value, valueType) in enumerate(zip(columnValues, valueTypes)):
+            if columnType == self.TypeString:
+                values[rowIndex] = self.getDictionaryIndex(str(value))
+            elif valueType == columnType:
+                values[rowIndex] = float(value) if columnType == self.TypeFloat else int(value)
+            else:
+                exceptionRows.append(rowIndex)
+                exceptionIndices.append(self.getDictionaryIndex(str(value)))
+
+        decimals = 0
+        if columnType == self.TypeFloat:
+            decimals, scaledValues = self.getScaledFloats(values)
+            if scaledValues is None:
+                decimals = 0
+                dataTypeIndex = self.DataTypes.index("<f8")
+            else:
+                values = scaledValues
+                dataTypeIndex = self.getIntegerDataType(values)
+        else:
+            dataTypeIndex = self.getIntegerDataType(values)
+
+        return bytes([columnType, dataTypeIndex, decimals]) + numpy.array(values, self.DataTypes[dataTypeIndex]).tobytes() + \
+            len(exceptionRows).to_bytes(4, "little") + numpy.array(exceptionRows, "<u4").tobytes() + numpy.array(exceptionIndices, "<u4").tobytes()
+
+    def writeChunk(self):
+        if not self.Rows:
+            return
+        columnsData = [self.encodeColumn(columnValues) for columnValues in zip(*self.Rows)]
+        chunk = [self.ChunkMarker, len(self.Rows).to_bytes(4, "little"), len(self.NewDictionaryEntries).to_bytes(4, "little")]
+        for text in self.NewDictionaryEntries:
+            encodedText = text.encode()
+            chunk.append(len(encodedText).to_bytes(4, "little") + encodedText)
+        chunk.extend(columnsData)
+        self.File.write(b"".join(chunk))
+        self.Rows = []
+        self.NewDictionaryEntries = []
+
+
+def ReadBinarySampleFile(fileName):
+    """
+    Reads a file written by BinarySampleFile chunk by chunk.
+    :returns The column names and a generator of the rows, each row as a list of the values formatted as in the csv file
+    """
+    binaryFile = open(fileName, 'rb')
+    if binaryFile.read(len(BinarySampleFile.Magic)) != BinarySampleFile.Magic:
+        binaryFile.close()
+        raise Exception(f"{fileName} is not a binary output data file")
+    header = json.loads(binaryFile.read(int.from_bytes(binaryFile.read(4), "little")))
+
+    def readUInt32():
+        return int.from_bytes(binaryFile.read(4), "little")
+
+    def readRows():
+        dictionary = []
+        with binaryFile:
+            while binaryFile.read(len(BinarySampleFile.ChunkMarker)) == BinarySampleFile.ChunkMarker:
+                numberOfRows = readUInt32()
+                for _ in range(readUInt32()):
+                    dictionary.append(binaryFile.read(readUInt32()).decode())
+                columns = []
+                for _ in header["columns"]:
+                    columnType, dataTypeIndex, decimals = binaryFile.read(3)
+                    dataType = numpy.dtype(BinarySampleFile.DataTypes[dataTypeIndex])
+                    values = numpy.frombuffer(binaryFile.read(numberOfRows * dataType.itemsize), dataType).tolist()
+                    if columnType == BinarySampleFile.TypeString:
+                        column = [dictionary[index] for index in values]
+                    elif columnType == BinarySampleFile.TypeFloat:
+                        scale = 10 ** decimals
+                        column = [str(value) if dataType.kind == "f" else str(value / scale) for value in values]
+                    elif columnType == BinarySampleFile.TypeBool:
+                        column = [str(bool(value)) for value in values]
+                    else:
+                        column = [str(value) for value in values]
+                    numberOfExceptions = readUInt32()
+                    exceptionRows = numpy.frombuffer(binaryFile.read(numberOfExceptions * 4), "<u4").tolist()
+                    exceptionIndices = numpy.frombuffer(binaryFile.read(numberOfExceptions * 4), "<u4").tolist()
+                    for rowIndex, dictionaryIndex in zip(exceptionRows, exceptionIndices):
+                        column[rowIndex] = dictionary[dictionaryIndex]
+                    columns.append(column)
+                yield from (list(row) for row in zip(*columns))
+
+    return header["columns"], readRows()
+
+
+def ConvertBinarySampleFileToCsv(binaryFileName, csvFileName):
+    """Converts a binary output data file to the csv format, row by row, so that large files do not have to fit into memory"""
+    columnNames, rows = ReadBinarySampleFile(binaryFileName)
+    with open(csvFileName, 'w') as csvFile:
+        csvFile.write(";".join(columnNames) + "\n")
+        for row in rows:
+            csvFile.write(";".join(row) + "\n")
+
+
+class CompressedBlockFile:
+    """
+    Writes a text file compressed with gzip in blocks. Each block is a complete gzip member, so the file can be read with any gzip
+    tool and a crash only loses the block that is not complete yet. A block is written each time the file is flushed, i.e. when the
+    output data file is forced to disk (always at the end of a trial). The compression is done by the thread that flushes the file,
+    which is the background writer of the output data file.
+    The index file (the file name with ".idx") has a line for each block: its offset and size in the file, its offset in the text,
+    its first line and number of lines, the trial that ended with it ("-" if none) and its size as text. With the index single trials can be read
+    without decompressing the whole file (see ReadTrialFromCompressedFile).
+    """
+    IndexColumns = ["Offset", "CompressedBytes", "UncompressedOffset", "FirstLine", "Lines", "TrialEnd", "UncompressedBytes"]
+
+    def __init__(self, fileName, append=False):
+        self.Text = []  # the text of the current block
+        self.TrialEnd = None
+        self.UncompressedOffset = 0
+        self.Lines = 0
+        if append:
+            self.truncateIncompleteBlock(fileName)
+            index = ReadCompressedBlockIndex(fileName)
+            if index:
+                self.UncompressedOffset = index[-1]["UncompressedOffset"] + index[-1]["UncompressedBytes"]
+                self.Lines = index[-1]["FirstLine"] + index[-1]["Lines"]
+        self.File = open(fileName, 'ab' if append else 'wb')
+        self.IndexFile = open(fileName + ".idx", 'a' if append else 'w')
+        if not append:
+            self.IndexFile.write(";".join(self.IndexColumns) + "\n")
+        self.Blocks = 0
+        self.UncompressedBytes = 0
+        self.CompressedBytes = 0
+        self.CompressionTime = 0
+        self.MaxCompressionTime = 0
+
+    @staticmethod
+    def truncateIncompleteBlock(fileName):
+        """Removes a block at the end of the file that is not in the index, e.g. because the program crashed while it was written"""
+        if path.exists(fileName + ".idx"):
+            truncateIncompleteLastLine(fileName + ".idx")
+        index = ReadCompressedBlockIndex(fileName)
+        end = index[-1]["Offset"] + index[-1]["CompressedBytes"] if index else 0
+        if not path.exists(fileName):
+            return
+        with open(fileName, 'r+b') as compressedFile:
+            compressedFile.truncate(end)
+
+    def write(self, text):
+        self.Text.append(text)
+
+    def markTrialEnd(self, trialNumber):
+        """The current block ends with the trial"""
+        self.TrialEnd = trialNumber
+
+    def flush(self):
+        """Compresses the text written since the last flush into a block and forces it to disk, then the block is added to the index"""
+        if not self.Text:
+            return
+        data = "".join(self.Text).encode()
+        startTime = time.perf_counter()
+        block = gzip.compress(data, ExperimentSettings.OutputCompressionLevel, mtime=0)
+        compressionTime = time.perf_counter() - startTime
+        offset = self.File.tell()
+        self.File.write(block)
+        self.File.flush()
+        os.fsync(self.File.fileno())
+        lines = data.count(b"\n")
+        self.IndexFile.write(f"{offset};{len(block)};{self.UncompressedOffset};{self.Lines};{lines};"
+                             f"{'-' if self.TrialEnd is None else self.TrialEnd};{len(data)}\n")
+        self.IndexFile.flush()
+        os.fsync(self.IndexFile.fileno())
+        self.Text = []
+        self.TrialEnd = None
+        self.UncompressedOffset += len(data)
+        self.Lines += lines
+        self.Blocks += 1
+        self.UncompressedBytes += len(data)
+        self.CompressedBytes += len(block)
+        self.CompressionTime += compressionTime
+        self.MaxCompressionTime = max(self.MaxCompressionTime, compressionTime)
+
+    def fileno(self):
+        return self.File.fileno()
+
+    def close(self):
+        self.flush()
+        self.File.close()
+        self.IndexFile.close()
+        if self.Blocks > 0:
+            message = f"Compressed output: {self.Blocks} blocks, {self.UncompressedBytes / 1024:.0f} KB compressed to {self.CompressedBytes / 1024:.0f} KB " \
+                      f"({self.UncompressedBytes / max(self.CompressedBytes, 1):.1f} times smaller), the writer thread needed " \
+                      f"{1000 * self.CompressionTime / self.Blocks:.1f} ms per block on average, at most {1000 * self.MaxCompressionTime:.1f} ms"
+            print(message)
+            writeLogFile(message)
+
+
+def ReadCompressedBlockIndex(fileName):
+    """Returns the blocks of a file written by CompressedBlockFile as dictionaries of the index columns"""
+    if not path.exists(fileName + ".idx"):
+        return []
+    lines = readCsvFile(fileName + ".idx")
+    return [{name: value if name == "TrialEnd" else int(value) for name, value in zip(lines[0], line)} for line in lines[1:]]
+
+
+def ReadTrialFromCompressedFile(fileName, trialNumber):
+    """
+    Reads the rows of a trial from a compressed csv or event stream output data file, only the blocks of the trial are decompressed.
+    :returns The column names and the rows of the trial, each row as a list of the values formatted as in the csv file
+    """
+    index = ReadCompressedBlockIndex(fileName)
+    trialEnds = [blockNumber for blockNumber, block in enumerate(index) if block["TrialEnd"] == str(trialNumber)]
+    if not trialEnds:
+        raise Exception(f"Trial {trialNumber} is not in the index of {fileName}")
+    # the trial starts after the block of the previous trial, the first block is the header. The rows after the trialEnd row
+    # (e.g. the feedback) are in the blocks of the next trial.
+    firstBlock = trialEnds[-1]
+    while firstBlock > 1 and index[firstBlock - 1]["TrialEnd"] == "-":
+        firstBlock -= 1
+    lastBlock = trialEnds[-1] + 1
+    while lastBlock < len(index) - 1 and index[lastBlock]["TrialEnd"] == "-":
+        lastBlock += 1
+
+    def readBlock(block):
+        compressedFile.seek(block["Offset"])
+        return gzip.decompress(compressedFile.read(block["CompressedBytes"])).decode()
+
+    with open(fileName, 'rb') as compressedFile:
+        isEventStream = ".events" in fileName
+        headerLines = readBlock(index[0]).split("\n")[:2 if isEventStream else 1]
+        lines = headerLines + "".join(readBlock(block) for block in index[firstBlock:lastBlock + 1]).splitlines()
+    if isEventStream:
+        columnNames, rows = readEventStreamLines(lines, fileName)
+    else:
+        columnNames = lines[0].split(";")
+        rows = (line.split(";") for line in lines[1:])
+    trialNumberIndex = columnNames.index("TrialNumber")
+    return columnNames, [row for row in rows if row[trialNumberIndex] == str(trialNumber)]
+
+
+def openOutputTextFile(fileName, append=False):
+    """Opens a csv or event stream output data file, compressed if ExperimentSettings.OutputDataCompression is set"""
+    if ExperimentSettings.OutputDataCompression:
+        return CompressedBlockFile(fileName, append)
+    return open(fileName, 'a' if append else 'w')
+
+
+class DeltaEncodedNumbers:
+    """
+    Encodes the texts of a column of numbers as differences to the previous text. Numbers with few decimals are encoded as the
+    difference in units of the last decimal, unrounded floats as the bits that differ from the previous float (which is shorter
+    than the text with all digits). The encoder and the decoder keep the same state, so that the decoder restores exactly the same texts.
+    """
+    NumberPattern = re.compile(r"-?[0-9]+(\.[0-9]+)?")
+    Digits = "0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz+/"  # of the float bits
+
+    def __init__(self):
+        self.Text = None  # the previous text
+        self.ScaledValue = None  # the previous number as integer in units of its last decimal, None if it was no number
+        self.Decimals = 0  # the decimals of the previous number
+        self.FloatBits = None  # the bits of the previous float, None if the previous text was no float
+
+    def update(self, text):
+        self.Text = text
+        self.ScaledValue, self.Decimals = self.getScaledValue(text)
+        self.FloatBits = self.getFloatBits(text)
+
+    @classmethod
+    def getScaledValue(cls, text):
+        """Returns the number of the text as integer in units of its last decimal and the decimals, if it is a number"""
+        if not cls.NumberPattern.fullmatch(text):
+            return None, 0
+        decimals = len(text.partition(".")[2])
+        scaledValue = int(text.lstrip("-").replace(".", ""))
+        return -scaledValue if text.startswith("-") else scaledValue, decimals
+
+    @staticmethod
+    def formatScaledValue(scaledValue, decimals):
+        digits = str(abs(scaledValue)).rjust(decimals + 1, "0")
+        text = digits[:len(digits) - decimals] + "." + digits[len(digits) - decimals:] if decimals > 0 else digits
+        return "-" + text if scaledValue < 0 else text
+
+    @staticmethod
+    def getFloatBits(text):
+        """Returns the bits of the float of the text, if the float is formatted as the text"""
+        if "." not in text:
+            return None
+        try:
+            value = float(text)
+        except ValueError:
+            return None
+        if repr(value) != text:
+            return None
+        return int.from_bytes(struct.pack("<d", value), "little")
+
+    def encode(self, text):
+        """
+        Returns the token of the text: empty if it did not change, the difference (and ":" and the decimals if they changed),
+        "~" and the changed float bits or "=" and the text, whichever is the shortest
+        """
+        if text == self.Text:
+            return ""
+        tokens = ["=" + text]
+        scaledValue, decimals = self.getScaledValue(text)
+        # the text is only encoded as difference if it is restored exactly, e.g. not -0.0
+        if self.ScaledValue is not None and scaledValue is not None and self.formatScaledValue(scaledValue, decimals) == text:
+            scale = max(decimals, self.Decimals)
+            difference = scaledValue * 10 ** (scale - decimals) - self.ScaledValue * 10 ** (scale - self.Decimals)
+            tokens.append(str(difference) if decimals == self.Decimals else f"{difference}:{decimals}")
+        floatBits = self.getFloatBits(text)
+        if self.FloatBits is not None and floatBits is not None:
+            tokens.append("~" + self.formatInteger(floatBits ^ self.FloatBits))
+        self.update(text)
+        return min(tokens, key=len)
+
+    def decode(self, token):
+        if token.startswith("="):
+            text = token[1:]
+        elif token.startswith("~"):
+            text = repr(struct.unpack("<d", (self.FloatBits ^ self.parseInteger(token[1:])).to_bytes(8, "little"))[0])
+        elif token:
+            difference, _, decimals = token.partition(":")
+            decimals = int(decimals) if decimals else self.Decimals
+            scale = max(decimals, self.Decimals)
+            scaledValue = (self.ScaledValue * 10 ** (scale - self.Decimals) + int(difference)) // 10 ** (scale - decimals)
+            text = self.formatScaledValue(scaledValue, decimals)
+        else:
+            return self.Text
+        self.update(text)
+        return text
+
+    @classmethod
+    def formatInteger(cls, value):
+        digits = ""
+        while True:
+            value, digit = divmod(value, 64)
+            digits = cls.Digits[digit] + digits
+            if value == 0:
+                return digits
+
+    @classmethod
+    def parseInteger(cls, digits):
+        value = 0
+        for digit in digits:
+            value = value * 64 + cls.Digits.index(digit)
+        return value
+
+
+class EventStreamFile:
+    """
+    Writes the rows of the output data file as a sparse log of events and a delta-encoded stream of samples, which is much smaller
+    than the csv file. The signal columns (EventStreamSignalColumns: times, cursor, joystick, RMSE, scores) change with almost every
+    row and are written for each row as differences to the previous row (see DeltaEncodedNumbers). All other columns (condition,
+    counters, entered digits, event messages...) only change with events like key presses, window switches or trial starts, they are
+    only written when they change. Converting the file back gives exactly the rows of the csv file.
+
+    Layout: text lines separated with ";". The header "#MTXEVENTS1" and the column names, "#signals" and the indices of the signal
+    columns. Then for each row an event line "E" and "index=value" of the other columns that changed since the previous row (if any),
+    or "index+text" if the text was appended to the value (e.g. the entered digits), followed by the sample line with the tokens of
+    the signal columns (empty tokens at the end are left out).
+    Both are interleaved in one file, so the order of the rows is kept and one fsync covers both.
+    A row that cannot be split into the columns (e.g. with a ";" that was typed) is written as "R" and the row.
+    """
+    Magic = "#MTXEVENTS1"
+
+    def __init__(self, fileName, columnNames, append=False):
+        self.ColumnNames = columnNames
+        self.SignalIndices = [index for index, name in enumerate(columnNames) if name in EventStreamSignalColumns]
+        self.SignalIndexSet = set(self.SignalIndices)
+        self.File = openOutputTextFile(fileName, append)
+        if not append:
+            self.File.write(";".join([self.Magic] + columnNames) + "\n" + ";".join(["#signals"] + [str(index) for index in self.SignalIndices]) + "\n")
+        self.NumberOfRows = 0
+        self.CsvBytes = 0  # the size of the rows as csv file
+        self.BytesWritten = 0
+        self.reset()
+
+    def reset(self):
+        """Forgets the previous row, the next row is written completely"""
+        self.PreviousValues = [None] * len(self.ColumnNames)
+        self.Signals = [DeltaEncodedNumbers() for _ in self.SignalIndices]
+
+    def write(self, row):
+        """Adds a row, given as line of text"""
+        values = row.rstrip("\n").split(";")
+        if len(values) != len(self.ColumnNames):
+            lines = "R;" + row.rstrip("\n") + "\n"
+            self.reset()
+        else:
+            changes = []
+            for index, (value, previousValue) in enumerate(zip(values, self.PreviousValues)):
+                if value != previousValue and index not in self.SignalIndexSet:
+                    if previousValue and value.startswith(previousValue):
+                        changes.append(f"{index}+{value[len(previousValue):]}")
+                    else:
+                        changes.append(f"{index}={value}")
+            self.PreviousValues = values
+            tokens = [signal.encode(values[index]) for index, signal in zip(self.SignalIndices, self.Signals)]
+            lines = ("E;" + ";".join(changes) + "\n" if changes else "") + ";".join(tokens).rstrip(";") + "\n"
+        self.File.write(lines)
+        self.NumberOfRows += 1
+        self.CsvBytes += len(row)
+        self.BytesWritten += len(lines)
+
+    def flush(self):
+        self.File.flush()
+        if isinstance(self.File, CompressedBlockFile):
+            self.reset()  # each block can be decoded on its own
+
+    def markTrialEnd(self, trialNumber):
+        if isinstance(self.File, CompressedBlockFile):
+            self.File.markTrialEnd(trialNumber)
+
+    def fileno(self):
+        return self.File.fileno()
+
+    def close(self):
+        self.File.close()
+        if self.BytesWritten > 0:
+            message = f"Event stream: {self.NumberOfRows} rows, {self.BytesWritten / 1024:.0f} KB written instead of {self.CsvBytes / 1024:.0f} KB as csv " \
+                      f"({self.CsvBytes / self.BytesWritten:.1f} times smaller)"
+            print(message)
+            writeLogFile(message)
+
+
+def ReadEventStreamFile(fileName):
+    """
+    Reads a file written by EventStreamFile (also compressed) line by line.
+    :returns The column names and a generator of the rows, each row as a list of the values formatted as in the csv file
+    """
+    eventFile = gzip.open(fileName, 'rt') if fileName.endswith(".gz") else open(fileName, 'r')
+    try:
+        columnNames, rows = readEventStreamLines((line.rstrip("\n") for line in eventFile), fileName)
+    except Exception:
+        eventFile.close()
+        raise
+
+    def readRows():
+        with eventFile:
+            yield from rows
+
+    return columnNames, readRows()
+
+
+def readEventStreamLines(lines, fileName):
+    """Decodes the lines of an event stream output data file, see ReadEventStreamFile()"""
+    lines = iter(lines)
+    header = next(lines, "").split(";")
+    if header[0] != EventStreamFile.Magic:
+        raise Exception(f"{fileName} is not an event stream output data file")
+    columnNames = header[1:]
+    signalIndices = [int(index) for index in next(lines).split(";")[1:]]
+
+    def readRows():
+        values = [""] * len(columnNames)
+        signals = [DeltaEncodedNumbers() for _ in signalIndices]
+        for line in lines:
+            if line.startswith("E;"):
+                for change in line[2:].split(";"):
+                    indexLength = len(change) - len(change.lstrip("0123456789"))
+                    index = int(change[:indexLength])
+                    if change[indexLength] == "+":
+                        values[index] += change[indexLength + 1:]
+                    else:
+                        values[index] = change[indexLength + 1:]
+            elif line.startswith("R;"):
+                values = [""] * len(columnNames)
+                signals = [DeltaEncodedNumbers() for _ in signalIndices]
+                yield line[2:].split(";")
+            else:
+                tokens = line.split(";") if line else []
+                tokens += [""] * (len(signalIndices) - len(tokens))
+                for index, signal, token in zip(signalIndices, signals, tokens):
+                    values[index] = signal.decode(token)
+                yield list(values)
+
+    return columnNames, readRows()
+
+
+def ReadOutputDataFile(fileName):
+    """
+    Reads an output data file of any format (csv, binary or event stream, also compressed) row by row.
+    :returns The column names and a generator of the rows, each row as a list of the values formatted as in the csv file
+    """
+    if fileName.endswith(".bin"):
+        return ReadBinarySampleFile(fileName)
+    if fileName.endswith(".events") or fileName.endswith(".events.gz"):
+        return ReadEventStreamFile(fileName)
+    csvFile = gzip.open(fileName, 'rt') if fileName.endswith(".gz") else open(fileName, 'r')
+    columnNames = csvFile.readline().rstrip("\n").split(";")
+
+    def readRows():
+        with csvFile:
+            for line in csvFile:
+                yield line.rstrip("\n").split(";")
+
+    return columnNames, readRows()
+
+
+def ConvertOutputDataFileToCsv(fileName, csvFileName):
+    """Converts an output data file of any format to the csv format, row by row"""
+    columnNames, rows = ReadOutputDataFile(fileName)
+    with open(csvFileName, 'w') as csvFile:
+        csvFile.write(";".join(columnNames) + "\n")
+        for row in rows:
+            csvFile.write(";".join(row) + "\n")
+
+
+class OutputRowContext:
+    """The values of a row that are not read from RuntimeVariables. The encoder reuses one instance for all rows."""
+    __slots__ = ("Now", "EventMessage1", "EventMessage2", "Scores")
+
+    def __init__(self):
+        self.Now = None
+        self.EventMessage1 = None
+        self.EventMessage2 = None
+        self.Scores = None  # of parallel dual tasks
+
+# The columns of the output data files: the name, the function for the value and if the value only changes with the condition
+# (it is evaluated once per condition and task type, see startCondition() and startBlock()). The functions are called with the
+# OutputRowContext of the row.
+# The values keep their types, so that the binary output data file can store them as typed arrays.
+OutputColumns = [
+    ("SubjectNr", lambda row: RuntimeVariables.ParticipantNumber, True),
+    ("RadiusCircle", lambda row: str([circle.Radius for circle in RuntimeVariables.CurrentCircles]), True),
+    ("StandardDeviationOfNoise", lambda row: RuntimeVariables.StandardDeviationOfNoise, True),
+    # this is an absolute time, that always increases (necessary to syncronize with eye-tracking)
+    ("CurrentTime", lambda row: round((row.Now - RuntimeVariables.StartTimeOfFirstExperiment) * 10000) / 10000, False),
+    # this is a local time (reset at the start of each trial) in seconds
+    ("TrialTime", lambda row: round((row.Now - RuntimeVariables.StartTimeCurrentTrial) * 10000) / 10000, False),
+    ("VisitTime", lambda row: row.Now - RuntimeVariables.VisitStartTime if RuntimeVariables.CurrentTaskType in [TaskTypes.DualTask, TaskTypes.PracticeDualTask] else '-', False),
+    ("BlockNumber", lambda row: RuntimeVariables.BlockNumber, False),
+    ("TrialNumber", lambda row: RuntimeVariables.TrialNumber, False),
+    ("Experiment", lambda row: str(RuntimeVariables.CurrentTaskType).replace('TaskType.', ''), True),
+    ("TrackingTaskPresent", lambda row: RuntimeVariables.TrackingTaskPresent, False),
+    ("TypingTaskPresent", lambda row: RuntimeVariables.TypingTaskPresent, False),
+    ("TrackingWindowVisible", lambda row: RuntimeVariables.TrackingWindowVisible, False),
+    ("TypingWindowVisible", lambda row: RuntimeVariables.TypingWindowVisible, False),
+    ("TrackingWindowEntryCounter", lambda row: RuntimeVariables.TrackingWindowEntryCounter, False),
+    ("TypingWindowEntryCounter", lambda row: RuntimeVariables.TypingWindowEntryCounter, False),
+    ("RMSE", lambda row: calculateRmse(), False),
+    ("LengthPathTrackedPixel", lambda row: RuntimeVariables.TrackingStatistics.LengthOfPath, False),
+    ("CursorCoordinatesX", lambda row: round(RuntimeVariables.CursorCoordinates.X * 100) / 100 if RuntimeVariables.TrackingTaskPresent else '-', False),
+    ("CursorCoordinatesY", lambda row: round(RuntimeVariables.CursorCoordinates.Y * 100) / 100 if RuntimeVariables.TrackingTaskPresent else '-', False),
+    ("JoystickAxisX", lambda row: round(RuntimeVariables.JoystickAxis.X * 1000) / 1000 if RuntimeVariables.TrackingTaskPresent else '-', False),
+    ("JoystickAxisY", lambda row: round(RuntimeVariables.JoystickAxis.Y * 1000) / 1000 if RuntimeVariables.TrackingTaskPresent else '-', False),
+    ("EnteredDigits", lambda row: RuntimeVariables.EnteredDigitsStr if RuntimeVariables.TypingTaskPresent else '-', False),
+    ("EnteredDigitsLength", lambda row: len(RuntimeVariables.EnteredDigitsStr) if RuntimeVariables.TypingTaskPresent else '-', False),
+    ("CurrentTypingTaskNumbers", lambda row: RuntimeVariables.CurrentTypingTaskNumbers if RuntimeVariables.TypingTaskPresent else '-', False),
+    ("GeneratedTypingTaskNumberLength", lambda row: len(RuntimeVariables.CurrentTypingTaskNumbers) if RuntimeVariables.TypingTaskPresent else '-', False),
+    ("NumberOfCircleExits", lambda row: RuntimeVariables.NumberOfCircleExits, False),
+    ("TrialScore", lambda row: RuntimeVariables.TrialScore, False),
+    ("VisitScore", lambda row: RuntimeVariables.VisitScore, False),
+    ("CorrectDigitsVisit", lambda row: RuntimeVariables.CorrectlyTypedDigitsVisit, False),
+    ("IncorrectDigitsVisit", lambda row: RuntimeVariables.IncorrectlyTypedDigitsVisit, False),
+    ("IncorrectDigitsTrial", lambda row: RuntimeVariables.IncorrectlyTypedDigitsTrial, False),
+    ("OutsideRadius", lambda row: isCursorOutsideCircle(), False),
+    ("TypingRewardCorrectDigit", lambda row: RuntimeVariables.TypingRewardCorrectDigit, True),
+    ("TypingScoreParallelSetup", lambda row: row.Scores[0], False),
+    ("TrackingScoreParallelSetup", lambda row: row.Scores[1], False),
+    ("CombinedScoreParallelSetup", lambda row: row.Scores[2], False),
+    ("EventMessage1", lambda row: row.EventMessage1, False),
+    ("EventMessage2", lambda row: row.EventMessage2, False),
+    # how late the current tick of the trial loop started
+    ("SchedulingLatenessMs", lambda row: round(RuntimeVariables.TrialScheduler.TickLateness * 1000000) / 1000
+                             if RuntimeVariables.TrialScheduler and RuntimeVariables.TrialScheduler.TickLateness is not None else '-', False),
+    ("TrialSeed", lambda row: RuntimeVariables.RandomStreams.TrialSeed if RuntimeVariables.RandomStreams else '-', False),
+]
+
+# The columns that change with almost every row. The event stream output data file writes them for each row as differences,
+# the other columns only when they change (see EventStreamFile).
+EventStreamSignalColumns = ["CurrentTime", "TrialTime", "VisitTime", "RMSE", "LengthPathTrackedPixel", "CursorCoordinatesX", "CursorCoordinatesY",
+                            "JoystickAxisX", "JoystickAxisY", "TypingScoreParallelSetup", "TrackingScoreParallelSetup", "CombinedScoreParallelSetup",
+                            "SchedulingLatenessMs"]
+
+
+class OutputRowEncoder:
+    """
+    Builds the header and the rows of the output data files from a list of columns like OutputColumns.
+    The values that only change with the condition are evaluated and formatted once per condition into the template of the
+    text rows, so each row only evaluates and formats the other columns. conditionChanged() must be called when the condition changes.
+    """
+    def __init__(self, columns):
+        self.ColumnNames = [name for name, getValue, perCondition in columns]
+        self.Header = ";".join(self.ColumnNames) + "\n"
+        self.Columns = columns
+        self.RowColumnIndices = [index for index, (name, getValue, perCondition) in enumerate(columns) if not perCondition]
+        self.RowFunctions = [getValue for name, getValue, perCondition in columns if not perCondition]
+        self.ConditionValues = None  # the values of a row with the values of the condition, is built at the first row of a condition
+        self.TextTemplate = None
+        self.Row = OutputRowContext()
+
+    def conditionChanged(self):
+        """The values of the condition are evaluated again at the next row"""
+        self.ConditionValues = None
+        self.TextTemplate = None
+
+    def updateCondition(self, row):
+        self.ConditionValues = [getValue(row) if perCondition else None for name, getValue, perCondition in self.Columns]
+        self.TextTemplate = ";".join(str(value).replace("%", "%%") if perCondition else "%s"
+                                     for value, (name, getValue, perCondition) in zip(self.ConditionValues, self.Columns)) + "\n"
+
+    def getRowContext(self, eventMessage1, eventMessage2):
+        row = self.Row
+        row.Now = RuntimeVariables.Clock.now()
+        row.EventMessage1 = eventMessage1
+        row.EventMessage2 = eventMessage2
+        row.Scores = RuntimeVariables.ScoreEngine.Scores if RuntimeVariables.ParallelDualTasks else ['-', '-', '-']
+        return row
+
+    def encodeValues(self, eventMessage1, eventMessage2):
+        """Returns the values of a row"""
+        row = self.getRowContext(eventMessage1, eventMessage2)
+        if self.ConditionValues is None:
+            self.updateCondition(row)
+        values = self.ConditionValues.copy()
+        for index, getValue in zip(self.RowColumnIndices, self.RowFunctions):
+            values[index] = getValue(row)
+        return values
+
+    def encodeText(self, eventMessage1, eventMessage2):
+        """Returns a row as line of text"""
+        row = self.getRowContext(eventMessage1, eventMessage2)
+        if self.TextTemplate is None:
+            self.updateCondition(row)
+        return self.TextTemplate % tuple([getValue(row) for getValue in self.RowFunctions])
+
+
+def initializeOutputFiles(sessionPlan, resumedTimestamp=None):
+    """
+    Set the participant condition. Initialize the output files and write the session plan.
+    :param resumedTimestamp: The timestamp of the files of a resumed session, the rows are appended to them
+    """
+    RuntimeVariables.OutputRowEncoder = OutputRowEncoder(OutputColumns)
+    outputText = RuntimeVariables.OutputRowEncoder.Header
+
+    timestamp = resumedTimestamp or time.strftime("%Y-%m-%d_%H-%M")
+    fileMode = 'a' if resumedTimestamp else 'w'
+    dataFileName = RuntimeVariables.OutputDirectory + "participant_" + str(RuntimeVariables.ParticipantNumber) + "_data_" + timestamp
+    if ExperimentSettings.OutputDataFormat == OutputDataFormat.Binary:
+        RuntimeVariables.OutputDataFile = BinarySampleFile(dataFileName + ".bin", RuntimeVariables.OutputRowEncoder.ColumnNames, ExperimentSettings.BinaryOutputChunkRows,
+                                                           append=bool(resumedTimestamp))
+    elif ExperimentSettings.OutputDataFormat == OutputDataFormat.EventStream:
+        RuntimeVariables.OutputDataFile = EventStreamFile(dataFileName + getOutputDataFileExtension(), RuntimeVariables.OutputRowEncoder.ColumnNames,
+                                                          append=bool(resumedTimestamp))
+    else:
+        RuntimeVariables.OutputDataFile = openOutputTextFile(dataFileName + getOutputDataFileExtension(), append=bool(resumedTimestamp))  # contains the user data
+        if not resumedTimestamp:
+            RuntimeVariables.OutputDataFile.write(outputText)
     RuntimeVariables.OutputDataFile.flush()
     # typically the above line would do. however this is used to ensure that the file is written
     os.fsync(RuntimeVariables.OutputDataFile.fileno())
 
-    summaryFileName = "participant_" + str(RuntimeVariables.ParticipantNumber) + "_data_lastTrialEntry_" + timestamp + ".csv"
-    RuntimeVariables.OutputDataFileTrialEnd = open(summaryFileName, 'w')  # contains the user data
-    RuntimeVariables.OutputDataFileTrialEnd.write(outputText)
+    if not resumedTimestamp:
+        sessionPlan.write(RuntimeVariables.OutputDirectory + "participant_" + str(RuntimeVariables.ParticipantNumber) + "_plan_" + timestamp + ".json")
+
+    if ExperimentSettings.SaveDisturbances:
+        RuntimeVariables.DisturbanceDirectory = RuntimeVariables.OutputDirectory + "participant_" + str(RuntimeVariables.ParticipantNumber) + "_disturbances_" + timestamp
+        os.makedirs(RuntimeVariables.DisturbanceDirectory, exist_ok=True)
+
+    summaryFileName = RuntimeVariables.OutputDirectory + "participant_" + str(RuntimeVariables.ParticipantNumber) + "_data_lastTrialEntry_" + timestamp + ".csv"
+    RuntimeVariables.OutputDataFileTrialEnd = open(summaryFileName, fileMode)  # contains the user data
+    if not resumedTimestamp:
+        RuntimeVariables.OutputDataFileTrialEnd.write(outputText)
     RuntimeVariables.OutputDataFileTrialEnd.flush()
     # typically the above line would do. however this is used to ensure that the file is written
     os.fsync(RuntimeVariables.OutputDataFileTrialEnd.fileno())
 
+    RuntimeVariables.OutputDataWriter = BufferedOutputWriter(RuntimeVariables.OutputDataFile, ExperimentSettings.OutputFsyncPolicy,
+                                                             ExperimentSettings.OutputFsyncIntervalRows, ExperimentSettings.OutputFsyncIntervalMilliseconds)
+
+    if ExperimentSettings.JoystickSamplingRate > 0:
+        inputFileName = RuntimeVariables.OutputDirectory + "participant_" + str(RuntimeVariables.ParticipantNumber) + "_input_" + timestamp + ".csv"
+        RuntimeVariables.JoystickSampler = JoystickSampler(RuntimeVariables.Clock, ExperimentSettings.JoystickSamplingRate, inputFileName, append=bool(resumedTimestamp))
+    if ExperimentSettings.FrameTimingRecording:
+        frameTimesDirectory = None
+        if ExperimentSettings.SaveFrameTimes:
+            frameTimesDirectory = RuntimeVariables.OutputDirectory + "participant_" + str(RuntimeVariables.ParticipantNumber) + "_frametimes_" + timestamp
+            os.makedirs(frameTimesDirectory, exist_ok=True)
+        RuntimeVariables.FrameTimingRecorder = FrameTimingRecorder(RuntimeVariables.Clock, frameTimesDirectory)
+    if RuntimeVariables.ProfileHotPaths:
+        profileFileName = RuntimeVariables.OutputDirectory + "participant_" + str(RuntimeVariables.ParticipantNumber) + "_profile_" + timestamp + ".csv"
+        RuntimeVariables.HotPathProfiler = HotPathProfiler(profileFileName, append=bool(resumedTimestamp))
+        RuntimeVariables.HotPathProfiler.install()
+    if ExperimentSettings.InputLatencyLogging:
+        latencyFileName = RuntimeVariables.OutputDirectory + "participant_" + str(RuntimeVariables.ParticipantNumber) + "_latency_" + timestamp + ".csv"
+        summaryFileName = RuntimeVariables.OutputDirectory + "participant_" + str(RuntimeVariables.ParticipantNumber) + "_latency_summary_" + timestamp + ".csv"
+        RuntimeVariables.InputLatencyRecorder = InputLatencyRecorder(RuntimeVariables.Clock, latencyFileName, summaryFileName, append=bool(resumedTimestamp))
+
+
+def truncateIncompleteLastLine(fileName):
+    """Removes a line at the end of a text file that was not completely written, e.g. because the program crashed"""
+    with open(fileName, 'r+b') as textFile:
+        textFile.seek(0, os.SEEK_END)
+        fileSize = textFile.tell()
+        end = fileSize
+        while end > 0:
+            textFile.seek(max(end - 4096, 0))
+            data = textFile.read(end - max(end - 4096, 0))
+            if end == fileSize and data.endswith(b"\n"):
+                return
+            newline = data.rfind(b"\n")
+            if newline >= 0:
+                end = max(end - 4096, 0) + newline + 1
+                break
+            end = max(end - 4096, 0)
+        textFile.truncate(end)
+
+
+def getOutputDataFileExtension():
+    extension = {OutputDataFormat.Binary: ".bin", OutputDataFormat.EventStream: ".events"}.get(ExperimentSettings.OutputDataFormat, ".csv")
+    if ExperimentSettings.OutputDataCompression and ExperimentSettings.OutputDataFormat != OutputDataFormat.Binary:
+        extension += ".gz"
+    return extension
+
+
+def readLastRowOfDataFile(dataFileName):
+    """Returns the last row of a complete output data file as a dictionary of the column values"""
+    columnNames, rows = ReadOutputDataFile(dataFileName)
+    lastRow = None
+    for lastRow in rows:
+        pass
+    return dict(zip(columnNames, lastRow)) if lastRow else {}
+
 
-def writeOutputDataFile(eventMessage1, eventMessage2, endOfTrial=False):
-    currentTime = time.time() - RuntimeVariables.StartTimeOfFirstExperiment  # this is an absolute time, that always increases (necessary to syncronize with eye-tracking)
-    currentTime = scipy.special.round(currentTime * 10000) / 10000
+def parseNumber(text):
+    try:
+        return int(text)
+    except ValueError:
+        return float(text)
 
-    trialTime = time.time() - RuntimeVariables.StartTimeCurrentTrial  # this is a local time (reset at the start of each trial) in seconds
-    trialTime = scipy.special.round(trialTime * 10000) / 10000
 
-    if not RuntimeVariables.TrackingTaskPresent:
-        outputCursorCoordinateX = "-"
-        outputCursorCoordinateY = "-"
-        outputJoystickAxisX = "-"
-        outputJoystickAxisY = "-"
+def resumeSession(sessionPlan):
+    """
+    Finds the files of the last session of the participant and restores the state after its last completed trial (the last row of
+    the lastTrialEntry file). Rows at the end of the files that were not completely written are removed, all other rows are kept.
+    The session plan must not have changed, i.e. the settings and the participant file must be the same.
+    :returns The timestamp of the files, the index in the plan of the next trial and the CurrentTime of the last row of the data file
+    """
+    participant = "participant_" + str(RuntimeVariables.ParticipantNumber)
+    prefix = RuntimeVariables.OutputDirectory + participant + "_data_lastTrialEntry_"
+    summaryFileNames = sorted(glob.glob(glob.escape(prefix) + "*.csv"))
+    if not summaryFileNames:
+        raise Exception(f"There is no session of {participant} to resume")
+    timestamp = summaryFileNames[-1][len(prefix):-len(".csv")]
+
+    planFileName = RuntimeVariables.OutputDirectory + participant + "_plan_" + timestamp + ".json"
+    if path.exists(planFileName):
+        with open(planFileName, encoding="utf-8") as planFile:
+            plannedTrials = json.load(planFile)["Trials"]
+        if plannedTrials != json.loads(json.dumps([sessionPlan.getTrialJson(spec) for spec in sessionPlan.Trials])):
+            raise Exception(f"The settings or the participant file changed since the session {timestamp} was started, it cannot be resumed")
     else:
-        outputCursorCoordinateX = scipy.special.round(RuntimeVariables.CursorCoordinates.X * 100) / 100
-        outputCursorCoordinateY = scipy.special.round(RuntimeVariables.CursorCoordinates.Y * 100) / 100
-        outputJoystickAxisX = scipy.special.round(RuntimeVariables.JoystickAxis.X * 1000) / 1000
-        outputJoystickAxisY = scipy.special.round(RuntimeVariables.JoystickAxis.Y * 1000) / 1000
-
-    if RuntimeVariables.TypingTaskPresent:
-        outputEnteredDigitsStr = RuntimeVariables.EnteredDigitsStr
-        outputEnteredDigitsLength = len(RuntimeVariables.EnteredDigitsStr)
-        outputGeneratedTypingTaskNumbers = RuntimeVariables.CurrentTypingTaskNumbers
-        outputGeneratedTypingTaskNumbersLength = len(RuntimeVariables.CurrentTypingTaskNumbers)
+        print(f"{planFileName} not found, the session is resumed without checking the settings")
+
+    extension = getOutputDataFileExtension()
+    dataFileName = RuntimeVariables.OutputDirectory + participant + "_data_" + timestamp + extension
+    if not path.exists(dataFileName):
+        raise Exception(f"{dataFileName} not found, the session cannot be resumed with the current output data format")
+    truncateIncompleteLastLine(summaryFileNames[-1])
+    if extension == ".bin":
+        BinarySampleFile.truncateIncompleteChunk(dataFileName)
+    elif extension.endswith(".gz"):
+        CompressedBlockFile.truncateIncompleteBlock(dataFileName)
     else:
-        outputEnteredDigitsStr = "-"
-        outputEnteredDigitsLength = "-"
-        outputGeneratedTypingTaskNumbers = "-"
-        outputGeneratedTypingTaskNumbersLength = "-"
+        truncateIncompleteLastLine(dataFileName)
 
-    if RuntimeVariables.CurrentTaskType == TaskTypes.DualTask or RuntimeVariables.CurrentTaskType == TaskTypes.PracticeDualTask:
-        visitTime = time.time() - RuntimeVariables.VisitStartTime
-    else:
-        visitTime = "-"
+    lines = readCsvFile(summaryFileNames[-1])
+    completedTrials = [dict(zip(lines[0], line)) for line in lines[1:]]
+    lastTrialNumber = int(completedTrials[-1]["TrialNumber"]) if completedTrials else 0
+    remainingSpecs = [spec for spec in sessionPlan.Trials if spec.TrialNumber > lastTrialNumber]
+    if not remainingSpecs:
+        raise Exception(f"The session {timestamp} of {participant} is already complete")
 
-    circleRadii = list(map(lambda circle: circle.Radius, RuntimeVariables.CurrentCircles))
-    currentTask = str(RuntimeVariables.CurrentTaskType).replace("TaskType.", "")
+    # the dual task scores are collected by the feedback after the trials
+    specs = {spec.TrialNumber: spec for spec in sessionPlan.Trials}
+    for completedTrial in completedTrials:
+        spec = specs.get(int(completedTrial["TrialNumber"]))
+        if spec and spec.TaskType == TaskTypes.DualTask and spec.FeedbackAfterTrial != TrialFeedback.NoFeedback:
+            scoreColumn = "CombinedScoreParallelSetup" if RuntimeVariables.ParallelDualTasks else "TrialScore"
+            RuntimeVariables.DualTaskScoreOverAllConditions.append(parseNumber(completedTrial[scoreColumn]))
 
-    scores = CalculateFeedbackParallelDualTasks() if RuntimeVariables.ParallelDualTasks else ["-", "-", "-"]
-    typingScore = scores[0]
-    trackingScore = scores[1]
-    combinedScore = scores[2]
+    lastRow = readLastRowOfDataFile(dataFileName)
+    lastCurrentTime = float(lastRow.get("CurrentTime", 0))
+    print(f"Resuming the session {timestamp} of {participant} at trial {remainingSpecs[0].TrialNumber} ({len(completedTrials)} trials completed)")
+    return timestamp, remainingSpecs[0].PlanIndex, lastCurrentTime
 
-    outputText = \
-        str(RuntimeVariables.ParticipantNumber) + ";" + \
-        str(circleRadii) + ";" + \
-        str(RuntimeVariables.StandardDeviationOfNoise) + ";" + \
-        str(currentTime) + ";" + \
-        str(trialTime) + ";" + \
-        str(visitTime) + ";" + \
-        str(RuntimeVariables.BlockNumber) + ";" + \
-        str(RuntimeVariables.TrialNumber) + ";" + \
-        str(currentTask) + ";" + \
-        str(RuntimeVariables.TrackingTaskPresent) + ";" + \
-        str(RuntimeVariables.TypingTaskPresent) + ";" + \
-        str(RuntimeVariables.TrackingWindowVisible) + ";" + \
-        str(RuntimeVariables.TypingWindowVisible) + ";" + \
-        str(RuntimeVariables.TrackingWindowEntryCounter) + ";" + \
-        str(RuntimeVariables.TypingWindowEntryCounter) + ";" + \
-        str(calculateRmse()) + ";" + \
-        str(RuntimeVariables.LengthOfPathTracked) + ";" + \
-        str(outputCursorCoordinateX) + ";" + \
-        str(outputCursorCoordinateY) + ";" + \
-        str(outputJoystickAxisX) + ";" + \
-        str(outputJoystickAxisY) + ";" + \
-        str(outputEnteredDigitsStr) + ";" + \
-        str(outputEnteredDigitsLength) + ";" + \
-        str(outputGeneratedTypingTaskNumbers) + ";" + \
-        str(outputGeneratedTypingTaskNumbersLength) + ";" + \
-        str(RuntimeVariables.NumberOfCircleExits) + ";" + \
-        str(RuntimeVariables.TrialScore) + ";" + \
-        str(RuntimeVariables.VisitScore) + ";" + \
-        str(RuntimeVariables.CorrectlyTypedDigitsVisit) + ";" + \
-        str(RuntimeVariables.IncorrectlyTypedDigitsVisit) + ";" + \
-        str(RuntimeVariables.IncorrectlyTypedDigitsTrial) + ";" + \
-        str(isCursorOutsideCircle()) + ";" + \
-        str(RuntimeVariables.TypingRewardCorrectDigit) + ";" + \
-        str(typingScore) + ";" + \
-        str(trackingScore) + ";" + \
-        str(combinedScore) + ";" + \
-        str(eventMessage1) + ";" + \
-        str(eventMessage2) + "\n"
+
+def writeOutputDataFile(eventMessage1, eventMessage2, endOfTrial=False):
+    startTime = time.perf_counter()
+    if ExperimentSettings.OutputDataFormat == OutputDataFormat.Binary:
+        outputValues = RuntimeVariables.OutputRowEncoder.encodeValues(eventMessage1, eventMessage2)
+        outputText = ";".join(map(str, outputValues)) + "\n" if endOfTrial else None
+    else:
+        outputValues = None
+        outputText = RuntimeVariables.OutputRowEncoder.encodeText(eventMessage1, eventMessage2)
 
     if endOfTrial:
         RuntimeVariables.OutputDataFileTrialEnd.write(outputText)
@@ -1624,10 +4340,46 @@ def writeOutputDataFile(eventMessage1, eventMessage2, endOfTrial=False):
         # typically the above line would do. however this is used to ensure that the file is written
         os.fsync(RuntimeVariables.OutputDataFileTrialEnd.fileno())
 
-    RuntimeVariables.OutputDataFile.write(outputText)
-    RuntimeVariables.OutputDataFile.flush()
-    # typically the above line would do. however this is used to ensure that the file is written
-    os.fsync(RuntimeVariables.OutputDataFile.fileno())
+    # the data file is written on a background thread, it is forced to disk at the latest at the end of the trial
+    RuntimeVariables.OutputDataWriter.write(outputValues if outputValues is not None else outputText, endOfTrial, RuntimeVariables.TrialNumber)
+    if endOfTrial:
+        RuntimeVariables.OutputDataWriter.reportRowsAtRisk()
+    else:
+        RuntimeVariables.OutputDataWriter.addMainThreadTime(time.perf_counter() - startTime)  # the trialEnd row is also forced to disk
+
+
+def VerifyParallelDualTaskScores(fileName):
+    """
+    Checks the scores of parallel dual tasks in an output data file, e.g. of a simulated session, against the other columns of
+    the same row: the typing score must be the correct digits of the visit and the tracking score the inverted RMSE of the ticks
+    of the trial so far, cumulated once per tick (a tick writes one row with the RMSE after the cursor moved).
+    """
+    tickEvents = {"trackingVisible", "typingVisible", "trackingAndTypingVisible", ""}
+    columnNames, rows = ReadOutputDataFile(fileName)
+    column = {name: index for index, name in enumerate(columnNames)}
+    checkedRows = 0
+    cumulatedTrackingScore = 0
+    trialNumber = None
+    for rowNumber, row in enumerate(rows, start=2):
+        if row[column["TypingScoreParallelSetup"]] == "-":
+            continue
+        eventMessage = row[column["EventMessage1"]]
+        if eventMessage == "trialStart" or row[column["TrialNumber"]] != trialNumber:
+            cumulatedTrackingScore = 0
+            trialNumber = row[column["TrialNumber"]]
+        if eventMessage in tickEvents:
+            trackingScore = float(row[column["RMSE"]])
+            if trackingScore > 0:
+                cumulatedTrackingScore += 1.0 / trackingScore
+        typingScore = int(row[column["CorrectDigitsVisit"]])
+        expectedScores = (typingScore, int(cumulatedTrackingScore), int((typingScore + cumulatedTrackingScore) / 2.0))
+        scores = tuple(int(row[column[name]]) for name in ["TypingScoreParallelSetup", "TrackingScoreParallelSetup", "CombinedScoreParallelSetup"])
+        if scores != expectedScores:
+            raise Exception(f"Row {rowNumber} ({eventMessage}, trial {trialNumber}): scores {scores}, expected {expectedScores} from the row")
+        checkedRows += 1
+    if checkedRows == 0:
+        raise Exception(f"{fileName} has no rows of parallel dual tasks")
+    print(f"Score engine: the scores of {checkedRows} rows match the correct digits and the RMSE of their rows")
 
 
 def quitApp(message=None):
@@ -1637,10 +4389,20 @@ def quitApp(message=None):
     pygame.display.quit()
     pygame.quit()
     try:
+        if RuntimeVariables.OutputDataWriter:
+            RuntimeVariables.OutputDataWriter.close()
         if RuntimeVariables.OutputDataFile:
             RuntimeVariables.OutputDataFile.close()
         if RuntimeVariables.OutputDataFileTrialEnd:
             RuntimeVariables.OutputDataFileTrialEnd.close()
+        if RuntimeVariables.JoystickSampler:
+            RuntimeVariables.JoystickSampler.close()
+        if RuntimeVariables.InputLatencyRecorder:
+            RuntimeVariables.InputLatencyRecorder.close()
+        if RuntimeVariables.FrameTimingRecorder:
+            RuntimeVariables.FrameTimingRecorder.close()
+        if RuntimeVariables.HotPathProfiler:
+            RuntimeVariables.HotPathProfiler.close()
     except NameError:
         pass
     sys.exit()
@@ -1705,6 +4467,9 @@ def DrawGui():
     Label(frameInputOptions, text="Probandennummer").grid(row=0, column=0)
     txPersonNumber = Text(frameInputOptions, height=1, width=2)
     txPersonNumber.grid(row=0, column=1)
+    resumeSession = IntVar()
+    chkResumeSession = Checkbutton(frameInputOptions, text="Letzte Sitzung fortsetzen", variable=resumeSession)
+    chkResumeSession.grid(row=0, column=2)
 
     runPracticeTrials = IntVar()
     chkRunPracticeTrials = Checkbutton(frameOptions, text="Übungs-Trials durchführen", variable=runPracticeTrials)
@@ -1740,6 +4505,10 @@ def DrawGui():
     frameParallelSetup = Frame(frameOptions, highlightbackground="black", highlightthickness=1)
     frameParallelSetup.grid(row=7, column=0)
 
+    profileHotPaths = IntVar()
+    chkProfileHotPaths = Checkbutton(frameOptions, text="Laufzeit der Trial-Funktionen messen\n(Profil neben der Datendatei)", variable=profileHotPaths)
+    chkProfileHotPaths.grid(row=8, column=0)
+
     parallelDualTasks = IntVar()
     chkParallelDualTasks = Checkbutton(frameParallelSetup, text="Parallele DualTasks", variable=parallelDualTasks)
     chkParallelDualTasks.grid(row=0, column=0)
@@ -1825,7 +4594,7 @@ def DrawGui():
                       command=lambda: ParseAndSaveInputs(tkWindow, listBoxBlocks, listBoxCirclesBig, listBoxCirclesSmall, listBoxCirclesPractice, txPersonNumber,
                                          parallelDualTasks, typingTaskInCursor, runPracticeTrials, showPenaltyRewardNoise, disableTypingScoreOutside,
                                          displayScoreNormalTrials, displayScorePracticeTrials, practiceTrackingPenalty, parallelFeedback, txFeedbackInterval,
-                                         showOnlyGetReadyMessage))
+                                         showOnlyGetReadyMessage, resumeSession, profileHotPaths))
     btnStart.grid(row=5, column=0)
 
     # Finally load settings from file if present
@@ -1869,6 +4638,8 @@ def DrawGui():
                 txFeedbackInterval.insert(END, value)
             if key == "ShowOnlyGetReadyMessage" and value == "1":
                 chkShowOnlyGetReadyMessage.select()
+            if key == "ProfileHotPaths" and value == "1":
+                chkProfileHotPaths.select()
     tkWindow.mainloop()
 
 
@@ -1908,6 +4679,11 @@ class SettingsFile:
     Circles = []
     Options = {}
 
+    def __init__(self):
+        self.Blocks = []
+        self.Circles = []
+        self.Options = {}
+
 
 def LoadSettingsFromFile():
     if not path.exists(Constants.SettingsFilename):
@@ -1951,13 +4727,15 @@ def LoadSettingsFromFile():
             settingsFile.Options[key] = line[1]
         if key == "ShowOnlyGetReadyMessage":
             settingsFile.Options[key] = line[1]
+        if key == "ProfileHotPaths":
+            settingsFile.Options[key] = line[1]
     return settingsFile
 
 
 def ParseAndSaveInputs(tkWindow, listBoxBlocks, listBoxCirclesBig, listBoxCirclesSmall, listBoxCirclesPractice, txPersonNumber,
                        parallelDualTasks, typingTaskInCursor, runPracticeTrials, showPenaltyRewardNoise, disableTypingScoreOutside,
                        displayScoreNormalTrials, displayScorePracticeTrials, practiceTrackingPenalty, parallelFeedback, txFeedbackInterval,
-                       showOnlyGetReadyMessage):
+                       showOnlyGetReadyMessage, resumeSession, profileHotPaths):
     linesSettingsFile = []
     # Write Blocks
     for listEntryText in listBoxBlocks.get(0, END):
@@ -1989,81 +4767,326 @@ def ParseAndSaveInputs(tkWindow, listBoxBlocks, listBoxCirclesBig, listBoxCircle
         print("No Subject number entered")
         return
 
-    # Set Options to RuntimeVariables
-    parallelDualTasksEnabled = parallelDualTasks.get()
-    if parallelDualTasksEnabled == 1:
-        RuntimeVariables.ParallelDualTasks = True
-        Constants.OffsetTaskWindowsTop += 20
-        Constants.TopLeftCornerOfTypingTaskWindow = Vector2D(Constants.OffsetLeftRight, Constants.OffsetTaskWindowsTop)
-        Constants.TopLeftCornerOfTrackingTaskWindow = Vector2D(Constants.OffsetLeftRight + ExperimentSettings.TaskWindowSize.X + ExperimentSettings.SpaceBetweenWindows, Constants.OffsetTaskWindowsTop)
-
-    if typingTaskInCursor.get() == 1:
-        RuntimeVariables.DisplayTypingTaskWithinCursor = True
-        RuntimeVariables.ParallelDualTasks = True  # also required
-        parallelDualTasksEnabled = 1  # save the other option as checked to file
-        Constants.OffsetTaskWindowsTop += 20
-        Constants.TopLeftCornerOfTypingTaskWindow = Vector2D(Constants.OffsetLeftRight, Constants.OffsetTaskWindowsTop)
-        Constants.TopLeftCornerOfTrackingTaskWindow = Vector2D(Constants.OffsetLeftRight + ExperimentSettings.TaskWindowSize.X + ExperimentSettings.SpaceBetweenWindows, Constants.OffsetTaskWindowsTop)
-    else:
-        RuntimeVariables.DisplayTypingTaskWithinCursor = False
-
-    RuntimeVariables.RunPracticeTrials = True if runPracticeTrials.get() == 1 else False
-    RuntimeVariables.ShowPenaltyRewardNoise = True if showPenaltyRewardNoise.get() == 1 else False
-    RuntimeVariables.DisableCorrectTypingScoreOutsideCircle = True if disableTypingScoreOutside.get() == 1 else False
-    RuntimeVariables.DisplayScoreForNormalTrials = True if displayScoreNormalTrials.get() == 1 else False
-    RuntimeVariables.DisplayScoreForPracticeTrials = True if displayScorePracticeTrials.get() == 1 else False
-
-    RuntimeVariables.PenaltyPracticeTrials = Penalty[practiceTrackingPenalty.get().replace("Penalty.", "")]
-    RuntimeVariables.FeedbackMode = FeedbackMode[parallelFeedback.get().replace("FeedbackMode.", "")]
-
-    feedbackInterval = txFeedbackInterval.get("1.0", END).strip()
-    interval = ""
+    # Set Options to RuntimeVariables, with the names and values of the settings file
+    options = {"ParallelDualTasks": str(parallelDualTasks.get()),
+               "DisplayTypingTaskWithinCursor": str(typingTaskInCursor.get()),
+               "RunPracticeTrials": str(runPracticeTrials.get()),
+               "ShowPenaltyRewardNoise": str(showPenaltyRewardNoise.get()),
+               "DisableTypingScoreOutside": str(disableTypingScoreOutside.get()),
+               "DisplayScoreForNormalTrials": str(displayScoreNormalTrials.get()),
+               "DisplayScoreForPracticeTrials": str(displayScorePracticeTrials.get()),
+               "PracticeTrackingPenalty": practiceTrackingPenalty.get(),
+               "ParallelFeedback": parallelFeedback.get(),
+               "FeedbackInterval": txFeedbackInterval.get("1.0", END).strip(),
+               "ShowOnlyGetReadyMessage": str(showOnlyGetReadyMessage.get()),
+               "ProfileHotPaths": str(profileHotPaths.get())}
     try:
-        if RuntimeVariables.FeedbackMode != FeedbackMode.AfterTrialsInInterval and not feedbackInterval:  # interval textbox can be empty if not required
-            leaveIntervalBoxEmpty = True
-        else:
-            interval = int(feedbackInterval)
-            RuntimeVariables.IntervalForFeedbackAfterTrials = interval
-            leaveIntervalBoxEmpty = False
-    except:
+        ApplyOptions(options)
+    except ValueError:
         print("Invalid interval for parallel dual task feedback entered")
         return
-
-    RuntimeVariables.ShowOnlyGetReadyMessage = True if showOnlyGetReadyMessage.get() == 1 else False
+    RuntimeVariables.ResumeSession = True if resumeSession.get() == 1 else False  # not saved, it only applies to this session
 
     # Save Options to file
-    linesSettingsFile.append(["ParallelDualTasks", parallelDualTasksEnabled])
-    linesSettingsFile.append(["DisplayTypingTaskWithinCursor", typingTaskInCursor.get()])
-    linesSettingsFile.append(["RunPracticeTrials", runPracticeTrials.get()])
-    linesSettingsFile.append(["ShowPenaltyRewardNoise", showPenaltyRewardNoise.get()])
-    linesSettingsFile.append(["DisableTypingScoreOutside", disableTypingScoreOutside.get()])
-    linesSettingsFile.append(["DisplayScoreForNormalTrials", displayScoreNormalTrials.get()])
-    linesSettingsFile.append(["DisplayScoreForPracticeTrials", displayScorePracticeTrials.get()])
-    linesSettingsFile.append(["PracticeTrackingPenalty", practiceTrackingPenalty.get()])
-    linesSettingsFile.append(["ParallelFeedback", parallelFeedback.get()])
-    linesSettingsFile.append(["FeedbackInterval", interval if not leaveIntervalBoxEmpty else ""])
-    linesSettingsFile.append(["ShowOnlyGetReadyMessage", showOnlyGetReadyMessage.get()])
+    options["ParallelDualTasks"] = "1" if RuntimeVariables.ParallelDualTasks else "0"  # the typing task within the cursor also requires it
+    if options["FeedbackInterval"]:
+        options["FeedbackInterval"] = RuntimeVariables.IntervalForFeedbackAfterTrials
+    for name, value in options.items():
+        linesSettingsFile.append([name, value])
 
     WriteLinesToCzvFile(Constants.SettingsFilename, linesSettingsFile)
     RuntimeVariables.EnvironmentIsRunning = True
     tkWindow.quit()
 
 
+class VirtualClock:
+    """
+    Replaces MonotonicClock for simulated sessions: waiting advances the time immediately, so sessions run faster than real time.
+    Each time the clock advances, the synthetic participant may act.
+    """
+    def __init__(self, participant):
+        self.CurrentTime = 0.0
+        self.Participant = participant
+
+    def now(self):
+        return self.CurrentTime
+
+    def sleep(self, seconds):
+        self.sleepUntil(self.CurrentTime + seconds)
+
+    def sleepUntil(self, deadline):
+        if deadline > self.CurrentTime:
+            self.CurrentTime = deadline
+            self.Participant.act(self.CurrentTime)
+
+    def waitForEvent(self, deadline):
+        """Returns a pending event, otherwise advances to the deadline, where the participant may post new events"""
+        event = pygame.event.poll()
+        if event.type != pygame.NOEVENT:
+            return event
+        self.sleepUntil(deadline)
+        return None
+
+
+class SimulatedJoystick:
+    """Used instead of a pygame joystick in simulated sessions. The synthetic participant sets the axis values."""
+    def __init__(self):
+        self.Axes = [0.0, 0.0]
+        self.Buttons = [False]
+
+    def init(self):
+        pass
+
+    def get_axis(self, axis):
+        return self.Axes[axis]
+
+    def get_numbuttons(self):
+        return len(self.Buttons)
+
+    def get_button(self, button):
+        return self.Buttons[button]
+
+
+class SyntheticParticipant:
+    """
+    Base class of the participants in simulated sessions. act() is called whenever the virtual clock advances and
+    injects input as pygame events, so that the same code paths as in a real session are used.
+    This participant only starts the experiment and does nothing else.
+    """
+    def __init__(self, seed=0):
+        self.Random = random.Random(seed)
+        self.Joystick = SimulatedJoystick()
+        self.ExperimentStarted = False
+
+    def act(self, currentTime):
+        if not self.ExperimentStarted:
+            # the experiment supervisor clicks on the start screen
+            self.postEvent(pygame.MOUSEBUTTONDOWN, button=1, pos=(0, 0))
+            self.ExperimentStarted = True
+
+    def postEvent(self, eventType, **attributes):
+        if pygame.display.get_init():
+            pygame.event.post(pygame.event.Event(eventType, EventTime=RuntimeVariables.Clock.now(), **attributes))
+
+    def moveJoystick(self, axisX, axisY):
+        self.Joystick.Axes[0] = axisX
+        self.Joystick.Axes[1] = axisY
+        self.postEvent(pygame.JOYAXISMOTION, joy=0, instance_id=0, axis=0, value=axisX)
+
+    def pressKey(self, character):
+        self.postEvent(pygame.KEYDOWN, key=ord(character), unicode=character, mod=0, scancode=0)
+
+
+class SteeringParticipant(SyntheticParticipant):
+    """
+    Steers the cursor towards the middle of the tracking window and types the shown digits with some errors.
+    In switching dual tasks, the tracking window is opened regularly with the joystick button.
+    """
+    def __init__(self, seed=0, steeringInterval=0.1, steeringGain=0.01, deadZone=20, typingInterval=0.4, typingErrorRate=0.05,
+                 switchInterval=4.0, trackingVisitDuration=1.0):
+        super().__init__(seed)
+        self.SteeringInterval = steeringInterval
+        self.SteeringGain = steeringGain  # joystick deflection per pixel distance to the middle
+        self.DeadZone = deadZone  # pixels around the middle where the joystick is released
+        self.TypingInterval = typingInterval
+        self.TypingErrorRate = typingErrorRate
+        self.SwitchInterval = switchInterval
+        self.TrackingVisitDuration = trackingVisitDuration
+        self.NextSteeringTime = 0.0
+        self.NextKeyPressTime = 0.0
+        self.NextSwitchTime = 0.0
+        self.ButtonPressed = False
+
+    def act(self, currentTime):
+        super().act(currentTime)
+        if RuntimeVariables.TrackingTaskPresent and currentTime >= self.NextSteeringTime:
+            self.NextSteeringTime = currentTime + self.SteeringInterval
+            offsetX = Constants.TrackingWindowMiddleX - RuntimeVariables.CursorCoordinates.X
+            offsetY = Constants.TrackingWindowMiddleY - RuntimeVariables.CursorCoordinates.Y
+            if math.sqrt(offsetX ** 2 + offsetY ** 2) < self.DeadZone:
+                self.moveJoystick(0.0, 0.0)
+            else:
+                self.moveJoystick(max(-1.0, min(1.0, offsetX * self.SteeringGain)), max(-1.0, min(1.0, offsetY * self.SteeringGain)))
+
+        typingPossible = RuntimeVariables.TypingTaskPresent and (RuntimeVariables.TypingWindowVisible or RuntimeVariables.ParallelDualTasks)
+        if typingPossible and RuntimeVariables.CurrentTypingTaskNumbers and currentTime >= self.NextKeyPressTime:
+            self.NextKeyPressTime = currentTime + self.TypingInterval * (0.5 + self.Random.random())
+            character = RuntimeVariables.CurrentTypingTaskNumbers[0]
+            if self.Random.random() < self.TypingErrorRate:
+                character = self.Random.choice([digit for digit in "123456789" if digit != character])
+            self.pressKey(character)
+
+        switchingDualTask = RuntimeVariables.TrackingTaskPresent and RuntimeVariables.TypingTaskPresent and not RuntimeVariables.ParallelDualTasks
+        if switchingDualTask and currentTime >= self.NextSwitchTime:
+            self.Joystick.Buttons[0] = not self.ButtonPressed
+            if self.ButtonPressed:
+                self.postEvent(pygame.JOYBUTTONUP, joy=0, instance_id=0, button=0)
+                self.NextSwitchTime = currentTime + self.SwitchInterval
+            else:
+                self.postEvent(pygame.JOYBUTTONDOWN, joy=0, instance_id=0, button=0)
+                self.NextSwitchTime = currentTime + self.TrackingVisitDuration
+            self.ButtonPressed = not self.ButtonPressed
+
+
+SyntheticParticipants = {"idle": SyntheticParticipant, "steering": SteeringParticipant}
+
+
+def ApplySettingsFile(settings, participantNumber):
+    """
+    Sets the RuntimeVariables from a loaded settings file the same way ParseAndSaveInputs() does from the GUI.
+    Used for simulated sessions, which run without the GUI.
+    """
+    for block in settings.Blocks:
+        RuntimeVariables.RunningOrder.append(Block(taskType=TaskTypes[block[1].replace("TaskTypes.", "")], numberOfTrials=int(block[2])))
+    for circleType, radius, typingTaskNumbers, innerCircleColor, borderColor in settings.Circles:
+        circle = Circle(int(radius), typingTaskNumbers, eval(innerCircleColor), eval(borderColor))
+        if circleType == "circleBig":
+            RuntimeVariables.CirclesBig.append(circle)
+        elif circleType == "circleSmall":
+            RuntimeVariables.CirclesSmall.append(circle)
+        elif circleType == "circlePractice":
+            RuntimeVariables.CirclesPractice.append(circle)
+    RuntimeVariables.ParticipantNumber = str(int(participantNumber))
+    ApplyOptions(settings.Options)
+
+
+def ApplyOptions(options):
+    """
+    Sets the RuntimeVariables and the positions of the task windows from the options, by their names and values in the settings file.
+    Used for the options of the GUI and of a loaded settings file.
+    Raises a ValueError if the feedback interval is not a number, it may only be empty if the feedback mode does not need it.
+    """
+    RuntimeVariables.FeedbackMode = FeedbackMode[options.get("ParallelFeedback", str(FeedbackMode.Live)).replace("FeedbackMode.", "")]
+    if options.get("FeedbackInterval") or RuntimeVariables.FeedbackMode == FeedbackMode.AfterTrialsInInterval:
+        RuntimeVariables.IntervalForFeedbackAfterTrials = int(options.get("FeedbackInterval", ""))
+
+    RuntimeVariables.DisplayTypingTaskWithinCursor = options.get("DisplayTypingTaskWithinCursor") == "1"
+    RuntimeVariables.ParallelDualTasks = options.get("ParallelDualTasks") == "1" or RuntimeVariables.DisplayTypingTaskWithinCursor  # also required
+    if RuntimeVariables.ParallelDualTasks:
+        Constants.OffsetTaskWindowsTop += 20
+    if RuntimeVariables.DisplayTypingTaskWithinCursor:
+        Constants.OffsetTaskWindowsTop += 20
+    Constants.TopLeftCornerOfTypingTaskWindow = Vector2D(Constants.OffsetLeftRight, Constants.OffsetTaskWindowsTop)
+    Constants.TopLeftCornerOfTrackingTaskWindow = Vector2D(Constants.OffsetLeftRight + ExperimentSettings.TaskWindowSize.X + ExperimentSettings.SpaceBetweenWindows, Constants.OffsetTaskWindowsTop)
+
+    RuntimeVariables.RunPracticeTrials = options.get("RunPracticeTrials") == "1"
+    RuntimeVariables.ShowPenaltyRewardNoise = options.get("ShowPenaltyRewardNoise") == "1"
+    RuntimeVariables.DisableCorrectTypingScoreOutsideCircle = options.get("DisableTypingScoreOutside") == "1"
+    RuntimeVariables.DisplayScoreForNormalTrials = options.get("DisplayScoreForNormalTrials") == "1"
+    RuntimeVariables.DisplayScoreForPracticeTrials = options.get("DisplayScoreForPracticeTrials") == "1"
+    RuntimeVariables.PenaltyPracticeTrials = Penalty[options.get("PracticeTrackingPenalty", str(Penalty.NoPenalty)).replace("Penalty.", "")]
+    RuntimeVariables.ShowOnlyGetReadyMessage = options.get("ShowOnlyGetReadyMessage") == "1"
+    RuntimeVariables.ProfileHotPaths = options.get("ProfileHotPaths") == "1"
+
+
+def RunSimulation(participantNumber, participant, outputDirectory="", resume=False):
+    """
+    Runs a complete session headless and faster than real time with a synthetic participant, using the settings file and the
+    participant file of the current directory. The output files are the same as in a real session.
+    Runs one session per process, as the settings are applied to the global RuntimeVariables.
+    """
+    os.environ["SDL_VIDEODRIVER"] = "dummy"  # no window is opened
+    os.environ["SDL_AUDIODRIVER"] = "dummy"
+    settings = LoadSettingsFromFile()
+    if not settings:
+        raise Exception(f"Could not read {Constants.SettingsFilename}")
+    ApplySettingsFile(settings, participantNumber)
+    if outputDirectory:
+        os.makedirs(outputDirectory, exist_ok=True)
+        RuntimeVariables.OutputDirectory = os.path.join(outputDirectory, "")
+    RuntimeVariables.Clock = VirtualClock(participant)
+    RuntimeVariables.JoystickObject = participant.Joystick
+    RuntimeVariables.EnvironmentIsRunning = True
+    RuntimeVariables.ResumeSession = resume
+    startTime = time.perf_counter()
+    try:
+        StartExperiment()
+    except SystemExit:
+        pass  # quitApp() is called at the end of the experiment
+    print(f"Simulated session of {RuntimeVariables.Clock.now():.0f} s took {time.perf_counter() - startTime:.1f} s")
+
+
+def CheckSessionPlan(participantNumber, outputDirectory=""):
+    """
+    Compiles the session plan from the settings file and the participant file of the current directory and writes it to a json file,
+    without running the session.
+    """
+    settings = LoadSettingsFromFile()
+    if not settings:
+        raise Exception(f"Could not read {Constants.SettingsFilename}")
+    ApplySettingsFile(settings, participantNumber)
+    ValidateSettings()
+    startTime = time.perf_counter()
+    sessionPlan = compileSessionPlan(verifyConditions(readParticipantFile()))
+    compileTime = time.perf_counter() - startTime
+    if outputDirectory:
+        os.makedirs(outputDirectory, exist_ok=True)
+    planFileName = path.join(outputDirectory, f"participant_{RuntimeVariables.ParticipantNumber}_plan.json")
+    sessionPlan.write(planFileName)
+    sessionTime = sum(spec.TrialDuration + 3 + sum(displayTime for message, displayTime in spec.SessionMessagesBefore + spec.BlockMessages + spec.BlockIntroductionMessages)
+                      for spec in sessionPlan.Trials)
+    print(f"{len(sessionPlan.Trials)} trials in {len(set((spec.ConditionNumber, spec.BlockNumber) for spec in sessionPlan.Trials))} blocks, "
+          f"at least {sessionTime / 60:.0f} minutes, compiled in {compileTime * 1000:.1f} ms -> {planFileName}")
+
+
 def writeLogFile(text):
-    f = open("messageLog.txt", "a+")
+    f = open(RuntimeVariables.OutputDirectory + "messageLog.txt", "a+")
     f.write("################################\n\n" + text + "\n\n")
     f.close()
 
 
 if __name__ == '__main__':
+    argumentParser = argparse.ArgumentParser(description=Constants.Title)
+    argumentParser.add_argument("--simulate", metavar="PARTICIPANT_NUMBER", help="run a headless session with a synthetic participant, using the settings file and the participant file")
+    argumentParser.add_argument("--check-plan", metavar="PARTICIPANT_NUMBER", help="compile the session plan from the settings file and the participant file and write it to a json file")
+    argumentParser.add_argument("--participant", choices=sorted(SyntheticParticipants), default="steering", help="synthetic participant for --simulate")
+    argumentParser.add_argument("--seed", type=int, default=0, help="seed of the synthetic participant for --simulate")
+    argumentParser.add_argument("--resume", action="store_true", help="continue the last session of the participant with --simulate")
+    argumentParser.add_argument("--output-directory", default="", help="directory for the output files of --simulate and --check-plan")
+    argumentParser.add_argument("--convert-binary", nargs="+", metavar="FILE", help="convert binary (.bin), event stream (.events) or compressed (.gz) output data files to csv files with the same name")
+    argumentParser.add_argument("--read-trial", nargs=2, metavar=("FILE", "TRIAL_NUMBER"), help="print the rows of a trial of a compressed output data file, using its block index")
+    argumentParser.add_argument("--verify-scores", metavar="FILE", help="check the scores of parallel dual tasks in an output data file, e.g. of --simulate, against the other columns of their rows")
+    argumentParser.add_argument("--display-refresh-rate", type=int, help="display refresh rate of --simulate instead of ExperimentSettings.DisplayRefreshRate")
+    argumentParser.add_argument("--report-rmse-invariance", metavar="PARTICIPANT_NUMBER", help="simulate the session of the participant for several display refresh rates and print the RMSE distributions")
+    arguments = argumentParser.parse_args()
+    if arguments.report_rmse_invariance:
+        ReportRmseInvarianceAcrossRenderRates(arguments.report_rmse_invariance, arguments.output_directory)
+        sys.exit()
+    if arguments.verify_scores:
+        VerifyParallelDualTaskScores(arguments.verify_scores)
+        sys.exit()
+    if arguments.check_plan:
+        CheckSessionPlan(arguments.check_plan, arguments.output_directory)
+        sys.exit()
+    if arguments.convert_binary:
+        for binaryFileName in arguments.convert_binary:
+            csvFileName = path.splitext(binaryFileName[:-len(".gz")] if binaryFileName.endswith(".gz") else binaryFileName)[0] + ".csv"
+            ConvertOutputDataFileToCsv(binaryFileName, csvFileName)
+            print(f"{binaryFileName} -> {csvFileName}")
+        sys.exit()
+    if arguments.read_trial:
+        columnNames, rows = ReadTrialFromCompressedFile(arguments.read_trial[0], int(arguments.read_trial[1]))
+        print(";".join(columnNames))
+        for row in rows:
+            print(";".join(row))
+        sys.exit()
     try:
-        DrawGui()
-        if RuntimeVariables.EnvironmentIsRunning:  # check to avoid parsing incomplete form data on closing UI
-            StartExperiment()
+        if arguments.simulate:
+            if arguments.display_refresh_rate:
+                ExperimentSettings.DisplayRefreshRate = arguments.display_refresh_rate
+                ExperimentSettings.FrameTimeBudgetMilliseconds = 1000 / arguments.display_refresh_rate
+            RunSimulation(arguments.simulate, SyntheticParticipants[arguments.participant](seed=arguments.seed), arguments.output_directory, arguments.resume)
+        else:
+            DrawGui()
+            if RuntimeVariables.EnvironmentIsRunning:  # check to avoid parsing incomplete form data on closing UI
+                StartExperiment()
     except Exception as e:
+        if RuntimeVariables.OutputDataWriter:
+            RuntimeVariables.OutputDataWriter.close()  # write the rows that are still queued
         stack = traceback.format_exc()
-        with open("Error_Logfile.txt", "a") as log:
+        errorLogFileName = RuntimeVariables.OutputDirectory + "Error_Logfile.txt"
+        with open(errorLogFileName, "a") as log:
             log.write(f"\n{datetime.datetime.now()} {str(e)}   {str(stack)} \n")
             print(str(e))
             print(str(stack))
-            print("PLEASE CHECK Error_Logfile.txt, the error is logged there!")
+            print(f"PLEASE CHECK {errorLogFileName}, the error is logged there!")
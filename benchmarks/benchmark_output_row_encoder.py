@@ -0,0 +1,124 @@
+"""
+Compares how many rows of the output data file are formatted per second by the OutputRowEncoder of CondA3.py and by the
+former formatting, which obtained and formatted all values and calculated the scores for each row. Run it from the repository:
+
+    python benchmarks/benchmark_output_row_encoder.py
+"""
+import os
+import sys
+import time
+
+import scipy.special
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from CondA3 import (Circle, Constants, ExperimentSettings, OutputColumns, OutputRowEncoder, RuntimeVariables, SyntheticParticipant,
+                    TaskTypes, Vector2D, VirtualClock, calculateRmse, isCursorOutsideCircle)
+
+CumulatedTrackingScore = 0
+
+
+def calculateScoresPerRow():
+    """The former calculation of the parallel dual task scores for each row"""
+    global CumulatedTrackingScore
+    typingScore = int(1.0 * RuntimeVariables.CorrectlyTypedDigitsVisit)
+    trackingScore = calculateRmse()
+    if trackingScore > 0:
+        trackingScore = 1.0 / trackingScore
+    CumulatedTrackingScore += trackingScore
+    return typingScore, int(CumulatedTrackingScore), int((typingScore + CumulatedTrackingScore) / 2.0)
+
+
+def formatOutputRowByConcatenation(eventMessage1, eventMessage2):
+    """The former formatting of a row, which obtains and formats all values for each row"""
+    currentTime = scipy.special.round((RuntimeVariables.Clock.now() - RuntimeVariables.StartTimeOfFirstExperiment) * 10000) / 10000
+    trialTime = scipy.special.round((RuntimeVariables.Clock.now() - RuntimeVariables.StartTimeCurrentTrial) * 10000) / 10000
+    if not RuntimeVariables.TrackingTaskPresent:
+        outputCursorCoordinateX = outputCursorCoordinateY = outputJoystickAxisX = outputJoystickAxisY = "-"
+    else:
+        outputCursorCoordinateX = scipy.special.round(RuntimeVariables.CursorCoordinates.X * 100) / 100
+        outputCursorCoordinateY = scipy.special.round(RuntimeVariables.CursorCoordinates.Y * 100) / 100
+        outputJoystickAxisX = scipy.special.round(RuntimeVariables.JoystickAxis.X * 1000) / 1000
+        outputJoystickAxisY = scipy.special.round(RuntimeVariables.JoystickAxis.Y * 1000) / 1000
+    if RuntimeVariables.TypingTaskPresent:
+        outputEnteredDigitsStr = RuntimeVariables.EnteredDigitsStr
+        outputEnteredDigitsLength = len(RuntimeVariables.EnteredDigitsStr)
+        outputGeneratedTypingTaskNumbers = RuntimeVariables.CurrentTypingTaskNumbers
+        outputGeneratedTypingTaskNumbersLength = len(RuntimeVariables.CurrentTypingTaskNumbers)
+    else:
+        outputEnteredDigitsStr = outputEnteredDigitsLength = outputGeneratedTypingTaskNumbers = outputGeneratedTypingTaskNumbersLength = "-"
+    if RuntimeVariables.CurrentTaskType == TaskTypes.DualTask or RuntimeVariables.CurrentTaskType == TaskTypes.PracticeDualTask:
+        visitTime = RuntimeVariables.Clock.now() - RuntimeVariables.VisitStartTime
+    else:
+        visitTime = "-"
+    if RuntimeVariables.TrialScheduler and RuntimeVariables.TrialScheduler.TickLateness is not None:
+        schedulingLateness = scipy.special.round(RuntimeVariables.TrialScheduler.TickLateness * 1000000) / 1000
+    else:
+        schedulingLateness = "-"
+    circleRadii = list(map(lambda circle: circle.Radius, RuntimeVariables.CurrentCircles))
+    currentTask = str(RuntimeVariables.CurrentTaskType).replace("TaskType.", "")
+    scores = calculateScoresPerRow() if RuntimeVariables.ParallelDualTasks else ["-", "-", "-"]
+
+    return str(RuntimeVariables.ParticipantNumber) + ";" + str(circleRadii) + ";" + str(RuntimeVariables.StandardDeviationOfNoise) + ";" + \
+        str(currentTime) + ";" + str(trialTime) + ";" + str(visitTime) + ";" + str(RuntimeVariables.BlockNumber) + ";" + \
+        str(RuntimeVariables.TrialNumber) + ";" + str(currentTask) + ";" + str(RuntimeVariables.TrackingTaskPresent) + ";" + \
+        str(RuntimeVariables.TypingTaskPresent) + ";" + str(RuntimeVariables.TrackingWindowVisible) + ";" + \
+        str(RuntimeVariables.TypingWindowVisible) + ";" + str(RuntimeVariables.TrackingWindowEntryCounter) + ";" + \
+        str(RuntimeVariables.TypingWindowEntryCounter) + ";" + str(calculateRmse()) + ";" + \
+        str(RuntimeVariables.TrackingStatistics.LengthOfPath) + ";" + str(outputCursorCoordinateX) + ";" + \
+        str(outputCursorCoordinateY) + ";" + str(outputJoystickAxisX) + ";" + str(outputJoystickAxisY) + ";" + \
+        str(outputEnteredDigitsStr) + ";" + str(outputEnteredDigitsLength) + ";" + str(outputGeneratedTypingTaskNumbers) + ";" + \
+        str(outputGeneratedTypingTaskNumbersLength) + ";" + str(RuntimeVariables.NumberOfCircleExits) + ";" + \
+        str(RuntimeVariables.TrialScore) + ";" + str(RuntimeVariables.VisitScore) + ";" + \
+        str(RuntimeVariables.CorrectlyTypedDigitsVisit) + ";" + str(RuntimeVariables.IncorrectlyTypedDigitsVisit) + ";" + \
+        str(RuntimeVariables.IncorrectlyTypedDigitsTrial) + ";" + str(isCursorOutsideCircle()) + ";" + \
+        str(RuntimeVariables.TypingRewardCorrectDigit) + ";" + str(scores[0]) + ";" + str(scores[1]) + ";" + str(scores[2]) + ";" + \
+        str(eventMessage1) + ";" + str(eventMessage2) + ";" + str(schedulingLateness) + ";" + \
+        str(RuntimeVariables.RandomStreams.TrialSeed if RuntimeVariables.RandomStreams else "-") + "\n"
+
+
+def setUpParallelDualTaskRow():
+    RuntimeVariables.Clock = VirtualClock(SyntheticParticipant())  # the time does not advance, so all rows are the same
+    RuntimeVariables.ParticipantNumber = "1"
+    RuntimeVariables.CurrentCircles = [Circle(211, "123", (255, 204, 102), (255, 0, 0)), Circle(231, "456", (255, 204, 102), (255, 0, 0))]
+    RuntimeVariables.StandardDeviationOfNoise = ExperimentSettings.CursorNoises["medium"]
+    RuntimeVariables.TypingRewardCorrectDigit = 10
+    RuntimeVariables.CurrentTaskType = TaskTypes.DualTask
+    RuntimeVariables.ParallelDualTasks = True
+    RuntimeVariables.TrackingTaskPresent = True
+    RuntimeVariables.TypingTaskPresent = True
+    RuntimeVariables.CursorCoordinates = Vector2D(Constants.TrackingWindowMiddleX + 23.4567, Constants.TrackingWindowMiddleY - 12.3456)
+    RuntimeVariables.JoystickAxis = Vector2D(0.3456, -0.1234)
+    RuntimeVariables.EnteredDigitsStr = "123" * 20
+    RuntimeVariables.CurrentTypingTaskNumbers = "12312312"
+    RuntimeVariables.TrackingStatistics.addSample(RuntimeVariables.CursorCoordinates.X, RuntimeVariables.CursorCoordinates.Y,
+                                                  Constants.TrackingWindowMiddleX, Constants.TrackingWindowMiddleY)
+
+
+def measureMicrosecondsPerRow(formatRow, numberOfRows):
+    startTime = time.perf_counter()
+    for _ in range(numberOfRows):
+        formatRow("keypress", "1")
+    return (time.perf_counter() - startTime) / numberOfRows * 1000000
+
+
+def main(numberOfRows=20000, numberOfRounds=7):
+    setUpParallelDualTaskRow()
+    encoder = OutputRowEncoder(OutputColumns)
+    textByConcatenation = formatOutputRowByConcatenation("keypress", "1")
+    RuntimeVariables.ScoreEngine.reset()
+    RuntimeVariables.ScoreEngine.advance()  # the scores are calculated once, as by the first concatenation
+    textByEncoder = encoder.encodeText("keypress", "1")
+    if textByConcatenation != textByEncoder:
+        raise Exception(f"The rows differ:\n{textByConcatenation}{textByEncoder}")
+
+    # the rounds alternate, the best round of each is compared
+    timeByConcatenation = timeByEncoder = float("inf")
+    for _ in range(numberOfRounds):
+        timeByConcatenation = min(timeByConcatenation, measureMicrosecondsPerRow(formatOutputRowByConcatenation, numberOfRows))
+        timeByEncoder = min(timeByEncoder, measureMicrosecondsPerRow(encoder.encodeText, numberOfRows))
+    print(f"Concatenation:      {timeByConcatenation:6.1f} us per row, {1000000 / timeByConcatenation:8.0f} rows/s")
+    print(f"OutputRowEncoder:   {timeByEncoder:6.1f} us per row, {1000000 / timeByEncoder:8.0f} rows/s ({timeByConcatenation / timeByEncoder:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,25 @@
+import math
+
+import numpy
+import pytest
+
+import CondA3
+
+
+def createPhysics(trialDuration, physicsRate=200):
+    disturbance = numpy.zeros((int(math.ceil(trialDuration * physicsRate)) + 1, 2))
+    return CondA3.CursorPhysics(physicsRate, 0.0, trialDuration, CondA3.Constants.TrackingWindowMiddleX, CondA3.Constants.TrackingWindowMiddleY, disturbance)
+
+
+def test_advance_beyond_the_trial_end_stops_at_the_trial_end():
+    physics = createPhysics(10.0)
+    physics.advanceTo(10.011, 0.0, 0.0, True)
+    assert physics.StepNumber == round(10.0 * 200)
+
+
+def test_missing_disturbance_fails_the_simulation(monkeypatch):
+    monkeypatch.setattr(CondA3.RuntimeVariables, "Clock", CondA3.VirtualClock(CondA3.SyntheticParticipant()))
+    physics = createPhysics(1.0)
+    physics.StepNumber = len(physics.DisturbanceX)
+    with pytest.raises(Exception, match="ran past the disturbance"):
+        physics.step(0.0, 0.0, True)
@@ -0,0 +1,48 @@
+import math
+import os
+
+import numpy
+import pygame
+import pytest
+
+import CondA3
+from CondA3 import RuntimeVariables
+
+
+@pytest.fixture
+def sampler(tmp_path, monkeypatch):
+    pygame.init()
+    participant = CondA3.SyntheticParticipant()
+    clock = CondA3.VirtualClock(participant)
+    monkeypatch.setattr(RuntimeVariables, "OutputDirectory", str(tmp_path) + os.sep)
+    monkeypatch.setattr(RuntimeVariables, "Clock", clock)
+    monkeypatch.setattr(RuntimeVariables, "JoystickObject", participant.Joystick)
+    monkeypatch.setattr(RuntimeVariables, "JoystickAxis", CondA3.Vector2D(0, 0))
+    monkeypatch.setattr(RuntimeVariables, "TrackingWindowVisible", True)
+    joystickSampler = CondA3.JoystickSampler(clock, 500, str(tmp_path / "input.csv"))
+    monkeypatch.setattr(RuntimeVariables, "JoystickSampler", joystickSampler)
+    yield joystickSampler
+    joystickSampler.close()
+
+
+def takeSample(sampler, sampleTime, axisX):
+    """A sample that is taken when the waiting returned at sampleTime"""
+    sampler.Clock.CurrentTime = sampleTime
+    RuntimeVariables.JoystickObject.Axes[0] = axisX
+    sampler.sample()
+
+
+def test_sample_after_the_trial_end_does_not_advance_the_physics(sampler):
+    trialDuration = 1.0
+    physicsRate = 200
+    disturbance = numpy.zeros((int(math.ceil(trialDuration * physicsRate)) + 1, 2))
+    physics = CondA3.CursorPhysics(physicsRate, 0.0, trialDuration, CondA3.Constants.TrackingWindowMiddleX, CondA3.Constants.TrackingWindowMiddleY, disturbance)
+
+    takeSample(sampler, 0.5, 0.2)
+    takeSample(sampler, trialDuration + 0.011, 0.9)  # the last waiting of the trial returned late
+    CondA3.advanceCursorPhysics(physics, trialDuration)
+
+    assert physics.StartTime + physics.StepNumber * physics.StepTime <= trialDuration
+    assert RuntimeVariables.JoystickAxis.X == 0.2
+    # the late sample is used by the next tick
+    assert [(sampleTime, axisX) for sampleTime, axisX, axisY in sampler.consumeSamples(trialDuration + 1)] == [(trialDuration + 0.011, 0.9)]
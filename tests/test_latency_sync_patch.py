@@ -0,0 +1,64 @@
+import os
+
+import pygame
+import pytest
+
+import CondA3
+from CondA3 import Constants, ExperimentSettings, RuntimeVariables
+
+
+@pytest.fixture(params=[CondA3.RenderingMode.FullFlip, CondA3.RenderingMode.DirtyRectangles])
+def recorder(request, tmp_path, monkeypatch):
+    pygame.init()
+    monkeypatch.setattr(ExperimentSettings, "LatencySyncPatch", True)
+    monkeypatch.setattr(ExperimentSettings, "RenderingMode", request.param)
+    monkeypatch.setattr(RuntimeVariables, "OutputDirectory", str(tmp_path) + os.sep)
+    monkeypatch.setattr(RuntimeVariables, "Clock", CondA3.VirtualClock(CondA3.SyntheticParticipant()))
+    monkeypatch.setattr(RuntimeVariables, "Screen", pygame.display.set_mode((200, 150)))
+    monkeypatch.setattr(RuntimeVariables, "DirtyRectangles", [])
+    monkeypatch.setattr(RuntimeVariables, "FullScreenDirty", False)
+    monkeypatch.setattr(RuntimeVariables, "FrameTimingRecorder", None)
+    monkeypatch.setattr(RuntimeVariables, "RenderStatistics", None)
+    monkeypatch.setattr(RuntimeVariables, "JoystickSampler", None)
+    inputLatencyRecorder = CondA3.InputLatencyRecorder(RuntimeVariables.Clock, str(tmp_path / "latency.csv"), str(tmp_path / "summary.csv"))
+    monkeypatch.setattr(RuntimeVariables, "InputLatencyRecorder", inputLatencyRecorder)
+    inputLatencyRecorder.startTrial()
+    yield inputLatencyRecorder
+    inputLatencyRecorder.close()
+    pygame.display.quit()
+
+
+def syncPatchIsOn():
+    """Stands in for a photodiode: reads the middle of the sync patch from the display surface"""
+    display = pygame.display.get_surface()
+    color = display.get_at((Constants.LatencySyncPatchSize // 2, display.get_height() - Constants.LatencySyncPatchSize // 2))
+    return color[0] > 127
+
+
+def showFrame(recorder, keys=""):
+    for key in keys:
+        recorder.addEvent(pygame.event.Event(pygame.KEYDOWN, unicode=key, key=ord(key)), recorder.poll())
+    recorder.stateUpdated()
+    CondA3.updateDisplay()
+
+
+def test_sync_patch_changes_its_color_with_each_key_press(recorder):
+    showFrame(recorder)
+    assert not syncPatchIsOn()
+    showFrame(recorder, "1")
+    assert syncPatchIsOn()
+    showFrame(recorder)
+    assert syncPatchIsOn()
+    showFrame(recorder, "2")
+    assert not syncPatchIsOn()
+    showFrame(recorder, "34")
+    assert not syncPatchIsOn()
+    assert [entry[6] for entry in recorder.Inputs] == [1, 0, 1, 0]
+
+
+def test_sync_patch_is_drawn_again_over_a_new_background(recorder):
+    showFrame(recorder, "1")
+    RuntimeVariables.Screen.fill(ExperimentSettings.BackgroundColorEntireScreen)
+    CondA3.markScreenDirty()
+    showFrame(recorder)
+    assert syncPatchIsOn()
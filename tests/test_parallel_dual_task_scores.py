@@ -0,0 +1,69 @@
+import random
+
+import pytest
+
+import CondA3
+from CondA3 import RuntimeVariables
+
+
+class ReferenceScores:
+    """The former calculation of the parallel dual task scores, which cumulated the tracking score on each call"""
+    def __init__(self):
+        self.CumulatedTrackingScoreForParallelDualTasks = 0
+
+    def calculateFeedbackParallelDualTasks(self):
+        factorTyping = 1.0
+        typingScore = factorTyping * RuntimeVariables.CorrectlyTypedDigitsVisit  # One Visit equals one Trial in parallel dual tasks
+        typingScore = int(typingScore)  # cut all decimal places
+
+        factorTracking = 1.0
+        trackingScore = CondA3.calculateRmse()
+        if trackingScore > 0:  # avoid division by zero!
+            trackingScore = factorTracking * (1.0 / trackingScore)  # Invert RMSE as a higher score should be better.
+
+        self.CumulatedTrackingScoreForParallelDualTasks += trackingScore
+        cumulatedTrackingScore = int(self.CumulatedTrackingScoreForParallelDualTasks)
+
+        combinedScore = (typingScore + self.CumulatedTrackingScoreForParallelDualTasks) / 2.0
+        combinedScore = int(combinedScore)  # cut all decimal places
+
+        return typingScore, cumulatedTrackingScore, combinedScore
+
+
+@pytest.fixture
+def trial(monkeypatch):
+    middleX = CondA3.Constants.TrackingWindowMiddleX
+    middleY = CondA3.Constants.TrackingWindowMiddleY
+    monkeypatch.setattr(RuntimeVariables, "TrackingStatistics", CondA3.TrackingStatisticsAccumulator(middleX, middleY))
+    monkeypatch.setattr(RuntimeVariables, "ScoreEngine", CondA3.ParallelDualTaskScoreEngine())
+    monkeypatch.setattr(RuntimeVariables, "CorrectlyTypedDigitsVisit", 0)
+    return middleX, middleY
+
+
+@pytest.mark.parametrize("readsPerTick", [1, 3])
+def test_score_engine_matches_the_reference_once_per_tick(trial, readsPerTick):
+    middleX, middleY = trial
+    generator = random.Random(7)
+    reference = ReferenceScores()
+    x, y = middleX, middleY
+    for tick in range(500):
+        previousX, previousY = x, y
+        x = middleX + generator.uniform(-8, 8)
+        y = middleY + generator.uniform(-8, 8)
+        RuntimeVariables.TrackingStatistics.addSample(x, y, previousX, previousY)
+        if generator.random() < 0.3:
+            RuntimeVariables.CorrectlyTypedDigitsVisit += 1
+        RuntimeVariables.ScoreEngine.advance()
+        expectedScores = reference.calculateFeedbackParallelDualTasks()
+        # the rows of a tick (e.g. key presses) read the scores several times, they must not cumulate again
+        for _ in range(readsPerTick):
+            assert tuple(RuntimeVariables.ScoreEngine.Scores) == expectedScores, f"tick {tick}"
+    assert expectedScores[1] > 50  # the tracking score was cumulated over the ticks
+
+
+def test_reset_starts_the_cumulated_tracking_score_again(trial):
+    middleX, middleY = trial
+    RuntimeVariables.TrackingStatistics.addSample(middleX + 30, middleY, middleX, middleY)
+    RuntimeVariables.ScoreEngine.advance()
+    RuntimeVariables.ScoreEngine.reset()
+    assert RuntimeVariables.ScoreEngine.Scores[1] == 0
@@ -0,0 +1,23 @@
+import CondA3
+
+
+def test_overflows_keep_the_samples_and_are_reported_once_at_trial_end(monkeypatch):
+    messages = []
+    monkeypatch.setattr(CondA3, "writeLogFile", messages.append)
+    buffers = CondA3.TrialSampleBuffers()
+    buffers.reset(0.1)
+    numberOfSamples = buffers.Capacity * 3
+    for index in range(numberOfSamples):
+        buffers.addSample(index * 0.01, index, -index, 0.0, 0.0, 0.0)
+    for index in range(buffers.KeyPressCapacity + 1):
+        buffers.addKeyPress(index * 0.1)
+    assert messages == []
+    assert buffers.NumberOfSamples == numberOfSamples
+    assert list(buffers.CursorX[:numberOfSamples]) == list(range(numberOfSamples))
+    assert buffers.SampleOverflows == 2
+    assert buffers.KeyPressOverflows == 1
+    buffers.reportTrial()
+    assert len(messages) == 1
+    buffers.reset(0.1)
+    buffers.reportTrial()
+    assert len(messages) == 1